@@ -0,0 +1 @@
+# Paquete de utilidades del análisis ABP (sin dependencias de Streamlit).
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from abp import cubo, zonas
+from abp.esquema import aplicar_esquema
+from abp.ingesta import _tipos_homogeneos, normalizar_columnas
+
+# ---- ALMACÉN PARTICIONADO POR TEMPORADA / JORNADA ----
+DIR_DATOS = Path(os.environ.get("ABP_DATA_DIR", "datos_abp"))
+MANIFIESTO = "_manifiesto.json"
+FICHERO_EVENTOS = "eventos.parquet"
+FICHERO_CUBO = "cubo.parquet"
+FICHERO_CUBO_ZONAS = "cubo_zonas.parquet"
+COL_ID = "_id_evento"
+PARTICION_NULA = "__nulo__"
+
+# Columnas que identifican un evento; un evento reenviado con los mismos valores sustituye al anterior
+COLUMNAS_CLAVE = [
+    'temporada', 'jornada', 'equipo_atacante', 'equipo_defensor', 'abp_tipo',
+    'momento_minuto', 'jugador_ejecutor', 'jugador_objetivo', 'id_abp',
+]
+
+_lock = threading.Lock()
+
+
+def _nombre_particion(temporada, jornada):
+    temp = PARTICION_NULA if pd.isna(temporada) else re.sub(r"[^\w.-]", "-", str(temporada))
+    jor = PARTICION_NULA if pd.isna(jornada) else str(int(jornada))
+    return f"temporada={temp}/jornada={jor}"
+
+
+def _texto_clave(serie):
+    # Texto de una columna de la clave que no depende de su dtype: un hueco en la columna la vuelve float
+    # (23 -> "23.0") y el esquema la guarda como float32, pero el evento debe seguir teniendo el mismo id
+    if not pd.api.types.is_float_dtype(serie):
+        texto = serie.astype(object).astype(str)
+    else:
+        numeros = serie.astype('float64')
+        enteros = numeros.notna() & (numeros % 1 == 0)
+        texto = numeros.astype(object).astype(str)
+        texto[enteros] = numeros[enteros].astype('int64').astype(str)
+    return texto.where(serie.notna(), "")
+
+
+def ids_evento(df):
+    columnas = [c for c in COLUMNAS_CLAVE if c in df.columns] or list(df.columns)
+    claves = pd.DataFrame({c: _texto_clave(df[c]) for c in columnas}, index=df.index)
+    return pd.util.hash_pandas_object(claves, index=False).to_numpy()
+
+
+def preparar(df):
+    # Misma normalización que la ingesta, identificador de evento y esquema tipado (valida antes de escribir nada)
+    df = _tipos_homogeneos(normalizar_columnas(df.copy()))
+    if 'jornada' in df.columns:
+        df['jornada'] = pd.to_numeric(df['jornada'], errors='coerce')
+    df[COL_ID] = ids_evento(df)
+    return zonas.asignar(aplicar_esquema(df, copiar=False))
+
+
+class AlmacenABP:
+    def __init__(self, directorio=DIR_DATOS):
+        self.directorio = Path(directorio)
+
+    # ---- MANIFIESTO ----
+    def manifiesto(self):
+        ruta = self.directorio / MANIFIESTO
+        if not ruta.exists():
+            return {"particiones": {}, "ficheros": []}
+        return json.loads(ruta.read_text(encoding="utf-8"))
+
+    def _guardar_manifiesto(self, manifiesto):
+        ruta = self.directorio / MANIFIESTO
+        tmp = ruta.with_suffix(".tmp")
+        tmp.write_text(json.dumps(manifiesto, ensure_ascii=False, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, ruta)
+
+    def version(self, manifiesto=None):
+        # Huella del contenido completo: cambia solo si cambia alguna partición.
+        # Con manifiesto (uno ya leído en esta ejecución) no se vuelve a leer el fichero, aquí ni en vacio/filas
+        particiones = (manifiesto or self.manifiesto())["particiones"]
+        texto = "\n".join(f"{nombre}:{p['huella']}" for nombre, p in sorted(particiones.items()))
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    def vacio(self, manifiesto=None):
+        return not (manifiesto or self.manifiesto())["particiones"]
+
+    def filas(self, manifiesto=None):
+        return sum(p["filas"] for p in (manifiesto or self.manifiesto())["particiones"].values())
+
+    def contiene_fichero(self, huella_fichero):
+        return huella_fichero in self.manifiesto()["ficheros"]
+
+    # ---- ESCRITURA INCREMENTAL ----
+    def _escribir(self, ruta, df):
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        tmp = ruta.with_suffix(f".{os.getpid()}.tmp")
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp)
+        os.replace(tmp, ruta)
+
+    def _particiones(self, df):
+        # (nombre, temporada, jornada, eventos de df, eventos guardados o None) por partición que toca df
+        claves = [df['temporada'] if 'temporada' in df.columns else pd.Series(pd.NA, index=df.index),
+                  df['jornada'] if 'jornada' in df.columns else pd.Series(pd.NA, index=df.index)]
+        for (temporada, jornada), eventos in df.groupby(claves, dropna=False, sort=True):
+            nombre = _nombre_particion(temporada, jornada)
+            ruta = self.directorio / nombre / FICHERO_EVENTOS
+            previos = pq.read_table(ruta).to_pandas() if ruta.exists() else None
+            yield nombre, temporada, jornada, eventos, previos
+
+    def _guardar_particion(self, manifiesto, nombre, temporada, jornada, eventos):
+        # Reescribe la partición (eventos y sus cubos); devuelve False si su contenido no cambia
+        huella = hashlib.sha256(np.sort(eventos[COL_ID].to_numpy()).tobytes()).hexdigest()
+        if manifiesto["particiones"].get(nombre, {}).get("huella") == huella:
+            return False
+        carpeta = self.directorio / nombre
+        eventos = zonas.asignar(aplicar_esquema(_tipos_homogeneos(eventos), copiar=False))
+        self._escribir(carpeta / FICHERO_EVENTOS, eventos)
+        self._escribir(carpeta / FICHERO_CUBO, cubo.agregar(eventos))
+        self._escribir(carpeta / FICHERO_CUBO_ZONAS, zonas.agregar(eventos))
+        manifiesto["particiones"][nombre] = {
+            "temporada": None if pd.isna(temporada) else str(temporada),
+            "jornada": None if pd.isna(jornada) else int(jornada),
+            "filas": len(eventos),
+            "huella": huella,
+        }
+        return True
+
+    def anadir(self, df, huella_fichero=None):
+        # Añade eventos nuevos; solo se reescriben las particiones afectadas (eventos y su cubo)
+        df = preparar(df)
+        afectadas = []
+        with _lock:
+            manifiesto = self.manifiesto()
+            for nombre, temporada, jornada, nuevos, previos in self._particiones(df):
+                if previos is not None:
+                    nuevos = pd.concat([previos, nuevos], ignore_index=True)
+                nuevos = nuevos.drop_duplicates(subset=COL_ID, keep='last').reset_index(drop=True)
+                # Con solo eventos reenviados la partición no cambia y no se reescribe
+                if self._guardar_particion(manifiesto, nombre, temporada, jornada, nuevos):
+                    afectadas.append(nombre)
+            if huella_fichero and huella_fichero not in manifiesto["ficheros"]:
+                manifiesto["ficheros"].append(huella_fichero)
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            self._guardar_manifiesto(manifiesto)
+        return afectadas
+
+    # ---- LECTURA ----
+    def _leer(self, fichero):
+        nombres = sorted(self.manifiesto()["particiones"])
+        tablas = [pq.read_table(self.directorio / n / fichero, memory_map=True) for n in nombres]
+        if not tablas:
+            return pd.DataFrame()
+        try:
+            return pa.concat_tables(tablas, promote_options="permissive").to_pandas()
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Particiones con tipos incompatibles (p. ej. texto y número en la misma columna)
+            return pd.concat([t.to_pandas() for t in tablas], ignore_index=True)
+
+    def cargar(self):
+        df = self._leer(FICHERO_EVENTOS).drop(columns=[COL_ID], errors='ignore')
+        # Unifica categorías entre particiones; el resto de tipos ya viene del Parquet
+        return aplicar_esquema(df, copiar=False) if not df.empty else df
+
+    def cargar_cubo(self):
+        # Las particiones son disjuntas en temporada/jornada, dimensiones del cubo: basta concatenar
+        return self._leer(FICHERO_CUBO)
+
+    def cargar_cubo_zonas(self):
+        return self._leer(FICHERO_CUBO_ZONAS)
@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+
+from abp import campo, cubo, red, zonas
+from abp.cubo import kpis
+from abp.filtros import CacheFiltros, EstadoFiltros
+from abp.indices import IndiceFiltros
+from abp.ranking import CRITERIOS as CRITERIOS_RANKING, RankingDefensivo
+from abp.series import MODOS as MODOS_SERIES, SeriesEquipos
+
+# ---- API DE ANÁLISIS SIN INTERFAZ ----
+# Los cálculos de las páginas, reutilizables desde la app, scripts o el generador de informes.
+TODAS_LAS_JORNADAS = (-np.inf, np.inf)
+
+
+class Analisis:
+    # Dataset con su índice de filtrado, la caché de filas filtradas, su cubo agregado y el de zonas
+    def __init__(self, df, tabla_cubo=None, tabla_zonas=None, capacidad_cache=128):
+        self.df = df
+        self.indice = IndiceFiltros(df)
+        self.cache = CacheFiltros(self.indice, capacidad=capacidad_cache)
+        self.cubo = cubo.CuboABP(df=df if tabla_cubo is None else None, tabla=tabla_cubo)
+        self.cubo_zonas = cubo.CuboABP(
+            df=df if tabla_zonas is None else None, tabla=tabla_zonas,
+            dimensiones=zonas.DIMENSIONES, agregar=zonas.agregar,
+        )
+        self.n = len(df)
+        self.columnas = list(df.columns)
+
+    def memoria(self):
+        # Lo construido sobre el dataset (el DataFrame lo cuenta quien lo comparte)
+        return self.indice.memoria() + self.cache.memoria() + self.cubo.memoria() + self.cubo_zonas.memoria()
+
+    def valores(self, col):
+        # Valores distintos no nulos, ordenados (opciones de los filtros)
+        return sorted(self.df[col].dropna().unique()) if col in self.df.columns else []
+
+    def rango_jornadas(self):
+        return int(self.df['jornada'].min()), int(self.df['jornada'].max())
+
+    def estado(self, selecciones=None, jornada=None):
+        selecciones = {col: sel for col, sel in (selecciones or {}).items() if col in self.indice.columnas}
+        return EstadoFiltros.desde(selecciones, jornada or TODAS_LAS_JORNADAS)
+
+    def filas(self, estado):
+        return self.cache.filas(estado)
+
+    def filtrar(self, estado, columnas=None):
+        df = self.df if columnas is None else self.df[[c for c in columnas if c in self.df.columns]]
+        return df.iloc[self.filas(estado)]
+
+    def facetas(self, estado, columnas=None):
+        # {columna: conteo de filas por valor} alcanzable con el resto de filtros del estado
+        return self.indice.facetas(estado.como_dict(), estado.jornada, columnas)
+
+    def agregados(self, estado):
+        # Desde el cubo si los filtros restrictivos son dimensiones suyas; si no, agregando las filas filtradas
+        restrictivas = self.indice.columnas_restrictivas(estado.como_dict())
+        tabla = self.cubo.seleccionar(estado, restrictivas)
+        if tabla is not None:
+            return tabla
+        return cubo.agregar(self.filtrar(estado))
+
+    def agregados_zonas(self, estado):
+        # Igual, con el cubo de zonas (solo equipos, temporada y jornada); con otros filtros se agregan las filas
+        restrictivas = self.indice.columnas_restrictivas(estado.como_dict())
+        tabla = self.cubo_zonas.seleccionar(estado, restrictivas)
+        if tabla is not None:
+            return tabla
+        return zonas.agregar(self.filtrar(estado))
+
+    # ---- RESÚMENES DE FILAS (misma interfaz que consultas.AnalisisSQL, que los resuelve con GROUP BY) ----
+    def top_ejecutores(self, estado, n=10):
+        return top_ejecutores(self.filtrar(estado, ['jugador_ejecutor']), n)
+
+    def aristas(self, estado):
+        return red.aristas(self.filtrar(estado, [red.ORIGEN, red.DESTINO, 'tiro', 'gol']))
+
+    def puntos(self, estado, x_col, y_col, columnas=(), maximo=None):
+        # Filas filtradas con coordenadas (solo las columnas pedidas); None si son más de `maximo`
+        puntos = self.filtrar(estado, [x_col, y_col, *columnas]).dropna(subset=[x_col, y_col])
+        return None if maximo is not None and len(puntos) > maximo else puntos
+
+    def densidad(self, estado, x_col, y_col, rejilla=campo.REJILLA):
+        # (conteos, suma de xG) por celda de la rejilla del campo, matrices (ny, nx)
+        puntos = self.puntos(estado, x_col, y_col, ['xg_tiro'] if 'xg_tiro' in self.columnas else [])
+        xg = puntos['xg_tiro'].to_numpy(dtype=float) if 'xg_tiro' in puntos.columns else None
+        _, _, conteos, suma_xg = campo.binning(
+            puntos[x_col].to_numpy(dtype=float), puntos[y_col].to_numpy(dtype=float), xg, rejilla
+        )
+        return conteos, suma_xg
+
+
+# ---- CÁLCULOS DE LAS PÁGINAS ----
+def abp_por_tipo(agg):
+    return cubo.conteo(agg, 'abp_tipo')
+
+
+def abp_por_jornada(agg):
+    return cubo.enrollar(agg, 'jornada')[['jornada', 'abp']].rename(columns={'abp': 'Cantidad'})
+
+
+def abp_por_equipo(agg, col):
+    return cubo.conteo(agg, col)
+
+
+def xg_medio_por_tipo(agg):
+    return cubo.xg_medio(agg, 'abp_tipo')
+
+
+def porcentaje_tiro(agg):
+    total = agg['abp'].sum()
+    return float(agg['tiros'].sum() / total * 100) if total > 0 else 0.0
+
+
+def top_ejecutores(df, n=10):
+    # Empates por orden alfabético, sea cual sea el dtype (categórico en pandas, texto desde SQL)
+    conteos = df['jugador_ejecutor'].value_counts().sort_index().sort_values(ascending=False, kind='stable')
+    # Con dtype categórico value_counts incluye jugadores sin ABP en el filtro
+    top = conteos[conteos > 0].reset_index().head(n)
+    top.columns = ['jugador_ejecutor', 'count']
+    return top
+
+
+def xg_por_jornada(agg, equipos, jornadas):
+    # xG por equipo atacante y jornada, con 0 en las jornadas sin ABP
+    xg = (
+        cubo.enrollar(agg, ['equipo_atacante', 'jornada'])
+        [['equipo_atacante', 'jornada', 'xg_suma']]
+        .rename(columns={'xg_suma': 'xg_tiro'})
+    )
+    full_idx = pd.MultiIndex.from_product([equipos, jornadas], names=['equipo_atacante', 'jornada'])
+    return xg.set_index(['equipo_atacante', 'jornada']).reindex(full_idx, fill_value=0).reset_index()
+
+
+def ranking_defensivo(agg, con_goles=True, ventana=None, criterio='Tiros/ABP', semivida=None):
+    # Ranking al cierre del último periodo; para varias ventanas sobre el mismo filtro, reutilizar RankingDefensivo
+    return RankingDefensivo(agg).tabla(ventana=ventana, criterio=criterio, semivida=semivida, con_goles=con_goles)
+
+
+# Columna del equipo analizado y de su rival según la perspectiva
+PERSPECTIVAS = {'ataque': ('equipo_atacante', 'equipo_defensor'), 'defensa': ('equipo_defensor', 'equipo_atacante')}
+METRICAS_EQUIPO = ['abp', 'tiros', 'goles', 'xg']
+# Columna por la que se divide cada métrica (sin minutos en los datos, un partido equivale a 90')
+NORMALIZACIONES = {'total': None, 'por_partido': 'partidos', 'por_abp': 'abp'}
+
+
+def comparativa_equipos(agg, calendario, equipos, perspectiva='ataque'):
+    # Métricas por equipo y jornada para todos los equipos a la vez: un único roll-up del cubo filtrado.
+    # En 'defensa' las métricas son las concedidas. Devuelve una fila por (equipo, jornada), con ceros si no hubo ABP.
+    # Los partidos salen de calendario, el cubo filtrado solo por temporada y jornada: con un filtro de ABP
+    # (p. ej. solo penaltis) agg solo tiene las jornadas en que hubo alguna y el "por partido" saldría ~1.
+    col, rival = PERSPECTIVAS[perspectiva]
+    equipos = list(equipos)
+    sel = agg[agg[col].isin(equipos)]
+    tabla = cubo.enrollar(sel, [col, 'jornada']).rename(columns={col: 'equipo', 'xg_suma': 'xg'})
+    # Partidos: (temporada, jornada) en los que el equipo aparece en cualquiera de los dos lados
+    lados = pd.concat(
+        [
+            calendario[['temporada', 'jornada', c]].set_axis(['temporada', 'jornada', 'equipo'], axis=1)
+            for c in (col, rival)
+        ],
+        ignore_index=True,
+    )
+    lados = lados[lados['equipo'].isin(equipos)].drop_duplicates()
+    partidos = lados.groupby(['equipo', 'jornada'], observed=True).size().rename('partidos')
+    jornadas = sorted(calendario['jornada'].dropna().unique())
+    full_idx = pd.MultiIndex.from_product([equipos, jornadas], names=['equipo', 'jornada'])
+    tabla = tabla.astype({'equipo': object}).set_index(['equipo', 'jornada'])[METRICAS_EQUIPO]
+    partidos = partidos.reset_index().astype({'equipo': object}).set_index(['equipo', 'jornada'])['partidos']
+    res = tabla.join(partidos, how='outer').reindex(full_idx).fillna(0)
+    return res.astype({'abp': int, 'tiros': int, 'goles': int, 'partidos': int}).reset_index()
+
+
+def normalizar(tabla, normalizacion='total'):
+    divisor = NORMALIZACIONES[normalizacion]
+    if divisor is None:
+        return tabla
+    tabla = tabla.copy()
+    base = tabla[divisor].where(tabla[divisor] > 0)
+    for m in METRICAS_EQUIPO:
+        if m != divisor:
+            tabla[m] = tabla[m] / base
+    return tabla
+
+
+def resumen_equipos(comparativa, normalizacion='total'):
+    # Totales por equipo (en el orden recibido) a partir de la tabla de comparativa_equipos
+    res = comparativa.groupby('equipo', sort=False)[['partidos', *METRICAS_EQUIPO]].sum().reset_index()
+    return normalizar(res, normalizacion)
+
+
+def comparativa_temporadas(agg):
+    return cubo.enrollar(agg, ['temporada', 'jornada'])[['temporada', 'jornada', 'abp']].rename(columns={'abp': 'Cantidad'})
+
+
+def red_conexiones(df):
+    return red.aristas(df)
+
@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# ---- CACHÉ LRU COMPARTIDA ----
+# Diccionario que recuerda el orden de uso: al pasar de la capacidad se descartan las entradas usadas hace más
+# tiempo. Es segura entre hilos (las sesiones de Streamlit comparten las cachés) y cuenta aciertos y fallos.
+
+
+class CacheLRU:
+    def __init__(self, capacidad=None):
+        # capacidad=None: sin límite de entradas (quien la usa desaloja con su propio criterio, ver desalojar)
+        self.capacidad = capacidad
+        self._entradas = OrderedDict()
+        self._lock = threading.RLock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave, defecto=None, contar=True):
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.aciertos += contar
+                return self._entradas[clave]
+            self.fallos += contar
+            return defecto
+
+    def guardar(self, clave, valor):
+        # Si otro hilo guardó antes la misma clave se conserva la suya, que es la que se devuelve
+        with self._lock:
+            valor = self._entradas.setdefault(clave, valor)
+            self._entradas.move_to_end(clave)
+            if self.capacidad is not None:
+                while len(self._entradas) > self.capacidad:
+                    self._entradas.popitem(last=False)
+            return valor
+
+    def desalojar(self, sobra, minimo=1):
+        # Descarta las menos usadas mientras sobra() sea cierto, dejando al menos `minimo`; devuelve (clave, valor)
+        desalojadas = []
+        with self._lock:
+            while len(self._entradas) > minimo and sobra():
+                desalojadas.append(self._entradas.popitem(last=False))
+        return desalojadas
+
+    def valores(self):
+        # Copia en orden de uso (la menos usada primero), para recorrerla sin retener el lock
+        with self._lock:
+            return list(self._entradas.values())
+
+    def __contains__(self, clave):
+        with self._lock:
+            return clave in self._entradas
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entradas)
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'ratio_aciertos': self.aciertos / total if total else 0.0,
+                'entradas': len(self._entradas),
+                'capacidad': self.capacidad,
+            }
+
+
+# ---- PODA DE FICHEROS EN DISCO ----
+def podar(directorio, maximo, conservar=()):
+    # Deja como mucho `maximo` ficheros en el directorio, borrando los modificados hace más tiempo. No toca los .tmp
+    # a medio escribir ni los de `conservar` (aunque cuentan para el máximo). Devuelve las rutas borradas.
+    fechas = {}
+    for p in Path(directorio).iterdir():
+        if p.suffix == ".tmp":
+            continue
+        try:
+            fechas[p] = p.stat().st_mtime
+        except FileNotFoundError:
+            continue  # otro proceso lo acaba de borrar
+    conservar = {Path(p) for p in conservar}
+    sobran = len(fechas) - maximo
+    borrados = []
+    for p in sorted(fechas, key=fechas.get):
+        if sobran <= 0:
+            break
+        if p in conservar:
+            continue
+        p.unlink(missing_ok=True)
+        borrados.append(p)
+        sobran -= 1
+    return borrados
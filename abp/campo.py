@@ -0,0 +1,174 @@
+import base64
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.colors import sample_colorscale
+
+# ---- RENDERIZADO DEL CAMPO ----
+# Dimensiones del campo en coordenadas de datos (x_ejecucion / y_ejecucion)
+LARGO, ANCHO = 120, 80
+MAX_PUNTOS = 5000          # por encima se agrega en una rejilla en el servidor
+REJILLA = (24, 16)         # celdas en x e y para el mapa de densidad
+# Imagen de fondo junto al repositorio, para que funcione sea cual sea el directorio de trabajo
+IMAGEN_CAMPO = Path(__file__).resolve().parent.parent / "Campo xG.png"
+
+
+@lru_cache(maxsize=8)
+def imagen_campo(ruta, ancho_max=600):
+    # Se abre, reduce y codifica una sola vez por proceso; las figuras reutilizan el mismo data URI
+    from PIL import Image
+
+    with Image.open(ruta) as img:
+        img = img.copy()
+    img.thumbnail((ancho_max, ancho_max))
+    buffer = BytesIO()
+    img.save(buffer, format="PNG", optimize=True)
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def _figura_base(campo_img_path):
+    fig = go.Figure()
+    fig.add_layout_image(
+        dict(
+            source=imagen_campo(campo_img_path),
+            xref="x",
+            yref="y",
+            x=0,
+            y=ANCHO,
+            sizex=LARGO,
+            sizey=ANCHO,
+            sizing="stretch",
+            layer="below"
+        )
+    )
+    return fig
+
+
+def _trazas_puntos(fig, df, x_col, y_col, color_col):
+    x = df[x_col].to_numpy()
+    y = df[y_col].to_numpy()
+    if color_col and color_col in df.columns:
+        # Una sola pasada: groupby da las posiciones de cada categoría sin volver a filtrar el frame
+        for tipo, posiciones in df.groupby(color_col, sort=False, observed=True).indices.items():
+            fig.add_trace(go.Scattergl(
+                x=x[posiciones], y=y[posiciones],
+                mode="markers",
+                name=str(tipo),
+                marker=dict(size=10),
+                hoverinfo="text",
+                text=str(tipo)
+            ))
+    else:
+        fig.add_trace(go.Scattergl(
+            x=x, y=y,
+            mode="markers",
+            marker=dict(size=10, color='red'),
+            name="Ejecuciones"
+        ))
+
+
+def celdas(x, y, rejilla=REJILLA):
+    # Celda (ix, iy) de cada punto; los de fuera del campo van a la celda del borde.
+    # consultas.AnalisisSQL.densidad hace la misma cuenta en SQL: si se cambia aquí, cambiarla también allí
+    nx, ny = rejilla
+    ix = np.clip(np.floor(np.asarray(x, dtype=float) * nx / LARGO), 0, nx - 1).astype(np.intp)
+    iy = np.clip(np.floor(np.asarray(y, dtype=float) * ny / ANCHO), 0, ny - 1).astype(np.intp)
+    return ix, iy
+
+
+def binning(x, y, xg=None, rejilla=REJILLA):
+    # Conteos y xG por celda de la rejilla; devuelve (bordes_x, bordes_y, conteos, xg) con forma (ny, nx)
+    nx, ny = rejilla
+    bordes_x = np.linspace(0, LARGO, nx + 1)
+    bordes_y = np.linspace(0, ANCHO, ny + 1)
+    ix, iy = celdas(x, y, rejilla)
+    celda = iy * nx + ix
+    conteos = np.bincount(celda, minlength=nx * ny).reshape(ny, nx).astype(float)
+    suma_xg = None
+    if xg is not None:
+        suma_xg = np.bincount(celda, weights=np.nan_to_num(xg), minlength=nx * ny).reshape(ny, nx)
+    return bordes_x, bordes_y, conteos, suma_xg
+
+
+def _traza_densidad(fig, conteos, suma_xg):
+    ny, nx = conteos.shape
+    z = np.where(conteos > 0, conteos, np.nan)
+    customdata = suma_xg if suma_xg is not None else np.zeros_like(conteos)
+    fig.add_trace(go.Heatmap(
+        x=(np.arange(nx) + 0.5) * LARGO / nx,
+        y=(np.arange(ny) + 0.5) * ANCHO / ny,
+        z=z,
+        customdata=customdata,
+        colorscale="YlOrRd",
+        opacity=0.75,
+        name="Densidad",
+        colorbar=dict(title="ABP"),
+        hovertemplate="ABP: %{z}<br>xG: %{customdata:.2f}<extra></extra>"
+    ))
+
+
+def _ejes_campo(fig, title, showlegend=False):
+    fig.update_xaxes(range=[-5, LARGO + 5], constrain="domain", showgrid=False, showticklabels=False, visible=False)
+    fig.update_yaxes(range=[-5, ANCHO + 5], scaleanchor="x", scaleratio=1, constrain="domain", showgrid=False, showticklabels=False, visible=False)
+    fig.update_layout(
+        title=title,
+        width=900,
+        height=int(900 / 2.25),
+        showlegend=showlegend,
+        plot_bgcolor="white",
+        margin=dict(l=10, r=10, t=40, b=10)
+    )
+    return fig
+
+
+def figura_rejilla(valores, title, etiqueta="ABP", campo_img_path=IMAGEN_CAMPO):
+    # Mapa de calor de una matriz (ny, nx) ya agregada por celda
+    ny, nx = valores.shape
+    fig = _figura_base(campo_img_path)
+    fig.add_trace(go.Heatmap(
+        x=(np.arange(nx) + 0.5) * LARGO / nx,
+        y=(np.arange(ny) + 0.5) * ANCHO / ny,
+        z=np.where(valores > 0, valores, np.nan),
+        colorscale="YlOrRd",
+        opacity=0.75,
+        colorbar=dict(title=etiqueta),
+        hovertemplate=f"{etiqueta}: %{{z:.3g}}<extra></extra>"
+    ))
+    return _ejes_campo(fig, title)
+
+
+def figura_zonas(zonas, valores, title, etiqueta="ABP", campo_img_path=IMAGEN_CAMPO):
+    # zonas: {nombre: (x0, x1, y0, y1)}; valores: {nombre: valor}. Cada zona se pinta con su valor encima
+    fig = _figura_base(campo_img_path)
+    conocidos = [v for v in valores.values() if v == v]
+    maximo = max(conocidos) if conocidos and max(conocidos) > 0 else 1
+    for nombre, (x0, x1, y0, y1) in zonas.items():
+        valor = valores.get(nombre)
+        tiene = valor is not None and valor == valor
+        color = sample_colorscale("YlOrRd", [valor / maximo])[0] if tiene else "rgba(0,0,0,0)"
+        fig.add_shape(type="rect", x0=x0, x1=x1, y0=y0, y1=y1, fillcolor=color, opacity=0.6,
+                      line=dict(color="black", width=1), layer="above")
+        fig.add_annotation(x=(x0 + x1) / 2, y=(y0 + y1) / 2, showarrow=False, font=dict(size=10),
+                           text=f"{nombre}<br>{valor:.3g}" if tiene else nombre)
+    return _ejes_campo(fig, f"{title} ({etiqueta})")
+
+
+def figura_densidad(conteos, suma_xg, title="Zonas de ejecución sobre campo", campo_img_path=IMAGEN_CAMPO):
+    # Mapa de densidad de una rejilla ya agregada (binning aquí, o el GROUP BY por celda del motor SQL)
+    fig = _figura_base(campo_img_path)
+    _traza_densidad(fig, conteos, suma_xg)
+    return _ejes_campo(fig, f"{title} (densidad, {int(conteos.sum()):,} ABP)")
+
+
+def figura_campo(df, x_col, y_col, color_col=None, title="Zonas de ejecución sobre campo",
+                 campo_img_path=IMAGEN_CAMPO, max_puntos=MAX_PUNTOS, rejilla=REJILLA):
+    if len(df) > max_puntos:
+        xg = df['xg_tiro'].to_numpy(dtype=float) if 'xg_tiro' in df.columns else None
+        _, _, conteos, suma_xg = binning(df[x_col].to_numpy(dtype=float), df[y_col].to_numpy(dtype=float), xg, rejilla)
+        return figura_densidad(conteos, suma_xg, title, campo_img_path)
+    fig = _figura_base(campo_img_path)
+    _trazas_puntos(fig, df, x_col, y_col, color_col)
+    return _ejes_campo(fig, title, showlegend=True)
@@ -0,0 +1,412 @@
+import importlib.util
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from abp import campo, cubo, red, zonas
+from abp.caches import CacheLRU
+from abp.almacen import COL_ID, FICHERO_CUBO, FICHERO_CUBO_ZONAS, FICHERO_EVENTOS
+from abp.filtros import EstadoFiltros
+from abp.indices import COLUMNAS_FILTRO
+from abp.ingesta import DIR_CACHE
+from abp.registro import PRESUPUESTO_MB
+
+# ---- MOTOR DE CONSULTAS SQL SOBRE EL ALMACÉN (DUCKDB) ----
+# Para almacenes que no caben en memoria: los filtros y agregaciones se ejecutan en DuckDB sobre los Parquet
+# de las particiones, leyendo solo las columnas y grupos de filas necesarios. A pandas solo llegan resultados pequeños.
+# ABP_MOTOR: "auto" (DuckDB solo si está instalado y el almacén supera ABP_MOTOR_UMBRAL_FILAS), "pandas" o "duckdb".
+MOTOR = os.environ.get("ABP_MOTOR", "auto")
+UMBRAL_FILAS = int(os.environ.get("ABP_MOTOR_UMBRAL_FILAS", "2000000"))
+DIR_TEMPORAL = DIR_CACHE / "duckdb"
+
+_TODAS_LAS_JORNADAS = (-np.inf, np.inf)
+# Orden de las filas en el almacén (el del DataFrame de pandas): fichero de la partición y fila dentro del fichero
+ORDEN_ALMACEN = "_fichero, _fila"
+
+
+def duckdb_disponible():
+    return importlib.util.find_spec("duckdb") is not None
+
+
+def elegir_motor(almacen, motor=MOTOR, manifiesto=None):
+    if motor == "auto":
+        return "duckdb" if duckdb_disponible() and almacen.filas(manifiesto) > UMBRAL_FILAS else "pandas"
+    if motor not in ("pandas", "duckdb"):
+        raise ValueError(f"Motor desconocido: {motor}")
+    return motor
+
+
+def _id(col):
+    return '"' + str(col).replace('"', '""') + '"'
+
+
+def _valor(v):
+    # Los valores de los filtros llegan como escalares de numpy/pandas; DuckDB espera tipos de Python
+    return v.item() if isinstance(v, np.generic) else v
+
+
+def _lista(columnas):
+    return ", ".join(_id(c) for c in columnas)
+
+
+class ConsultaSQL:
+    # Filas filtradas sin materializar: la condición, el orden y el número de filas (se cuenta al pedirlo).
+    # Sin orden no hay ORDER BY: con preserve_insertion_order DuckDB entrega las filas en el orden de los ficheros
+    # sin ordenarlas, pero no lo garantiza con LIMIT/OFFSET, así que páginas y exportaciones ordenan siempre.
+    def __init__(self, analisis, where, params, orden=None):
+        self.analisis = analisis
+        self.where = where
+        self.params = params
+        self.orden = orden
+
+    def __len__(self):
+        return self.analisis._contar(self.where, self.params)
+
+    def _sql(self, columnas, orden=None):
+        sql = f"SELECT {_lista(columnas)} FROM eventos WHERE {self.where}"
+        return f"{sql} ORDER BY {orden}" if orden else sql
+
+    def seleccionar(self, columnas, limite=None, desplazamiento=0):
+        if limite is None:
+            return self.analisis._df(self._sql(columnas, self.orden), self.params)
+        sql = self._sql(columnas, self.orden or ORDEN_ALMACEN)
+        return self.analisis._df(f"{sql} LIMIT {int(limite)} OFFSET {int(desplazamiento)}", self.params)
+
+    def bloques(self, tamano, columnas=None):
+        # Exportaciones: la consulta se recorre por lotes, sin cargar el resultado completo
+        cursor = self.analisis._cursor()
+        try:
+            sql = self._sql(columnas or self.analisis.columnas, self.orden or ORDEN_ALMACEN)
+            resultado = cursor.execute(sql, self.params)
+            while True:
+                bloque = resultado.fetch_df_chunk(max(1, tamano // 2048))
+                if bloque.empty:
+                    break
+                yield bloque
+        finally:
+            cursor.close()
+
+
+class AnalisisSQL:
+    # Misma interfaz que analitica.Analisis (estado, filtrar, facetas, agregados) resuelta con consultas SQL
+    def __init__(self, almacen, capacidad_conteos=128, capacidad_resumenes=32):
+        import duckdb
+
+        nombres = sorted(almacen.manifiesto()["particiones"])
+        eventos = [str(almacen.directorio / n / FICHERO_EVENTOS) for n in nombres]
+        cubos = [str(almacen.directorio / n / FICHERO_CUBO) for n in nombres]
+        cubos_zonas = [str(almacen.directorio / n / FICHERO_CUBO_ZONAS) for n in nombres]
+        DIR_TEMPORAL.mkdir(parents=True, exist_ok=True)
+        self._con = duckdb.connect(config={
+            "memory_limit": f"{PRESUPUESTO_MB}MB",
+            "temp_directory": str(DIR_TEMPORAL),
+            "preserve_insertion_order": True,
+        })
+        # Fichero y fila dentro del fichero: las particiones en el orden del almacén, como el DataFrame de pandas
+        self._con.execute(f"""
+            CREATE VIEW eventos AS
+            SELECT * EXCLUDE (filename, file_row_number), filename AS _fichero, file_row_number AS _fila
+            FROM read_parquet({eventos!r}, union_by_name=true, hive_partitioning=false,
+                              filename=true, file_row_number=true)
+        """)
+        for vista, ficheros in (("cubo", cubos), ("cubo_zonas", cubos_zonas)):
+            self._con.execute(
+                f"CREATE VIEW {vista} AS SELECT * FROM read_parquet({ficheros!r}, union_by_name=true, hive_partitioning=false)"
+            )
+        columnas = [f[0] for f in self._con.execute("SELECT * FROM eventos LIMIT 0").description]
+        self.columnas = [c for c in columnas if c not in (COL_ID, '_fichero', '_fila')]
+        dims = [f[0] for f in self._con.execute("SELECT * FROM cubo LIMIT 0").description]
+        self.dimensiones_cubo = [d for d in cubo.DIMENSIONES if d in dims]
+        dims = [f[0] for f in self._con.execute("SELECT * FROM cubo_zonas LIMIT 0").description]
+        self.dimensiones_zonas = [d for d in zonas.DIMENSIONES if d in dims]
+        self.n = self._con.execute("SELECT count(*) FROM eventos").fetchone()[0]
+        self.cache = None  # sin caché de filas: DuckDB ya cachea los metadatos de los Parquet
+        self._conteos = CacheLRU(capacidad_conteos)
+        self._resumenes = CacheLRU(capacidad_resumenes)  # facetas y resúmenes por estado de los filtros
+        self._perfiles = {}
+        self._lock = threading.Lock()
+
+    # ---- EJECUCIÓN ----
+    def _cursor(self):
+        # Un cursor por consulta: la conexión se comparte entre sesiones (hilos)
+        return self._con.cursor()
+
+    def _df(self, sql, params=()):
+        cursor = self._cursor()
+        try:
+            return cursor.execute(sql, list(params)).df()
+        finally:
+            cursor.close()
+
+    def _contar(self, where, params):
+        clave = (where, tuple(params))
+        n = self._conteos.obtener(clave)
+        if n is None:
+            n = int(self._df(f"SELECT count(*) AS n FROM eventos WHERE {where}", params)['n'].iloc[0])
+            n = self._conteos.guardar(clave, n)
+        return n
+
+    def _resumen(self, clave, calcular):
+        # Resultados pequeños (facetas, top, aristas, densidad) que se repiten en cada rerun con los mismos filtros
+        resultado = self._resumenes.obtener(clave)
+        if resultado is None:
+            resultado = self._resumenes.guardar(clave, calcular())
+        return resultado
+
+    def esqueleto(self):
+        # DataFrame sin filas con las columnas y tipos del almacén (para comprobar columnas y el esquema de exportación)
+        df = self._df(f"SELECT {_lista(self.columnas)} FROM eventos LIMIT 0")
+        # Sin filas DuckDB devuelve el texto como object, que Arrow no sabe tipar
+        return df.astype({c: 'str' for c in df.columns if df[c].dtype == object})
+
+    # ---- METADATOS ----
+    def _perfil(self, col):
+        # Valores distintos (ordenados), si la columna tiene nulos y filas por valor; una consulta por columna
+        with self._lock:
+            if col in self._perfiles:
+                return self._perfiles[col]
+        res = self._df(f"SELECT {_id(col)} AS v, count(*) AS n FROM eventos GROUP BY 1")
+        nulos = res['v'].isna()
+        conteos = dict(zip(res['v'][~nulos].tolist(), res['n'][~nulos].tolist()))
+        valores = sorted(conteos)
+        perfil = (valores, bool(nulos.any()), pd.Series([conteos[v] for v in valores], index=pd.Index(valores)))
+        with self._lock:
+            return self._perfiles.setdefault(col, perfil)
+
+    def valores(self, col):
+        return self._perfil(col)[0] if col in self.columnas else []
+
+    def rango_jornadas(self):
+        res = self._df("SELECT min(jornada) AS desde, max(jornada) AS hasta FROM eventos")
+        return int(res['desde'].iloc[0]), int(res['hasta'].iloc[0])
+
+    def _es_trivial(self, col, valores):
+        # Igual que en el índice de pandas: todos los valores de una columna sin nulos no descartan filas
+        todos, nulos, _ = self._perfil(col)
+        return not nulos and set(todos) <= {_valor(v) for v in valores}
+
+    def columnas_restrictivas(self, selecciones):
+        return {col for col, valores in selecciones.items() if not self._es_trivial(col, valores)}
+
+    # ---- FILTROS ----
+    def estado(self, selecciones=None, jornada=None):
+        columnas = [c for c in COLUMNAS_FILTRO if c in self.columnas]
+        selecciones = {col: sel for col, sel in (selecciones or {}).items() if col in columnas}
+        return EstadoFiltros.desde(selecciones, jornada or _TODAS_LAS_JORNADAS)
+
+    def _condicion(self, col, valores):
+        # Condición SQL de un filtro, o None si no descarta filas
+        if self._es_trivial(col, valores):
+            return None
+        if not valores:
+            return "FALSE", []
+        return f"{_id(col)} IN ({', '.join('?' * len(valores))})", [_valor(v) for v in valores]
+
+    def condiciones(self, estado):
+        # Cláusula WHERE con parámetros; la jornada nula nunca entra en un rango, como en el índice de pandas
+        partes, params = ["jornada BETWEEN ? AND ?"], [float(estado.jornada[0]), float(estado.jornada[1])]
+        for col, valores in estado.selecciones:
+            condicion = self._condicion(col, valores)
+            if condicion is not None:
+                partes.append(condicion[0])
+                params.extend(condicion[1])
+        return " AND ".join(partes), params
+
+    def filas(self, estado):
+        return ConsultaSQL(self, *self.condiciones(estado))
+
+    def filtrar(self, estado, columnas=None):
+        # Solo se leen las columnas pedidas de las filas que cumplen los filtros
+        columnas = [c for c in (columnas or self.columnas) if c in self.columnas]
+        return self.filas(estado).seleccionar(columnas)
+
+    def facetas(self, estado, columnas=None):
+        # Misma pasada única que IndiceFiltros.facetas, en una sola consulta con GROUPING SETS: una fila cuenta
+        # para todas las facetas si cumple todos los filtros, o solo para la del único filtro que incumple
+        columnas = [c for c in (columnas or COLUMNAS_FILTRO) if c in self.columnas and c in COLUMNAS_FILTRO]
+        if not columnas:
+            return {}
+        if self._sin_filtros(estado):
+            # Sin filtros que descarten filas, cada faceta es el conteo de su columna
+            return {col: self._perfil(col)[2] for col in columnas}
+        return self._resumen(("facetas", estado, tuple(columnas)), lambda: self._facetas_filtradas(estado, columnas))
+
+    def _sin_filtros(self, estado):
+        jornadas, nulos, _ = self._perfil('jornada')
+        if nulos or (jornadas and not estado.jornada[0] <= jornadas[0] <= jornadas[-1] <= estado.jornada[1]):
+            return False
+        return all(self._condicion(col, valores) is None for col, valores in estado.selecciones)
+
+    def _facetas_filtradas(self, estado, columnas):
+        activas, marcas, params = [], [], []
+        for col, valores in estado.selecciones:
+            condicion = self._condicion(col, valores)
+            if condicion is not None:
+                activas.append(col)
+                marcas.append(f"coalesce({condicion[0]}, FALSE) AS _ok{len(marcas)}")
+                params.extend(condicion[1])
+        params += [float(estado.jornada[0]), float(estado.jornada[1])]
+        fallos = " + ".join(f"(NOT _ok{i})::INTEGER" for i in range(len(activas))) or "0"
+        valores = []
+        for i, col in enumerate(columnas):
+            cuenta = "_fallos = 0"
+            if col in activas:
+                cuenta += f" OR (_fallos = 1 AND NOT _ok{activas.index(col)})"
+            valores.append(f"CASE WHEN {cuenta} THEN {_id(col)} END AS _v{i}")
+        grupos = ", ".join(f"(_v{i})" for i in range(len(columnas)))
+        res = self._df(f"""
+            WITH marcadas AS (
+                SELECT {_lista(columnas)}{''.join(', ' + m for m in marcas)} FROM eventos WHERE jornada BETWEEN ? AND ?
+            ), contadas AS (
+                SELECT *, {fallos} AS _fallos FROM marcadas
+            )
+            SELECT {', '.join(f'_v{i}' for i in range(len(columnas)))}, count(*) AS _n
+            FROM (SELECT {', '.join(valores)} FROM contadas WHERE _fallos <= 1)
+            GROUP BY GROUPING SETS ({grupos})
+        """, params)
+        resultado = {}
+        for i, col in enumerate(columnas):
+            # Cada conjunto agrupa por una sola columna; en las filas de los demás esa columna es nula
+            parte = res[res[f'_v{i}'].notna()].sort_values(f'_v{i}')
+            resultado[col] = pd.Series(parte['_n'].to_numpy(), index=pd.Index(parte[f'_v{i}'].tolist()))
+        return resultado
+
+    # ---- AGREGADOS ----
+    def agregados(self, estado):
+        # Desde el cubo si los filtros restrictivos son dimensiones suyas; si no, GROUP BY de las filas filtradas.
+        # Devuelve la misma tabla que cubo.agregar sobre las filas filtradas.
+        where, params = self.condiciones(estado)
+        if not self.columnas_restrictivas(estado.como_dict()) - set(self.dimensiones_cubo):
+            return self._df(f"SELECT * FROM cubo WHERE {where}", params)
+        dims = [d for d in cubo.DIMENSIONES if d in self.columnas]
+        return self._df(
+            f"SELECT {_lista(dims)}, {self._medidas()} FROM eventos WHERE {where} GROUP BY {_lista(dims)}", params
+        )
+
+    def agregados_zonas(self, estado):
+        # Misma tabla que zonas.agregar: un GROUPING SET por columna de zona o celda, sin las filas sin coordenadas
+        where, params = self.condiciones(estado)
+        if not self.columnas_restrictivas(estado.como_dict()) - set(self.dimensiones_zonas):
+            return self._df(f"SELECT * FROM cubo_zonas WHERE {where}", params)
+        base = [d for d in zonas.DIMENSIONES if d in self.columnas]
+        columnas = [c for c in zonas.columnas() if c in self.columnas]
+        if not columnas:
+            return pd.DataFrame(columns=base + cubo.MEDIDAS)
+        grupos = ", ".join(f"({_lista(base + [c])})" for c in columnas)
+        return self._df(f"""
+            SELECT {_lista(base + columnas)}, {self._medidas()} FROM eventos WHERE {where}
+            GROUP BY GROUPING SETS ({grupos})
+            HAVING NOT ({' AND '.join(f'{_id(c)} IS NULL' for c in columnas)})
+        """, params)
+
+    # ---- RESÚMENES DE FILAS ----
+    # Las páginas no traen las filas filtradas: DuckDB devuelve ya agrupado lo que pintan, o las filas
+    # cuando son pocas (puntos del campo)
+    def top_ejecutores(self, estado, n=10):
+        # Misma tabla que analitica.top_ejecutores: empates por orden alfabético
+        if 'jugador_ejecutor' not in self.columnas:
+            return pd.DataFrame(columns=['jugador_ejecutor', 'count'])
+        where, params = self.condiciones(estado)
+        return self._resumen(("top_ejecutores", estado, n), lambda: self._df(f"""
+            SELECT jugador_ejecutor, count(*) AS count FROM eventos
+            WHERE {where} AND jugador_ejecutor IS NOT NULL
+            GROUP BY jugador_ejecutor ORDER BY count DESC, jugador_ejecutor LIMIT {int(n)}
+        """, params))
+
+    def aristas(self, estado):
+        # Misma tabla que red.aristas: ABP, tiros y goles por pareja ejecutor -> objetivo
+        if red.ORIGEN not in self.columnas or red.DESTINO not in self.columnas:
+            return pd.DataFrame(columns=[red.ORIGEN, red.DESTINO, 'peso', 'tiros', 'goles'])
+        return self._resumen(("aristas", estado), lambda: self._aristas(estado))
+
+    def _aristas(self, estado):
+        where, params = self.condiciones(estado)
+        parejas = _lista([red.ORIGEN, red.DESTINO])
+        res = self._df(f"""
+            SELECT {parejas}, {self._medidas()} FROM eventos
+            WHERE {where} AND {_id(red.ORIGEN)} IS NOT NULL AND {_id(red.DESTINO)} IS NOT NULL
+            GROUP BY {parejas} ORDER BY {parejas}
+        """, params)
+        return res[[red.ORIGEN, red.DESTINO, 'abp', 'tiros', 'goles']].rename(columns={'abp': 'peso'})
+
+    def _con_coordenadas(self, estado, x_col, y_col):
+        where, params = self.condiciones(estado)
+        return f"{where} AND {_id(x_col)} IS NOT NULL AND {_id(y_col)} IS NOT NULL", params
+
+    def puntos(self, estado, x_col, y_col, columnas=(), maximo=None):
+        # Filas filtradas con coordenadas (solo las columnas pedidas); None si son más de `maximo`, sin leerlas
+        consulta = ConsultaSQL(self, *self._con_coordenadas(estado, x_col, y_col))
+        if maximo is not None and len(consulta) > maximo:
+            return None
+        return consulta.seleccionar([c for c in (x_col, y_col, *columnas) if c in self.columnas])
+
+    def densidad(self, estado, x_col, y_col, rejilla=campo.REJILLA):
+        # (conteos, suma de xG) por celda, matrices (ny, nx): la misma celda que campo.celdas, en un GROUP BY
+        clave = ("densidad", estado, x_col, y_col, rejilla)
+        return self._resumen(clave, lambda: self._densidad(estado, x_col, y_col, rejilla))
+
+    def _densidad(self, estado, x_col, y_col, rejilla):
+        nx, ny = rejilla
+        where, params = self._con_coordenadas(estado, x_col, y_col)
+
+        def celda(col, n, largo):
+            return f"least(greatest(floor(CAST({_id(col)} AS DOUBLE) * {n} / {largo}), 0), {n - 1})::INTEGER"
+
+        xg = "coalesce(sum(xg_tiro), 0.0)" if 'xg_tiro' in self.columnas else "NULL"
+        res = self._df(f"""
+            SELECT {celda(x_col, nx, campo.LARGO)} AS ix, {celda(y_col, ny, campo.ANCHO)} AS iy,
+                   count(*) AS n, {xg} AS xg
+            FROM eventos WHERE {where} GROUP BY ix, iy
+        """, params)
+        conteos = np.zeros((ny, nx))
+        conteos[res['iy'], res['ix']] = res['n']
+        suma_xg = None
+        if 'xg_tiro' in self.columnas:
+            suma_xg = np.zeros((ny, nx))
+            suma_xg[res['iy'], res['ix']] = res['xg']
+        return conteos, suma_xg
+
+    def _medidas(self):
+        medidas = [
+            "count(*) AS abp",
+            "CAST(sum(CASE WHEN tiro THEN 1 ELSE 0 END) AS BIGINT) AS tiros" if 'tiro' in self.columnas else "0 AS tiros",
+            "CAST(sum(CASE WHEN gol THEN 1 ELSE 0 END) AS BIGINT) AS goles" if 'gol' in self.columnas else "0 AS goles",
+        ]
+        if 'xg_tiro' in self.columnas:
+            medidas += ["coalesce(sum(xg_tiro), 0.0) AS xg_suma", "count(xg_tiro) AS xg_n"]
+        else:
+            medidas += ["0.0 AS xg_suma", "0 AS xg_n"]
+        return ", ".join(medidas)
+
+
+# ---- TABLA PAGINADA EN DUCKDB ----
+class VistaTablaSQL:
+    # Misma interfaz que tabla.VistaTabla: búsqueda y orden se añaden a la consulta; solo se trae la página
+    def __init__(self, analisis):
+        self.analisis = analisis
+        self._esqueleto = analisis.esqueleto()
+
+    def es_texto(self, col):
+        return col in COLUMNAS_FILTRO or not pd.api.types.is_numeric_dtype(self._esqueleto[col])
+
+    def filas_ordenadas(self, estado, filas, orden=None, ascendente=True, busqueda="", columnas_busqueda=()):
+        where, params = filas.where, list(filas.params)
+        if busqueda:
+            textos = [c for c in columnas_busqueda if self.es_texto(c)]
+            if textos:
+                where += " AND (" + " OR ".join(
+                    f"contains(lower(CAST({_id(c)} AS VARCHAR)), lower(?))" for c in textos
+                ) + ")"
+                params += [busqueda] * len(textos)
+            else:
+                where += " AND FALSE"
+        if orden:
+            # Los empates conservan el orden original de las filas, como el orden estable de pandas
+            orden = f"{_id(orden)} {'ASC' if ascendente else 'DESC'} NULLS LAST, {ORDEN_ALMACEN}"
+        return ConsultaSQL(self.analisis, where, params, orden or ORDEN_ALMACEN)
+
+    def pagina(self, filas, columnas, numero, tamano):
+        return filas.seleccionar(columnas, limite=tamano, desplazamiento=numero * tamano)
+
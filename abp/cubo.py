@@ -0,0 +1,84 @@
+import pandas as pd
+
+# ---- CUBO AGREGADO DE ABP ----
+# Dimensiones por las que se pre-agrega y medidas aditivas que se pueden volver a sumar (roll-up)
+# (las zonas y celdas del campo van en un cubo aparte, ver zonas.agregar: aquí multiplicarían los grupos)
+DIMENSIONES = [
+    'temporada', 'jornada', 'equipo_atacante', 'equipo_defensor', 'abp_tipo',
+    'momento_mitad', 'momento_rango', 'tiro', 'gol',
+]
+MEDIDAS = ['abp', 'tiros', 'goles', 'xg_suma', 'xg_n']
+
+
+def es_si(serie):
+    # Columnas SI/NO ya tipadas como booleano por el esquema; el texto solo llega de fuentes sin esquema
+    if pd.api.types.is_bool_dtype(serie):
+        return serie.fillna(False).astype(bool)
+    return serie.astype(str).str.upper().eq("SI")
+
+
+def agregar(df, dimensiones=DIMENSIONES):
+    # Agrega filas (todas o ya filtradas) al nivel de detalle del cubo
+    dims = [d for d in dimensiones if d in df.columns]
+    medidas = pd.DataFrame({'abp': 1}, index=df.index)
+    medidas['tiros'] = es_si(df['tiro']).astype(int) if 'tiro' in df.columns else 0
+    medidas['goles'] = es_si(df['gol']).astype(int) if 'gol' in df.columns else 0
+    if 'xg_tiro' in df.columns:
+        medidas['xg_suma'] = df['xg_tiro'].fillna(0.0)
+        medidas['xg_n'] = df['xg_tiro'].notna().astype(int)
+    else:
+        medidas['xg_suma'] = 0.0
+        medidas['xg_n'] = 0
+    medidas[dims] = df[dims]
+    return medidas.groupby(dims, dropna=False, observed=True, sort=False)[MEDIDAS].sum().reset_index()
+
+
+def enrollar(tabla, por):
+    # Roll-up del cubo a las dimensiones pedidas; los grupos con valor nulo se descartan como en value_counts
+    if isinstance(por, str):
+        por = [por]
+    return tabla.groupby(por, observed=True)[MEDIDAS].sum().reset_index()
+
+
+def conteo(tabla, col):
+    # Equivalente a df[col].value_counts() pero leyendo el cubo
+    res = enrollar(tabla, col)[[col, 'abp']].rename(columns={'abp': 'count'})
+    return res.sort_values('count', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def xg_medio(tabla, col):
+    res = enrollar(tabla, col)
+    res['xg_tiro'] = res['xg_suma'] / res['xg_n'].where(res['xg_n'] > 0)
+    return res[[col, 'xg_tiro']]
+
+
+def kpis(tabla):
+    return {
+        'abp': int(tabla['abp'].sum()),
+        'equipos_atacantes': tabla['equipo_atacante'].nunique(),
+        'equipos_defensores': tabla['equipo_defensor'].nunique(),
+        'tiros': int(tabla['tiros'].sum()),
+        'goles': int(tabla['goles'].sum()),
+        'xg': float(tabla['xg_suma'].sum()),
+    }
+
+
+class CuboABP:
+    def __init__(self, df=None, tabla=None, dimensiones=DIMENSIONES, agregar=agregar):
+        # Se construye desde las filas o desde una tabla ya agregada (p. ej. los cubos por partición del almacén)
+        self.tabla = tabla if tabla is not None else agregar(df)
+        self.dimensiones = [d for d in dimensiones if d in self.tabla.columns]
+
+    def memoria(self):
+        return int(self.tabla.memory_usage(deep=True).sum())
+
+    def seleccionar(self, estado, restrictivas):
+        # Devuelve la parte del cubo que cumple los filtros, o None si algún filtro cae fuera de sus dimensiones
+        if set(restrictivas) - set(self.dimensiones):
+            return None
+        t = self.tabla
+        mascara = t['jornada'].between(*estado.jornada)
+        for col, valores in estado.selecciones:
+            if col in restrictivas:
+                mascara &= t[col].isin(valores)
+        return t[mascara]
@@ -0,0 +1,114 @@
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# ---- ESQUEMA TIPADO DE LOS DATOS ABP ----
+# Se aplica una vez al ingerir; las páginas trabajan ya con tipos compactos.
+OBLIGATORIAS = ['temporada', 'jornada', 'equipo_atacante', 'equipo_defensor', 'abp_tipo', 'jugador_ejecutor', 'tiro', 'gol']
+
+CATEGORIAS = [
+    'temporada', 'lv_atacante', 'equipo_atacante', 'lv_defensor', 'equipo_defensor', 'abp_tipo',
+    'jugador_ejecutor', 'portero_defensor', 'momento_resultado_atacante', 'momento_resultado_defensor',
+    'momento_rango', 'momento_mitad', 'situacion_numerica_atacante', 'situacion_numerica_defensor',
+    'tipo_defensa', 'ejecucion_tipo', 'jugador_objetivo', 'abp_resultado', 'jugador_gol',
+    'primer_contacto', 'zona_primer_contacto', 'zona_tiro', 'zona_resultado_tiro', 'resultado_tiro',
+    # Hoja del Excel de la que viene cada evento (la añade la ingesta)
+    'origen',
+]
+SI_NO = ['tiro', 'gol', 'portero_ataca']
+ENTEROS = [
+    'jornada', 'zona_ejecucion', 'momento_minuto',
+    'jugadores_area_atacante', 'jugadores_corta_atacante', 'jugadores_frontal_atacante', 'jugadores_cerrando_atacante',
+    'jugadores_area_defensor', 'jugadores_corta_defensor', 'jugadores_frontal_defensor', 'jugadores_marca_defensor',
+    'jugadores_zona_defensor', 'jugadores_descolgados_defensor',
+]
+COORDENADAS = ['x_tiro', 'y_tiro', 'x_ejecucion', 'y_ejecucion']
+DECIMALES = ['xg_tiro']
+
+_VALORES_SI_NO = {"SI": True, "NO": False}
+
+
+class ErrorEsquema(ValueError):
+    pass
+
+
+def _sin_acentos(texto):
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+
+
+def _ejemplos(valores, n=5):
+    return ", ".join(repr(v) for v in list(dict.fromkeys(valores))[:n])
+
+
+def a_booleano(serie, col):
+    if pd.api.types.is_bool_dtype(serie):
+        return serie.astype('boolean')
+    texto = serie.dropna().astype(str).str.strip().str.upper().map(_sin_acentos)
+    invalidos = texto[~texto.isin(list(_VALORES_SI_NO))]
+    if len(invalidos):
+        raise ErrorEsquema(f"La columna '{col}' solo admite SI/NO; valores no válidos: {_ejemplos(serie[invalidos.index])}")
+    resultado = pd.Series(pd.NA, index=serie.index, dtype='boolean')
+    resultado[texto.index] = texto.map(_VALORES_SI_NO).astype(bool)
+    return resultado
+
+
+def a_numero(serie, col):
+    numeros = pd.to_numeric(serie, errors='coerce')
+    perdidos = serie.notna() & numeros.isna()
+    if perdidos.any():
+        raise ErrorEsquema(f"La columna '{col}' debe ser numérica; valores no válidos: {_ejemplos(serie[perdidos])}")
+    return numeros
+
+
+def a_entero_compacto(serie, col):
+    # Entero más pequeño que quepa; con nulos o decimales se queda en float32
+    numeros = a_numero(serie, col)
+    if numeros.isna().any() or not np.all(np.mod(numeros.to_numpy(dtype=float), 1) == 0):
+        return numeros.astype('float32')
+    return pd.to_numeric(numeros.astype('int64'), downcast='integer')
+
+
+def a_categoria(serie):
+    # Categorías ordenadas y sin valores sin uso: el código de cada fila conserva el orden alfabético
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.astype('category')
+    serie = serie.cat.remove_unused_categories()
+    if not serie.cat.categories.is_monotonic_increasing:
+        serie = serie.cat.set_categories(serie.cat.categories.sort_values())
+    return serie
+
+
+def aplicar_esquema(df, copiar=True):
+    faltan = [c for c in OBLIGATORIAS if c not in df.columns]
+    if faltan:
+        raise ErrorEsquema(f"Faltan columnas obligatorias: {', '.join(faltan)}")
+    if copiar:
+        df = df.copy()
+    for col in df.columns:
+        if col in SI_NO:
+            df[col] = a_booleano(df[col], col)
+        elif col in CATEGORIAS:
+            df[col] = a_categoria(df[col])
+        elif col in ENTEROS:
+            df[col] = a_entero_compacto(df[col], col)
+        elif col in COORDENADAS:
+            df[col] = a_numero(df[col], col).astype('float32')
+        elif col in DECIMALES:
+            df[col] = a_numero(df[col], col).astype('float64')
+    return df
+
+
+def a_texto_si_no(df):
+    # Para exportar a CSV/Excel con el mismo formato SI/NO que los ficheros originales
+    columnas = [c for c in SI_NO if c in df.columns and pd.api.types.is_bool_dtype(df[c])]
+    if not columnas:
+        return df
+    df = df.copy()
+    for col in columnas:
+        df[col] = df[col].map({True: "SI", False: "NO"}).astype(object)
+    return df
+
+
+def etiqueta_si_no(valor):
+    return "SI" if valor else "NO"
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from abp.caches import podar
+from abp.esquema import a_texto_si_no
+from abp.ingesta import DIR_CACHE
+
+# ---- FORMATOS DE EXPORTACIÓN ----
+FORMATOS = {
+    "CSV": ("csv", "text/csv"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+FILAS_POR_BLOQUE = 50_000
+MAX_FILAS_EXCEL = 1_048_575  # límite de hoja de Excel sin contar la cabecera
+
+
+def _bloques(df, filas, como_texto=False):
+    # filas: posiciones en df, o una consulta del motor SQL que entrega sus propios bloques (df es entonces
+    # un DataFrame vacío con el esquema). como_texto: las columnas SI/NO vuelven a escribirse como en el Excel original
+    if hasattr(filas, "bloques"):
+        bloques = filas.bloques(FILAS_POR_BLOQUE, list(df.columns))
+    else:
+        bloques = (df.iloc[filas[inicio:inicio + FILAS_POR_BLOQUE]] for inicio in range(0, len(filas), FILAS_POR_BLOQUE))
+    for bloque in bloques:
+        yield a_texto_si_no(bloque) if como_texto else bloque
+
+
+def escribir_csv(df, filas, ruta, progreso):
+    with open(ruta, "w", encoding="utf-8", newline="") as f:
+        for i, bloque in enumerate(_bloques(df, filas, como_texto=True)):
+            bloque.to_csv(f, index=False, header=(i == 0))
+            progreso(len(bloque))
+        if len(filas) == 0:
+            df.head(0).to_csv(f, index=False)
+
+
+def escribir_excel(df, filas, ruta, progreso):
+    if len(filas) > MAX_FILAS_EXCEL:
+        raise ValueError(f"Excel admite como máximo {MAX_FILAS_EXCEL:,} filas; usa CSV o Parquet.")
+    import xlsxwriter
+
+    # constant_memory: xlsxwriter vuelca cada fila a disco en lugar de mantener la hoja entera.
+    # Exige escribir fila a fila, por eso no se usa DataFrame.to_excel (escribe por columnas).
+    libro = xlsxwriter.Workbook(str(ruta), {"constant_memory": True, "nan_inf_to_errors": True})
+    hoja = libro.add_worksheet("ABP_filtrado")
+    hoja.write_row(0, 0, [str(col) for col in df.columns])
+    fila = 1
+    for bloque in _bloques(df, filas, como_texto=True):
+        valores = bloque.astype(object).where(bloque.notna(), None)
+        for registro in valores.itertuples(index=False, name=None):
+            hoja.write_row(fila, 0, registro)
+            fila += 1
+        progreso(len(bloque))
+    libro.close()
+
+
+def escribir_parquet(df, filas, ruta, progreso):
+    esquema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(ruta, esquema) as writer:
+        for bloque in _bloques(df, filas):
+            writer.write_table(pa.Table.from_pandas(bloque, schema=esquema, preserve_index=False))
+            progreso(len(bloque))
+
+
+ESCRITORES = {"CSV": escribir_csv, "Excel": escribir_excel, "Parquet": escribir_parquet}
+
+
+# ---- TRABAJOS EN SEGUNDO PLANO ----
+class Trabajo:
+    def __init__(self, formato, ruta, total):
+        self.formato = formato
+        self.ruta = ruta
+        self.total = total
+        self.hechas = 0
+        self.terminado = False
+        self.error = None
+
+    @property
+    def progreso(self):
+        if self.terminado:
+            return 1.0
+        return min(self.hechas / self.total, 1.0) if self.total else 0.0
+
+    def leer(self):
+        # Se pasa a download_button en lugar de ruta.read_bytes: mientras la sesión guarda el botón, guarda
+        # también el trabajo, y el gestor no poda su fichero
+        return self.ruta.read_bytes()
+
+
+class GestorExportaciones:
+    # Genera las exportaciones en hilos y las guarda en disco, una por (dataset, filtros, formato)
+    def __init__(self, directorio=DIR_CACHE / "exportaciones", max_ficheros=32, hilos=2):
+        self.directorio = Path(directorio)
+        self.max_ficheros = max_ficheros
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="exportar")
+        self._trabajos = {}  # en curso o con error
+        self._terminados = weakref.WeakValueDictionary()  # terminados que aún usa alguna sesión
+        self._lock = threading.Lock()
+
+    def _ruta(self, clave, estado, formato):
+        huella = hashlib.sha256(repr((clave, estado)).encode("utf-8")).hexdigest()[:24]
+        return self.directorio / f"{huella}.{FORMATOS[formato][0]}"
+
+    def trabajo(self, clave, estado, formato):
+        # Devuelve el trabajo en curso o ya terminado para estos filtros, o None si no se ha pedido
+        # (o si su fichero ya no está en disco y hay que volver a generarlo)
+        ruta = self._ruta(clave, estado, formato)
+        with self._lock:
+            trabajo = self._trabajos.get(ruta) or self._terminados.get(ruta)
+            if trabajo is not None and not trabajo.terminado:
+                return trabajo
+            if not ruta.exists():
+                self._terminados.pop(ruta, None)
+                return None
+            if trabajo is None:
+                trabajo = Trabajo(formato, ruta, 0)
+                trabajo.terminado = True
+                self._terminados[ruta] = trabajo
+            return trabajo
+
+    def lanzar(self, clave, estado, formato, df, filas):
+        ruta = self._ruta(clave, estado, formato)
+        with self._lock:
+            trabajo = self._trabajos.get(ruta)
+            if trabajo is not None and trabajo.error is None:
+                return trabajo
+            trabajo = self._terminados.get(ruta)
+            if trabajo is not None and ruta.exists():
+                return trabajo
+            trabajo = Trabajo(formato, ruta, len(filas))
+            self._trabajos[ruta] = trabajo
+        self._pool.submit(self._generar, trabajo, df, filas)
+        return trabajo
+
+    def _generar(self, trabajo, df, filas):
+        def avanzar(n):
+            trabajo.hechas += n
+
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        tmp = trabajo.ruta.with_name(f"{trabajo.ruta.stem}.{os.getpid()}.tmp")
+        try:
+            ESCRITORES[trabajo.formato](df, filas, tmp, avanzar)
+            os.replace(tmp, trabajo.ruta)
+            trabajo.terminado = True
+            with self._lock:
+                self._trabajos.pop(trabajo.ruta, None)
+                self._terminados[trabajo.ruta] = trabajo
+                en_uso = list(self._terminados.keys())
+            # Como máximo max_ficheros exportaciones, borrando las más antiguas que ninguna sesión puede descargar
+            podar(self.directorio, self.max_ficheros, conservar=en_uso)
+        except Exception as e:
+            trabajo.error = str(e)
+            tmp.unlink(missing_ok=True)
@@ -0,0 +1,43 @@
+from dataclasses import dataclass
+
+from abp.caches import CacheLRU
+
+
+# ---- ESTADO CANÓNICO DE LOS FILTROS ----
+@dataclass(frozen=True)
+class EstadoFiltros:
+    selecciones: tuple  # ((columna, (valores ordenados...)), ...) ordenado por columna
+    jornada: tuple
+
+    @classmethod
+    def desde(cls, selecciones, jornada_rango):
+        canonicas = tuple(sorted(
+            (col, tuple(sorted(set(valores), key=str))) for col, valores in selecciones.items()
+        ))
+        return cls(canonicas, (jornada_rango[0], jornada_rango[1]))
+
+    def como_dict(self):
+        return {col: list(valores) for col, valores in self.selecciones}
+
+
+# ---- CACHÉ LRU DE FILAS FILTRADAS ----
+class CacheFiltros:
+    # Guarda posiciones de filas (no copias del DataFrame) por estado de filtros
+    def __init__(self, indice, capacidad=64):
+        self.indice = indice
+        self.capacidad = capacidad
+        self._entradas = CacheLRU(capacidad)
+
+    def filas(self, estado):
+        filas = self._entradas.obtener(estado)
+        if filas is not None:
+            return filas
+        filas = self.indice.filtrar(estado.como_dict(), estado.jornada)
+        filas.flags.writeable = False
+        return self._entradas.guardar(estado, filas)
+
+    def memoria(self):
+        return sum(filas.nbytes for filas in self._entradas.valores())
+
+    def estadisticas(self):
+        return self._entradas.estadisticas()
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+# ---- ÍNDICES DE FILTRADO ----
+# Columnas de texto que aparecen como filtro en la barra lateral
+COLUMNAS_FILTRO = [
+    'temporada', 'abp_tipo', 'ejecucion_tipo', 'momento_mitad', 'momento_rango',
+    'equipo_atacante', 'equipo_defensor', 'jugador_ejecutor', 'jugador_objetivo',
+    'portero_defensor', 'portero_ataca', 'tiro', 'gol',
+    'momento_resultado_atacante', 'momento_resultado_defensor',
+    'situacion_numerica_atacante', 'situacion_numerica_defensor',
+]
+
+# Por debajo de esta fracción de filas seleccionadas se recorren listas de filas en lugar de códigos
+_UMBRAL_LISTAS = 0.125
+
+
+class ColumnaCodificada:
+    # Diccionario de valores + código entero por fila + lista ordenada de filas por valor (CSR)
+    def __init__(self, serie):
+        cat = pd.Categorical(serie).remove_unused_categories()
+        if not cat.categories.is_monotonic_increasing:
+            cat = cat.set_categories(cat.categories.sort_values())
+        self.categorias = cat.categories
+        self.codigos = cat.codes
+        self.hay_nulos = bool((self.codigos < 0).any())
+        validos = self.codigos >= 0
+        self.filas = np.argsort(self.codigos, kind='stable')[np.count_nonzero(~validos):].astype(np.int32)
+        self.conteos = np.bincount(self.codigos[validos], minlength=len(self.categorias))
+        self.offsets = np.concatenate(([0], np.cumsum(self.conteos)))
+
+    def codigos_de(self, valores):
+        if len(valores) == 0:
+            return np.array([], dtype=np.intp)
+        codigos = self.categorias.get_indexer(pd.Index(list(valores)))
+        return np.unique(codigos[codigos >= 0])
+
+    def memoria(self):
+        return (self.codigos.nbytes + self.filas.nbytes + self.conteos.nbytes + self.offsets.nbytes
+                + int(self.categorias.memory_usage(deep=True)))
+
+    def filas_de(self, codigo):
+        return self.filas[self.offsets[codigo]:self.offsets[codigo + 1]]
+
+    def es_trivial(self, valores):
+        # Seleccionar todos los valores de una columna sin nulos no descarta ninguna fila
+        return not self.hay_nulos and len(self.codigos_de(valores)) == len(self.categorias)
+
+    def mascara(self, valores):
+        n = len(self.codigos)
+        codigos = self.codigos_de(valores)
+        if len(codigos) == len(self.categorias):
+            return None if not self.hay_nulos else self.codigos >= 0
+        if self.conteos[codigos].sum() < n * _UMBRAL_LISTAS:
+            mascara = np.zeros(n, dtype=bool)
+            for codigo in codigos:
+                mascara[self.filas_de(codigo)] = True
+            return mascara
+        tabla = np.zeros(len(self.categorias) + 1, dtype=bool)
+        tabla[codigos] = True
+        # El código -1 (nulo) cae en la última posición, que siempre es False
+        return tabla[self.codigos]
+
+
+class IndiceFiltros:
+    def __init__(self, df):
+        self.n = len(df)
+        self.columnas = {col: ColumnaCodificada(df[col]) for col in COLUMNAS_FILTRO if col in df.columns}
+        jornada = pd.to_numeric(df['jornada'], errors='coerce').to_numpy(dtype=float)
+        # Índice ordenado de jornada: los NaN quedan al final y nunca entran en un rango
+        self.orden_jornada = np.argsort(jornada, kind='stable').astype(np.int32)
+        self.jornadas_ordenadas = jornada[self.orden_jornada]
+
+    def memoria(self):
+        columnas = sum(c.memoria() for c in self.columnas.values())
+        return columnas + self.orden_jornada.nbytes + self.jornadas_ordenadas.nbytes
+
+    def mascara_jornada(self, desde, hasta):
+        i = np.searchsorted(self.jornadas_ordenadas, desde, side='left')
+        j = np.searchsorted(self.jornadas_ordenadas, hasta, side='right')
+        if i == 0 and j == self.n:
+            return None
+        mascara = np.zeros(self.n, dtype=bool)
+        mascara[self.orden_jornada[i:j]] = True
+        return mascara
+
+    def columnas_restrictivas(self, selecciones):
+        return {col for col, valores in selecciones.items() if not self.columnas[col].es_trivial(valores)}
+
+    def filtrar(self, selecciones, jornada_rango):
+        # selecciones: {columna: valores}; devuelve las posiciones de las filas que cumplen todos los filtros
+        mascara = self.mascara_jornada(*jornada_rango)
+        for col, valores in selecciones.items():
+            parcial = self.columnas[col].mascara(valores)
+            if parcial is None:
+                continue
+            mascara = parcial if mascara is None else (mascara & parcial)
+        if mascara is None:
+            return np.arange(self.n)
+        return np.flatnonzero(mascara)
+
+    def facetas(self, selecciones, jornada_rango, columnas=None):
+        # Conteo por valor de cada columna bajo todos los filtros salvo el suyo, en una sola pasada:
+        # una fila cuenta para todas las facetas si cumple todo, o solo para la del único filtro que incumple
+        columnas = [c for c in (columnas or self.columnas) if c in self.columnas]
+        base = self.mascara_jornada(*jornada_rango)
+        activas, mascaras = [], []
+        for col, valores in selecciones.items():
+            parcial = self.columnas[col].mascara(valores)
+            if parcial is not None:
+                activas.append(col)
+                mascaras.append(parcial)
+        if mascaras:
+            pila = np.stack(mascaras)
+            fallos = len(mascaras) - pila.sum(axis=0, dtype=np.int16)
+            culpable = np.argmin(pila, axis=0)
+            todas = fallos == 0
+            una = fallos == 1
+            if base is not None:
+                todas &= base
+                una &= base
+        resultado = {}
+        for col in columnas:
+            codificada = self.columnas[col]
+            if not mascaras and base is None:
+                conteos = codificada.conteos
+            else:
+                if not mascaras:
+                    seleccion = base
+                elif col in activas:
+                    seleccion = todas | (una & (culpable == activas.index(col)))
+                else:
+                    seleccion = todas
+                codigos = codificada.codigos[seleccion]
+                conteos = np.bincount(codigos[codigos >= 0], minlength=len(codificada.categorias))
+            resultado[col] = pd.Series(conteos, index=codificada.categorias)
+        return resultado
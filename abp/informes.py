@@ -0,0 +1,162 @@
+import argparse
+import json
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from html import escape
+from pathlib import Path
+
+import plotly.express as px
+
+from abp import analitica, red
+from abp.almacen import DIR_DATOS, AlmacenABP
+
+# ---- GENERADOR DE INFORMES EN LOTE ----
+# Uso: python -m abp.informes --salida informes --procesos 4 [--temporada 2024/25] [--equipos "CD Castellon" ...]
+
+_ANALISIS = None  # uno por proceso de trabajo, cargado en el inicializador
+
+
+def _iniciar(directorio, temporadas):
+    global _ANALISIS
+    alm = AlmacenABP(directorio)
+    df = alm.cargar()
+    if temporadas:
+        df = df[df['temporada'].isin(temporadas)].reset_index(drop=True)
+        _ANALISIS = analitica.Analisis(df)
+    else:
+        _ANALISIS = analitica.Analisis(df, tabla_cubo=alm.cargar_cubo(), tabla_zonas=alm.cargar_cubo_zonas())
+
+
+def _nombre_fichero(texto):
+    return re.sub(r"[^\w.-]+", "_", str(texto)).strip("_") or "equipo"
+
+
+def _registros(tabla):
+    return json.loads(tabla.to_json(orient='records', force_ascii=False))
+
+
+def informe_equipo(analisis, equipo):
+    # Pack previo al partido: el equipo atacando y defendiendo, más su lugar en el ranking defensivo
+    df = analisis.df
+    con_goles = 'gol' in df.columns
+    ataque = analisis.estado({'equipo_atacante': [equipo]})
+    defensa = analisis.estado({'equipo_defensor': [equipo]})
+    agg_ataque = analisis.agregados(ataque)
+    agg_defensa = analisis.agregados(defensa)
+    jornadas = sorted(df['jornada'].dropna().unique())
+
+    ranking = analitica.ranking_defensivo(analisis.agregados(analisis.estado()), con_goles=con_goles)
+    posicion = ranking.index[ranking['equipo_defensor'] == equipo]
+    aristas = analisis.aristas(ataque)
+    top_ejecutores = analisis.top_ejecutores(ataque)
+
+    datos = {
+        'equipo': equipo,
+        'ataque': {
+            'kpis': analitica.kpis(agg_ataque),
+            'porcentaje_tiro': analitica.porcentaje_tiro(agg_ataque),
+            'abp_por_tipo': _registros(analitica.abp_por_tipo(agg_ataque)),
+            'xg_medio_por_tipo': _registros(analitica.xg_medio_por_tipo(agg_ataque)),
+            'xg_por_jornada': _registros(analitica.xg_por_jornada(agg_ataque, [equipo], jornadas)),
+            'top_ejecutores': _registros(top_ejecutores),
+            'conexiones': _registros(aristas),
+        },
+        'defensa': {
+            'kpis': analitica.kpis(agg_defensa),
+            'porcentaje_tiro': analitica.porcentaje_tiro(agg_defensa),
+            'abp_por_tipo': _registros(analitica.abp_por_tipo(agg_defensa)),
+            'posicion_ranking': int(posicion[0]) + 1 if len(posicion) else None,
+            'equipos_en_ranking': len(ranking),
+        },
+        'temporadas': _registros(analitica.comparativa_temporadas(agg_ataque)),
+    }
+
+    figuras = [
+        px.bar(analitica.abp_por_tipo(agg_ataque), x='abp_tipo', y='count', title="ABP a favor por tipo"),
+        px.bar(analitica.abp_por_tipo(agg_defensa), x='abp_tipo', y='count', title="ABP en contra por tipo"),
+        px.line(analitica.abp_por_jornada(agg_ataque), x='jornada', y='Cantidad', markers=True, title="ABP a favor por jornada"),
+        px.line(analitica.xg_por_jornada(agg_ataque, [equipo], jornadas), x='jornada', y='xg_tiro', title="xG por jornada"),
+        px.bar(top_ejecutores, x='jugador_ejecutor', y='count', title="Top ejecutores"),
+    ]
+    if not aristas.empty:
+        fig_red = red.figura_red(aristas, red.CacheLayouts().posiciones(aristas))
+        fig_red.update_layout(title="Red de ejecutores y objetivos en ABP")
+        figuras.append(fig_red)
+    return datos, figuras
+
+
+def _html(datos, figuras):
+    ataque, defensa = datos['ataque']['kpis'], datos['defensa']['kpis']
+    filas = "".join(
+        f"<tr><td>{escape(nombre)}</td><td>{ataque[k]}</td><td>{defensa[k]}</td></tr>"
+        for nombre, k in [("ABP", 'abp'), ("Tiros", 'tiros'), ("Goles", 'goles'), ("xG", 'xg')]
+    )
+    graficos = "".join(
+        fig.to_html(full_html=False, include_plotlyjs='cdn' if i == 0 else False)
+        for i, fig in enumerate(figuras)
+    )
+    posicion = datos['defensa']['posicion_ranking']
+    return (
+        f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>ABP {escape(datos['equipo'])}</title></head><body>"
+        f"<h1>Informe ABP: {escape(datos['equipo'])}</h1>"
+        f"<table border='1' cellpadding='4'><tr><th></th><th>A favor</th><th>En contra</th></tr>{filas}</table>"
+        f"<p>Ranking defensivo (tiros/ABP): {posicion or '—'} de {datos['defensa']['equipos_en_ranking']}</p>"
+        f"{graficos}</body></html>"
+    )
+
+
+def _generar(equipo, salida):
+    datos, figuras = informe_equipo(_ANALISIS, equipo)
+    nombre = _nombre_fichero(equipo)
+    (salida / f"{nombre}.json").write_text(json.dumps(datos, ensure_ascii=False, indent=1), encoding="utf-8")
+    (salida / f"{nombre}.html").write_text(_html(datos, figuras), encoding="utf-8")
+    return equipo, nombre
+
+
+def generar_informes(salida, directorio=DIR_DATOS, equipos=None, temporadas=None, procesos=None):
+    salida = Path(salida)
+    salida.mkdir(parents=True, exist_ok=True)
+    if equipos is None:
+        df = AlmacenABP(directorio).cargar()
+        if temporadas:
+            df = df[df['temporada'].isin(temporadas)]
+        equipos = sorted(set(df['equipo_atacante'].dropna()) | set(df['equipo_defensor'].dropna()))
+
+    hechos = {}
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar, initargs=(directorio, temporadas)) as pool:
+        futuros = [pool.submit(_generar, equipo, salida) for equipo in equipos]
+        for futuro in as_completed(futuros):
+            equipo, nombre = futuro.result()
+            hechos[equipo] = nombre
+            print(f"[{len(hechos)}/{len(equipos)}] {equipo}", file=sys.stderr)
+
+    enlaces = "".join(
+        f"<li><a href='{nombre}.html'>{escape(str(equipo))}</a></li>" for equipo, nombre in sorted(hechos.items())
+    )
+    (salida / "index.html").write_text(
+        f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Informes ABP</title></head>"
+        f"<body><h1>Informes ABP</h1><ul>{enlaces}</ul></body></html>",
+        encoding="utf-8",
+    )
+    (salida / "index.json").write_text(json.dumps(hechos, ensure_ascii=False, indent=1), encoding="utf-8")
+    return hechos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera informes ABP estáticos (HTML y JSON) por equipo.")
+    parser.add_argument("--salida", default="informes", help="Carpeta de salida")
+    parser.add_argument("--datos", default=str(DIR_DATOS), help="Carpeta del almacén de datos ABP")
+    parser.add_argument("--equipos", nargs="*", help="Equipos a incluir (por defecto, todos)")
+    parser.add_argument("--temporada", nargs="*", dest="temporadas", help="Limita los datos a estas temporadas")
+    parser.add_argument("--procesos", type=int, default=None, help="Nº de procesos (por defecto, nº de CPUs)")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    hechos = generar_informes(args.salida, args.datos, args.equipos, args.temporadas, args.procesos)
+    print(f"{len(hechos)} informes en {args.salida} ({time.perf_counter() - inicio:.1f}s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import hashlib
+import os
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from abp import esquema
+
+# ---- CACHE COLUMNAR EN DISCO ----
+# Cada Excel se convierte una sola vez a Parquet, identificado por el hash de su contenido.
+DIR_CACHE = Path(os.environ.get("ABP_CACHE_DIR", ".cache_abp"))
+
+
+def hash_contenido(datos):
+    return hashlib.sha256(datos).hexdigest()
+
+
+def normalizar_columnas(df):
+    df.columns = [str(col).strip().lower() for col in df.columns]
+    return df
+
+
+def _tipos_homogeneos(df):
+    # Excel mezcla números y texto en la misma columna (p. ej. zona_resultado_tiro); Arrow no lo admite
+    for col in df.columns:
+        if df[col].dtype == object:
+            no_nulos = df[col].notna()
+            df.loc[no_nulos, col] = df.loc[no_nulos, col].astype(str)
+    return df
+
+
+def ruta_parquet(clave):
+    return DIR_CACHE / f"{clave}.parquet"
+
+
+# ---- LECTURA DEL EXCEL EN STREAMING ----
+# openpyxl en modo solo lectura recorre las filas sin construir la hoja en memoria y las escribe por bloques.
+# Las columnas que usa la app llevan el tipo declarado en el esquema; el resto (descripción, link...) se guarda
+# como texto. Cada hoja con las columnas obligatorias (p. ej. una por temporada o competición) se añade con su
+# nombre en la columna 'origen'.
+FILAS_POR_BLOQUE = 50_000
+COLUMNA_ORIGEN = 'origen'
+NUMERICAS = esquema.ENTEROS + esquema.COORDENADAS + esquema.DECIMALES
+TEXTO = esquema.CATEGORIAS + esquema.SI_NO
+# id_abp no tiene tipo declarado, pero forma parte de la clave de evento (almacen.COLUMNAS_CLAVE)
+COLUMNAS_INGESTA = [
+    c for c in dict.fromkeys(esquema.OBLIGATORIAS + TEXTO + NUMERICAS + ['id_abp']) if c != COLUMNA_ORIGEN
+]
+# Textos que pd.read_excel lee como vacíos
+VALORES_NULOS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+
+def _texto(valor):
+    # Como pd.read_excel + _tipos_homogeneos: los números enteros sin decimales y el resto tal cual, como texto
+    if valor is None or (isinstance(valor, str) and valor in VALORES_NULOS):
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor)
+
+
+def _hojas_de_datos(libro):
+    # (hoja, {columna: índice}, filas declaradas) de cada hoja que tiene las columnas obligatorias
+    hojas, faltan_primera = [], None
+    for hoja in libro.worksheets:
+        # Muchos programas escriben mal la etiqueta <dimension> y en modo solo lectura openpyxl corta las filas y
+        # columnas a ella. Como pd.read_excel, se descarta y solo sirve para estimar el progreso
+        declaradas = hoja.max_row
+        hoja.reset_dimensions()
+        cabecera = next(hoja.iter_rows(max_row=1, values_only=True), ())
+        indices = {}
+        for i, nombre in enumerate(cabecera):
+            col = str(nombre).strip().lower() if nombre is not None else ""
+            if col and col != COLUMNA_ORIGEN and col not in indices:
+                indices[col] = i
+        faltan = [c for c in esquema.OBLIGATORIAS if c not in indices]
+        if not faltan:
+            hojas.append((hoja, indices, declaradas))
+        elif faltan_primera is None:
+            faltan_primera = faltan
+    if not hojas:
+        raise esquema.ErrorEsquema(f"Faltan columnas obligatorias: {', '.join(faltan_primera or esquema.OBLIGATORIAS)}")
+    return hojas
+
+
+def _bloque(filas, columnas, indices, origen, esquema_arrow):
+    # Tabla Arrow de un bloque de filas con el esquema fijo del fichero (las columnas que la hoja no tiene, nulas)
+    valores = list(zip(*filas))
+    arrays = []
+    for col in columnas:
+        if col not in indices:
+            arrays.append(pa.nulls(len(filas), esquema_arrow.field(col).type))
+        elif col in NUMERICAS:
+            serie = pd.Series([None if _texto(v) is None else v for v in valores[indices[col]]], dtype=object)
+            arrays.append(pa.array(esquema.a_numero(serie, col).to_numpy(dtype=float, na_value=np.nan), pa.float64()))
+        else:
+            arrays.append(pa.array([_texto(v) for v in valores[indices[col]]], pa.string()))
+    arrays.append(pa.array([origen] * len(filas), pa.string()))
+    return pa.Table.from_arrays(arrays, schema=esquema_arrow)
+
+
+def excel_a_parquet(datos, clave, progreso=None):
+    # progreso(filas_leidas, total_estimado): el total sale de la dimensión de cada hoja y puede ser None
+    from openpyxl import load_workbook
+
+    libro = load_workbook(BytesIO(datos), read_only=True, data_only=True)
+    try:
+        hojas = _hojas_de_datos(libro)
+        # Primero las del esquema y después las demás, en el orden en que aparecen
+        presentes = list(dict.fromkeys(c for _, indices, _ in hojas for c in indices))
+        columnas = [c for c in COLUMNAS_INGESTA if c in presentes] + [c for c in presentes if c not in COLUMNAS_INGESTA]
+        esquema_arrow = pa.schema(
+            [pa.field(c, pa.float64() if c in NUMERICAS else pa.string()) for c in columnas]
+            + [pa.field(COLUMNA_ORIGEN, pa.string())]
+        )
+        dimensiones = [declaradas for _, _, declaradas in hojas]
+        total = None if None in dimensiones else sum(d - 1 for d in dimensiones)
+        ruta = ruta_parquet(clave)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        # Escritura atómica: otra sesión nunca ve un fichero a medio escribir
+        tmp = ruta.with_suffix(f".{os.getpid()}.tmp")
+        leidas = 0
+        try:
+            with pq.ParquetWriter(tmp, esquema_arrow) as writer:
+                for hoja, indices, _ in hojas:
+                    # Solo se recorren las celdas hasta la última columna usada
+                    ancho = max(indices.values()) + 1
+                    # Una fila sin ningún dato del esquema (p. ej. solo una nota en descripción) no es una ABP
+                    usadas = [i for c, i in indices.items() if c in COLUMNAS_INGESTA]
+                    filas = []
+                    for fila in hoja.iter_rows(min_row=2, max_col=ancho, values_only=True):
+                        if len(fila) < ancho:
+                            fila = fila + (None,) * (ancho - len(fila))
+                        if all(fila[i] is None for i in usadas):
+                            continue
+                        filas.append(fila)
+                        if len(filas) == FILAS_POR_BLOQUE:
+                            writer.write_table(_bloque(filas, columnas, indices, hoja.title, esquema_arrow))
+                            leidas += len(filas)
+                            filas = []
+                            if progreso:
+                                progreso(leidas, total)
+                    if filas:
+                        writer.write_table(_bloque(filas, columnas, indices, hoja.title, esquema_arrow))
+                        leidas += len(filas)
+                        if progreso:
+                            progreso(leidas, total)
+            os.replace(tmp, ruta)
+        finally:
+            tmp.unlink(missing_ok=True)
+    finally:
+        libro.close()
+    return ruta
+
+
+def asegurar_parquet(datos, clave=None, progreso=None):
+    clave = clave or hash_contenido(datos)
+    ruta = ruta_parquet(clave)
+    if not ruta.exists():
+        excel_a_parquet(datos, clave, progreso)
+    return clave
+
+
+def _tipos_como_excel(df):
+    # Mismos tipos que daba pd.read_excel: numéricas sin huecos ni decimales como enteros, e id_abp numérica si
+    # todos sus valores lo son. Así no cambia el identificador de los eventos. Las columnas ajenas al esquema
+    # se quedan como texto.
+    for col in df.columns:
+        serie = df[col]
+        if col == 'id_abp' and not pd.api.types.is_numeric_dtype(serie):
+            numeros = pd.to_numeric(serie, errors='coerce')
+            if (numeros.notna() == serie.notna()).all():
+                serie = numeros.astype(float)
+        if pd.api.types.is_float_dtype(serie) and len(serie) and serie.notna().all():
+            valores = serie.to_numpy()
+            if np.all(np.mod(valores, 1) == 0):
+                serie = serie.astype('int64')
+        df[col] = serie
+    return df
+
+
+def cargar_parquet(clave):
+    tabla = pq.read_table(ruta_parquet(clave), memory_map=True)
+    return _tipos_como_excel(tabla.to_pandas())
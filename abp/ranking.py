@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from abp.series import matriz_equipos
+
+# ---- RANKING DEFENSIVO POR VENTANAS ----
+# Medidas del cubo que se acumulan por equipo y jornada
+MEDIDAS = ['abp', 'tiros', 'goles', 'xg_suma']
+# Criterio de ordenación -> medida que se divide entre las ABP recibidas (menos es mejor)
+CRITERIOS = {'Tiros/ABP': 'tiros', 'Goles/ABP': 'goles', 'xG/ABP': 'xg_suma'}
+
+
+class RankingDefensivo:
+    # Matriz equipo x jornada de cada medida y sus sumas prefijo: cualquier ventana es una resta de dos columnas
+    def __init__(self, agg, col='equipo_defensor'):
+        self.col = col
+        self.equipos, self.periodos, self.matrices = matriz_equipos(agg, col, MEDIDAS)
+        ceros = np.zeros((len(self.equipos), 1))
+        self.prefijos = {m: np.concatenate([ceros, np.cumsum(matriz, axis=1)], axis=1) for m, matriz in self.matrices.items()}
+
+    def etiquetas(self):
+        return [f"{temporada} · J{int(jornada)}" for temporada, jornada in self.periodos]
+
+    def totales(self, fin, ventana=None):
+        # Sumas por equipo de los periodos (fin - ventana, fin]; ventana=None acumula desde el principio
+        inicio = 0 if ventana is None else max(0, fin + 1 - ventana)
+        return {m: p[:, fin + 1] - p[:, inicio] for m, p in self.prefijos.items()}
+
+    def forma(self, fin, semivida):
+        # Sumas con peso exponencial: el periodo fin pesa 1 y uno de hace `semivida` periodos, 0.5
+        pesos = 0.5 ** ((fin - np.arange(fin + 1)) / semivida)
+        return {m: matriz[:, :fin + 1] @ pesos for m, matriz in self.matrices.items()}
+
+    def posiciones(self, totales, criterio):
+        ratio = pd.Series(totales[CRITERIOS[criterio]] / np.where(totales['abp'] > 0, totales['abp'], np.nan))
+        return ratio.rank(method='min', na_option='bottom').astype(int).to_numpy()
+
+    def evolucion(self, ventana=None, criterio='Tiros/ABP'):
+        # Posición de cada equipo al cierre de cada periodo (formato largo, para gráficos)
+        posiciones = np.column_stack([
+            self.posiciones(self.totales(fin, ventana), criterio) for fin in range(len(self.periodos))
+        ])
+        res = pd.DataFrame(posiciones, index=self.equipos, columns=self.etiquetas())
+        return res.rename_axis(columns='periodo').stack().rename('Posición').reset_index()
+
+    def tabla(self, fin=None, ventana=None, criterio='Tiros/ABP', semivida=None, con_goles=True):
+        if len(self.periodos) == 0:
+            return pd.DataFrame(columns=[self.col, 'ABP', 'Tiros_Recibidos', 'Tiros/ABP'])
+        fin = len(self.periodos) - 1 if fin is None else fin
+        tot = self.totales(fin, ventana)
+        abp = np.where(tot['abp'] > 0, tot['abp'], np.nan)
+        ranking = pd.DataFrame({
+            self.col: self.equipos,
+            'ABP': tot['abp'].astype(int),
+            'Tiros_Recibidos': tot['tiros'].astype(int),
+            'Goles_Recibidos': tot['goles'].astype(int),
+            'xG_Recibido': tot['xg_suma'],
+            'Tiros/ABP': tot['tiros'] / abp,
+            'Goles/ABP': tot['goles'] / abp,
+            'xG/ABP': tot['xg_suma'] / abp,
+        })
+        ranking['Posición'] = self.posiciones(tot, criterio)
+        # Cambio de posición respecto a la misma ventana terminada en el periodo anterior (positivo = sube)
+        if fin > 0:
+            ranking['Δ'] = self.posiciones(self.totales(fin - 1, ventana), criterio) - ranking['Posición']
+        if semivida:
+            ew = self.forma(fin, semivida)
+            ranking[f'Forma {criterio}'] = ew[CRITERIOS[criterio]] / np.where(ew['abp'] > 0, ew['abp'], np.nan)
+        if not con_goles:
+            ranking = ranking.drop(columns=['Goles_Recibidos', 'Goles/ABP'])
+        # Solo equipos con ABP recibidas en la ventana
+        ranking = ranking[ranking['ABP'] > 0]
+        return ranking.sort_values(['Posición', self.col], kind='stable').reset_index(drop=True)
@@ -0,0 +1,137 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from abp.caches import CacheLRU
+from abp.cubo import es_si
+
+# ---- RED DE CONEXIONES EJECUTOR -> OBJETIVO ----
+# networkx se importa al calcular un layout: solo lo paga la página de la red, no el arranque de la app
+ORIGEN, DESTINO = 'jugador_ejecutor', 'jugador_objetivo'
+
+
+def aristas(df):
+    # Lista de aristas con multiplicidad: nº de ABP, tiros y goles por pareja ejecutor -> objetivo
+    datos = df[[ORIGEN, DESTINO]].dropna()
+    if datos.empty:
+        return pd.DataFrame(columns=[ORIGEN, DESTINO, 'peso', 'tiros', 'goles'])
+    datos = datos.assign(
+        tiros=es_si(df.loc[datos.index, 'tiro']).astype(int) if 'tiro' in df.columns else 0,
+        goles=es_si(df.loc[datos.index, 'gol']).astype(int) if 'gol' in df.columns else 0,
+    )
+    return (
+        datos.groupby([ORIGEN, DESTINO], observed=True, sort=True)
+        .agg(peso=(ORIGEN, 'size'), tiros=('tiros', 'sum'), goles=('goles', 'sum'))
+        .reset_index()
+    )
+
+
+def huella(conjunto):
+    texto = "\n".join(f"{a}\t{b}" for a, b in sorted(conjunto, key=str))
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+def grafo(tabla):
+    import networkx as nx
+
+    G = nx.DiGraph()
+    G.add_edges_from(zip(tabla[ORIGEN], tabla[DESTINO]))
+    return G
+
+
+# ---- CACHÉ DE LAYOUTS ----
+class CacheLayouts:
+    # Layouts por conjunto de aristas; un conjunto parecido a uno ya calculado parte de sus posiciones
+    def __init__(self, capacidad=32, max_cambios=0.2, seed=42):
+        self.capacidad = capacidad
+        self.max_cambios = max_cambios
+        self.seed = seed
+        self._layouts = CacheLRU(capacidad)  # huella -> (conjunto de aristas, posiciones)
+
+    def _mas_parecido(self, conjunto):
+        mejor, cambios_min = None, None
+        for previo, pos in reversed(self._layouts.valores()):
+            cambios = len(conjunto ^ previo)
+            if cambios_min is None or cambios < cambios_min:
+                mejor, cambios_min = pos, cambios
+        if mejor is None or cambios_min > max(3, self.max_cambios * len(conjunto)):
+            return None
+        return mejor
+
+    def posiciones(self, tabla):
+        conjunto = frozenset(zip(tabla[ORIGEN], tabla[DESTINO]))
+        clave = huella(conjunto)
+        guardado = self._layouts.obtener(clave)
+        if guardado is not None:
+            return guardado[1]
+        previo = self._mas_parecido(conjunto)
+        import networkx as nx
+
+        G = grafo(tabla)
+        if G.number_of_nodes() == 0:
+            pos = {}
+        elif previo is None:
+            pos = nx.spring_layout(G, k=0.5, seed=self.seed)
+        else:
+            pos = nx.spring_layout(G, k=0.5, pos=self._arranque(G, previo), iterations=15, seed=self.seed)
+        return self._layouts.guardar(clave, (conjunto, pos))[1]
+
+    def _arranque(self, G, previo):
+        # Nodos conocidos conservan su posición; los nuevos empiezan junto a sus vecinos ya colocados
+        rng = np.random.default_rng(self.seed)
+        inicial = {n: previo[n] for n in G.nodes if n in previo}
+        for n in G.nodes:
+            if n in inicial:
+                continue
+            vecinos = [inicial[v] for v in (*G.predecessors(n), *G.successors(n)) if v in inicial]
+            base = np.mean(vecinos, axis=0) if vecinos else np.zeros(2)
+            inicial[n] = base + rng.normal(scale=0.05, size=2)
+        return inicial
+
+
+# ---- FIGURA ----
+def figura_red(tabla, pos, clases_grosor=4):
+    fig = go.Figure()
+    if tabla.empty:
+        return fig
+    # Las aristas se agrupan en pocas clases de grosor: una traza por clase en lugar de una por arista
+    peso = tabla['peso'].to_numpy()
+    clases = np.minimum((peso - 1) * clases_grosor // max(peso.max(), 1), clases_grosor - 1) if peso.max() > 1 else np.zeros(len(peso), dtype=int)
+    origen = tabla[ORIGEN].to_numpy()
+    destino = tabla[DESTINO].to_numpy()
+    for clase in np.unique(clases):
+        sel = np.flatnonzero(clases == clase)
+        edge_x, edge_y = [], []
+        for i in sel:
+            x0, y0 = pos[origen[i]]
+            x1, y1 = pos[destino[i]]
+            edge_x += [x0, x1, None]
+            edge_y += [y0, y1, None]
+        fig.add_trace(go.Scatter(
+            x=edge_x, y=edge_y,
+            line=dict(width=0.5 + 1.5 * clase, color='#888'),
+            hoverinfo='none',
+            mode='lines'))
+
+    # Tamaño de nodo según las ABP en las que participa (como ejecutor u objetivo)
+    salida = tabla.groupby(ORIGEN, observed=True)[['peso', 'tiros', 'goles']].sum()
+    entrada = tabla.groupby(DESTINO, observed=True)[['peso', 'tiros', 'goles']].sum()
+    nodos = salida.add(entrada, fill_value=0)
+    nodos = nodos[nodos.index.isin(list(pos))]
+    tam = 8 + 22 * np.sqrt(nodos['peso'] / nodos['peso'].max())
+    fig.add_trace(go.Scatter(
+        x=[pos[n][0] for n in nodos.index],
+        y=[pos[n][1] for n in nodos.index],
+        mode='markers+text',
+        text=[str(n) for n in nodos.index],
+        hovertext=[
+            f"{n}<br>ABP: {int(r.peso)} · Tiros: {int(r.tiros)} · Goles: {int(r.goles)}"
+            for n, r in zip(nodos.index, nodos.itertuples())
+        ],
+        textposition="bottom center",
+        marker=dict(size=tam, color='skyblue'),
+        hoverinfo='text'))
+    fig.update_layout(showlegend=False)
+    return fig
@@ -0,0 +1,123 @@
+import os
+import threading
+
+import pyarrow.parquet as pq
+
+from abp.caches import CacheLRU, podar
+from abp.esquema import aplicar_esquema
+from abp.ingesta import DIR_CACHE
+
+# ---- REGISTRO COMPARTIDO DE DATASETS ----
+# Una sola copia en memoria de cada dataset por proceso, compartida por todas las sesiones.
+# Por encima del presupuesto se desaloja el menos usado; antes se vuelca a Parquet para recargarlo rápido.
+PRESUPUESTO_MB = int(os.environ.get("ABP_MEMORIA_MB", "1024"))
+DIR_REGISTRO = DIR_CACHE / "registro"
+
+
+class _Entrada:
+    __slots__ = ("df", "bytes_df", "derivados")
+
+    def __init__(self, df):
+        self.df = df
+        self.bytes_df = int(df.memory_usage(deep=True).sum())
+        # Objetos construidos sobre el dataset (índices, cubos, vistas): se desalojan con él
+        self.derivados = {}
+
+    def bytes(self):
+        # El dataset más lo que ocupan sus derivados con sus cachés en este momento (memoria() de cada uno)
+        return self.bytes_df + sum(d.memoria() for d in list(self.derivados.values()) if hasattr(d, "memoria"))
+
+
+class RegistroDatos:
+    def __init__(self, presupuesto_mb=PRESUPUESTO_MB, directorio=DIR_REGISTRO, max_volcados=8):
+        self.presupuesto = presupuesto_mb * 2**20
+        self.directorio = directorio
+        self.max_volcados = max_volcados
+        # Sin capacidad fija: se desaloja por bytes (ver _desalojar)
+        self._entradas = CacheLRU()
+        self._lock = threading.Lock()
+        self._cargas = {}  # clave -> lock, para que dos sesiones no carguen lo mismo a la vez
+        self.desalojos = 0
+        self.recargas = 0
+
+    def _ruta(self, clave):
+        return self.directorio / f"{clave}.parquet"
+
+    def _entrada(self, clave, cargar):
+        entrada = self._entradas.obtener(clave)
+        if entrada is not None:
+            return entrada
+        with self._lock:
+            carga = self._cargas.setdefault(clave, threading.Lock())
+        with carga:
+            # Otra sesión pudo cargarlo mientras se esperaba el lock
+            entrada = self._entradas.obtener(clave, contar=False)
+            if entrada is not None:
+                return entrada
+            ruta = self._ruta(clave)
+            recargado = ruta.exists()
+            if recargado:
+                # Parquet no conserva el tipo de una columna sin valores: el esquema lo restaura
+                df = aplicar_esquema(pq.read_table(ruta, memory_map=True).to_pandas(), copiar=False)
+            else:
+                df = cargar()
+            entrada = self._entradas.guardar(clave, _Entrada(df))
+            with self._lock:
+                if recargado:
+                    self.recargas += 1
+                self._cargas.pop(clave, None)
+            self._desalojar()
+            return entrada
+
+    def _desalojar(self):
+        # Nunca se desaloja el último: un dataset mayor que el presupuesto se sirve igualmente.
+        # El volcado a disco se hace fuera de los locks para no bloquear a las demás sesiones
+        desalojadas = self._entradas.desalojar(lambda: self.bytes() > self.presupuesto)
+        with self._lock:
+            self.desalojos += len(desalojadas)
+        for clave, entrada in desalojadas:
+            self._volcar(clave, entrada.df)
+
+    def _volcar(self, clave, df):
+        ruta = self._ruta(clave)
+        if ruta.exists():
+            return
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        tmp = ruta.with_suffix(".tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, ruta)
+        # Como máximo max_volcados ficheros (versiones antiguas del almacén)
+        podar(self.directorio, self.max_volcados)
+
+    def obtener(self, clave, cargar):
+        # Copia superficial: comparte los datos y, con copy-on-write, lo que una sesión modifique no llega a las demás
+        return self._entrada(clave, cargar).df.copy(deep=False)
+
+    def derivado(self, clave, nombre, construir, cargar):
+        # construir(df) se ejecuta una vez por dataset residente; si el dataset se desaloja, se reconstruye
+        entrada = self._entrada(clave, cargar)
+        with self._lock:
+            if nombre in entrada.derivados:
+                return entrada.derivados[nombre]
+        objeto = construir(entrada.df)
+        with self._lock:
+            objeto = entrada.derivados.setdefault(nombre, objeto)
+        # El derivado cuenta en el presupuesto: puede obligar a desalojar otros datasets
+        self._desalojar()
+        return objeto
+
+    def bytes(self):
+        return sum(e.bytes() for e in self._entradas.valores())
+
+    def estadisticas(self):
+        stats = self._entradas.estadisticas()
+        return {
+            'datasets': stats['entradas'],
+            'mb': self.bytes() / 2**20,
+            'presupuesto_mb': self.presupuesto / 2**20,
+            'aciertos': stats['aciertos'],
+            'fallos': stats['fallos'],
+            'ratio_aciertos': stats['ratio_aciertos'],
+            'desalojos': self.desalojos,
+            'recargas': self.recargas,
+        }
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+from abp import cubo
+
+# ---- SERIES TEMPORALES POR EQUIPO ----
+MEDIDAS = ['abp', 'tiros', 'goles', 'xg_suma']
+MODOS = ['acumulado', 'por_jornada', 'media_movil', 'por_abp']
+
+
+def matriz_equipos(agg, col, medidas=MEDIDAS):
+    # Roll-up del cubo a (equipo, temporada, jornada) volcado en matrices densas equipo x periodo.
+    # Los periodos (temporada, jornada) van en orden cronológico; las celdas sin ABP valen 0.
+    t = cubo.enrollar(agg, [col, 'temporada', 'jornada']).astype({'temporada': object})
+    periodos = t[['temporada', 'jornada']].drop_duplicates().sort_values(['temporada', 'jornada'])
+    periodos = pd.MultiIndex.from_frame(periodos)
+    equipos = pd.Index(sorted(t[col].dropna().unique()), name=col)
+    filas = equipos.get_indexer(t[col])
+    columnas = periodos.get_indexer(pd.MultiIndex.from_frame(t[['temporada', 'jornada']]))
+    matrices = {}
+    for m in medidas:
+        matriz = np.zeros((len(equipos), len(periodos)))
+        matriz[filas, columnas] = t[m].to_numpy(dtype=float)
+        matrices[m] = matriz
+    return equipos, periodos, matrices
+
+
+class SeriesEquipos:
+    # Matriz equipo x jornada de xG, tiros, goles y ABP; las vistas son operaciones sobre ella, sin volver a agregar
+    def __init__(self, agg, col='equipo_atacante', por_temporada=False):
+        self.col = col
+        self.por_temporada = por_temporada
+        self.equipos, periodos, matrices = matriz_equipos(agg, col)
+        if por_temporada:
+            self.periodos = periodos
+            self.matrices = matrices
+        else:
+            # Sin separar temporadas, se suman las jornadas con el mismo número
+            jornadas = periodos.get_level_values('jornada')
+            self.periodos = pd.Index(sorted(jornadas.unique()), name='jornada')
+            destino = self.periodos.get_indexer(jornadas)
+            self.matrices = {}
+            for m, matriz in matrices.items():
+                suma = np.zeros((len(self.equipos), len(self.periodos)))
+                np.add.at(suma.T, destino, matriz.T)
+                self.matrices[m] = suma
+        # Tramos de columnas que forman cada temporada (uno solo si no se separan)
+        if por_temporada:
+            temporadas = self.periodos.get_level_values('temporada')
+            cortes = np.flatnonzero(temporadas[1:] != temporadas[:-1]) + 1
+            self.tramos = np.split(np.arange(len(self.periodos)), cortes)
+        else:
+            self.tramos = [np.arange(len(self.periodos))]
+
+    def _por_tramos(self, matriz, funcion):
+        res = np.empty_like(matriz)
+        for tramo in self.tramos:
+            if len(tramo):
+                res[:, tramo] = funcion(matriz[:, tramo])
+        return res
+
+    def _acumulado(self, matriz):
+        return self._por_tramos(matriz, lambda m: np.cumsum(m, axis=1))
+
+    def _media_movil(self, matriz, ventana):
+        # Media de las últimas `ventana` jornadas (menos al inicio de cada temporada) con sumas prefijo
+        def media(m):
+            prefijo = np.concatenate([np.zeros((m.shape[0], 1)), np.cumsum(m, axis=1)], axis=1)
+            fin = np.arange(1, m.shape[1] + 1)
+            inicio = np.maximum(0, fin - ventana)
+            return (prefijo[:, fin] - prefijo[:, inicio]) / (fin - inicio)
+        return self._por_tramos(matriz, media)
+
+    def valores(self, medida, modo='acumulado', ventana=3):
+        matriz = self.matrices[medida]
+        if modo == 'acumulado':
+            return self._acumulado(matriz)
+        if modo == 'por_jornada':
+            return matriz
+        if modo == 'media_movil':
+            return self._media_movil(matriz, ventana)
+        if modo == 'por_abp':
+            # Cociente de acumulados: estable en jornadas con pocas ABP
+            abp = self._acumulado(self.matrices['abp'])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.where(abp > 0, self._acumulado(matriz) / abp, np.nan)
+        raise ValueError(f"Modo desconocido: {modo}")
+
+    def vista(self, medida, modo='acumulado', ventana=3, equipos=None):
+        # Formato largo (equipo, [temporada,] jornada, valor) listo para px.line
+        valores = self.valores(medida, modo, ventana)
+        filas = np.arange(len(self.equipos)) if equipos is None else self.equipos.get_indexer(list(equipos))
+        filas = filas[filas >= 0]
+        res = pd.DataFrame(valores[filas].T, index=self.periodos, columns=self.equipos[filas])
+        return res.stack(future_stack=True).rename(medida).reset_index()
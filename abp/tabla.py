@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from abp.caches import CacheLRU
+from abp.indices import ColumnaCodificada
+
+# ---- TABLA PAGINADA EN EL SERVIDOR ----
+COLUMNAS_POR_DEFECTO = [
+    'temporada', 'jornada', 'equipo_atacante', 'equipo_defensor', 'abp_tipo', 'ejecucion_tipo',
+    'jugador_ejecutor', 'jugador_objetivo', 'momento_minuto', 'tiro', 'gol', 'xg_tiro',
+]
+
+
+class VistaTabla:
+    # Ordena, busca y pagina sobre posiciones de filas; solo la página pedida se convierte en DataFrame
+    def __init__(self, df, indice, capacidad=64):
+        self.df = df
+        self.indice = indice
+        self.capacidad = capacidad
+        self._codificadas = dict(indice.columnas)
+        self._ordenadas = CacheLRU(capacidad)
+
+    def memoria(self):
+        # Columnas codificadas aquí (las de los filtros son del índice) y órdenes guardados
+        propias = [c for col, c in list(self._codificadas.items()) if col not in self.indice.columnas]
+        return sum(c.memoria() for c in propias) + sum(f.nbytes for f in self._ordenadas.valores())
+
+    def _columna(self, col):
+        # Las columnas de texto que no son filtros se codifican la primera vez que se buscan u ordenan
+        if col not in self._codificadas:
+            self._codificadas[col] = ColumnaCodificada(self.df[col])
+        return self._codificadas[col]
+
+    def es_texto(self, col):
+        return col in self.indice.columnas or not pd.api.types.is_numeric_dtype(self.df[col])
+
+    def _buscar(self, filas, texto, columnas):
+        # La búsqueda recorre los diccionarios de valores (pocos) y no el texto de cada fila
+        encontradas = np.zeros(len(filas), dtype=bool)
+        for col in columnas:
+            if not self.es_texto(col):
+                continue
+            codificada = self._columna(col)
+            coincide = codificada.categorias.astype(str).str.contains(texto, case=False, regex=False)
+            tabla = np.zeros(len(codificada.categorias) + 1, dtype=bool)
+            tabla[np.flatnonzero(coincide)] = True
+            encontradas |= tabla[codificada.codigos[filas]]
+        return filas[encontradas]
+
+    def _ordenar(self, filas, col, ascendente):
+        if self.es_texto(col):
+            # Las categorías están ordenadas, así que ordenar por código equivale a ordenar por valor
+            claves = self._columna(col).codigos[filas].astype(float)
+            claves[claves < 0] = np.nan
+        else:
+            claves = self.df[col].to_numpy(dtype=float)[filas]
+        orden = pd.Series(claves).sort_values(ascending=ascendente, na_position='last', kind='stable').index
+        return filas[orden.to_numpy()]
+
+    def filas_ordenadas(self, estado, filas, orden=None, ascendente=True, busqueda="", columnas_busqueda=()):
+        clave = (estado, orden, ascendente, busqueda, tuple(columnas_busqueda))
+        guardadas = self._ordenadas.obtener(clave)
+        if guardadas is not None:
+            return guardadas
+        if busqueda:
+            filas = self._buscar(filas, busqueda, columnas_busqueda)
+        if orden:
+            filas = self._ordenar(filas, orden, ascendente)
+        return self._ordenadas.guardar(clave, filas)
+
+    def pagina(self, filas, columnas, numero, tamano):
+        inicio = numero * tamano
+        posiciones_col = [self.df.columns.get_loc(c) for c in columnas]
+        return self.df.iloc[filas[inicio:inicio + tamano], posiciones_col]
@@ -0,0 +1,117 @@
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from abp.ingesta import DIR_CACHE
+
+# ---- INSTRUMENTACIÓN POR RERUN ----
+RUTA_TRAZAS = Path(os.environ.get("ABP_TRAZAS_FICHERO", DIR_CACHE / "trazas.jsonl"))
+ACTIVA_POR_DEFECTO = os.environ.get("ABP_TRAZAS", "") == "1"
+MAX_BYTES = 5 * 2**20
+COPIAS = 3
+
+
+class _SpanNulo:
+    # Lo que devuelve span() con la instrumentación desactivada: no mide ni guarda nada
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def anotar(self, **atributos):
+        pass
+
+
+_NULO = _SpanNulo()
+
+
+class Span:
+    __slots__ = ("traza", "nombre", "atributos", "inicio", "ms", "nivel")
+
+    def __init__(self, traza, nombre, atributos):
+        self.traza = traza
+        self.nombre = nombre
+        self.atributos = atributos
+        self.ms = None
+
+    def __enter__(self):
+        self.nivel = self.traza._nivel
+        self.traza._nivel += 1
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.ms = (time.perf_counter() - self.inicio) * 1000
+        self.traza._nivel -= 1
+        self.traza.spans.append(self)
+        return False
+
+    def anotar(self, **atributos):
+        self.atributos.update(atributos)
+
+    def como_dict(self):
+        return {"nombre": self.nombre, "ms": round(self.ms, 3), "nivel": self.nivel, **self.atributos}
+
+
+class Traza:
+    def __init__(self, activa=False, inicio=None, **contexto):
+        # inicio: instante (perf_counter) desde el que se cuenta el total, p. ej. antes de los imports del script
+        self.activa = activa
+        self.contexto = contexto
+        self.spans = []
+        self.guardada = False
+        self._resumen = None
+        self._nivel = 0
+        self._inicio = time.perf_counter() if inicio is None else inicio
+
+    def span(self, nombre, **atributos):
+        if not self.activa:
+            return _NULO
+        return Span(self, nombre, atributos)
+
+    def resumen(self):
+        # Spans en orden de inicio, con la duración total del rerun hasta ahora
+        spans = sorted(self.spans, key=lambda s: s.inicio)
+        return {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "total_ms": round((time.perf_counter() - self._inicio) * 1000, 3),
+            **self.contexto,
+            "spans": [s.como_dict() for s in spans],
+        }
+
+    def guardar(self, ruta=None):
+        # Una línea por ejecución: si ya se guardó, devuelve lo guardado sin volver a escribir
+        if not self.activa:
+            return None
+        if self.guardada:
+            return self._resumen
+        self._resumen = self.resumen()
+        self.guardada = True
+        _registro(ruta or RUTA_TRAZAS).info(json.dumps(self._resumen, ensure_ascii=False, default=str))
+        return self._resumen
+
+
+def registrar_arranque(datos, ruta=None):
+    # Una línea por proceso con el tiempo hasta el primer render; se guarda aunque las trazas estén desactivadas
+    linea = {"ts": datetime.now().isoformat(timespec="milliseconds"), "evento": "arranque", **datos}
+    _registro(ruta or RUTA_TRAZAS).info(json.dumps(linea, ensure_ascii=False, default=str))
+
+
+def _registro(ruta):
+    # Logger con rotación de ficheros: una línea JSON por rerun
+    logger = logging.getLogger(f"abp.trazas.{ruta}")
+    if not logger.handlers:
+        Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(ruta, maxBytes=MAX_BYTES, backupCount=COPIAS, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
@@ -0,0 +1,146 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from abp import cubo
+from abp.campo import ANCHO, LARGO
+
+# ---- ZONAS DEL CAMPO ----
+# Cada evento se etiqueta una sola vez al entrar en el almacén con una zona con nombre y una celda de rejilla,
+# tanto para el punto de ejecución como para el de tiro. Las estadísticas por zona salen de un cubo propio.
+
+# Celdas en x e y de la rejilla (p. ej. ABP_REJILLA_ZONAS=12x8)
+REJILLA = tuple(int(v) for v in os.environ.get("ABP_REJILLA_ZONAS", "12x8").split("x"))
+
+# Zonas con nombre como rectángulos (x0, x1, y0, y1) que embaldosan el campo.
+# Se ataca hacia x=LARGO; y=0 es la banda izquierda del equipo atacante.
+ZONAS = {
+    'ejecucion': {
+        "Campo propio": (0, 60, 0, ANCHO),
+        "Medio campo ofensivo": (60, 80, 0, ANCHO),
+        "Banda izquierda": (80, 114, 0, 18),
+        "Banda derecha": (80, 114, 62, ANCHO),
+        "Córner izquierdo": (114, LARGO, 0, 18),
+        "Córner derecho": (114, LARGO, 62, ANCHO),
+        "Frontal": (80, 102, 18, 62),
+        "Área": (102, LARGO, 18, 62),
+    },
+    'tiro': {
+        "Lejano": (0, 90, 0, ANCHO),
+        "Banda izquierda": (90, LARGO, 0, 18),
+        "Banda derecha": (90, LARGO, 62, ANCHO),
+        "Frontal": (90, 102, 18, 62),
+        "Área lado izquierdo": (102, LARGO, 18, 30),
+        "Área lado derecho": (102, LARGO, 50, 62),
+        "Área central": (102, 114, 30, 50),
+        "Área pequeña": (114, LARGO, 30, 50),
+    },
+}
+COORDENADAS = {'ejecucion': ('x_ejecucion', 'y_ejecucion'), 'tiro': ('x_tiro', 'y_tiro')}
+
+
+def columna_zona(rol):
+    return f"zona_campo_{rol}"
+
+
+def columna_celda(rol):
+    return f"celda_{rol}"
+
+
+def _coordenadas(df, rol):
+    x_col, y_col = COORDENADAS[rol]
+    x = pd.to_numeric(df[x_col], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    y = pd.to_numeric(df[y_col], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    # Los puntos sobre la línea de fondo o la banda cuentan dentro del campo
+    return np.clip(x, 0, np.nextafter(LARGO, 0)), np.clip(y, 0, np.nextafter(ANCHO, 0))
+
+
+def zona_de(x, y, zonas):
+    # Código de zona por punto (-1 si no tiene coordenadas); rectángulos semiabiertos [x0, x1) x [y0, y1)
+    codigos = np.full(len(x), -1, dtype=np.int8)
+    for i, (x0, x1, y0, y1) in enumerate(zonas.values()):
+        codigos[(x >= x0) & (x < x1) & (y >= y0) & (y < y1)] = i
+    return pd.Categorical.from_codes(codigos, categories=list(zonas))
+
+
+def celda_de(x, y, rejilla=REJILLA):
+    # Identificador de celda fila a fila (iy * nx + ix); nulo si no hay coordenadas
+    nx, ny = rejilla
+    validos = ~(np.isnan(x) | np.isnan(y))
+    ix = (np.nan_to_num(x) / LARGO * nx).astype(np.int16)
+    iy = (np.nan_to_num(y) / ANCHO * ny).astype(np.int16)
+    return pd.arrays.IntegerArray((iy * nx + ix).astype(np.int16), mask=~validos)
+
+
+def columnas(disponibles=None):
+    # Columnas de zona y celda que asignar() añade (a partir de las columnas disponibles, si se indican)
+    return [
+        f(rol) for rol, coordenadas in COORDENADAS.items() for f in (columna_zona, columna_celda)
+        if disponibles is None or set(coordenadas) <= set(disponibles)
+    ]
+
+
+def asignar(df, rejilla=REJILLA):
+    for rol, (x_col, y_col) in COORDENADAS.items():
+        if x_col in df.columns and y_col in df.columns:
+            x, y = _coordenadas(df, rol)
+            df[columna_zona(rol)] = zona_de(x, y, ZONAS[rol])
+            df[columna_celda(rol)] = celda_de(x, y, rejilla)
+    return df
+
+
+# ---- CUBO DE ZONAS ----
+# Aparte del cubo principal y con pocas dimensiones: por partido, una tabla por cada columna de zona o celda
+# (como GROUPING SETS), con nulo en las demás. Así las zonas no multiplican los grupos del cubo principal.
+DIMENSIONES = ['temporada', 'jornada', 'equipo_atacante', 'equipo_defensor']
+
+
+def agregar(df):
+    base = [d for d in DIMENSIONES if d in df.columns]
+    partes = []
+    for col in columnas():
+        if col in df.columns:
+            tabla = cubo.agregar(df, base + [col])
+            partes.append(tabla[tabla[col].notna()])
+    if not partes:
+        return pd.DataFrame(columns=base + cubo.MEDIDAS)
+    tabla = pd.concat(partes, ignore_index=True)[base + [c for c in columnas() if c in df.columns] + cubo.MEDIDAS]
+    # Los huecos que deja concat vuelven object las columnas; se restauran sus tipos
+    for rol in COORDENADAS:
+        if columna_zona(rol) in tabla.columns:
+            tabla[columna_zona(rol)] = pd.Categorical(tabla[columna_zona(rol)], categories=list(ZONAS[rol]))
+            tabla[columna_celda(rol)] = tabla[columna_celda(rol)].astype('Int16')
+    return tabla
+
+
+# ---- ESTADÍSTICAS POR ZONA (DESDE EL CUBO DE ZONAS) ----
+def estadisticas(agg, rol):
+    col = columna_zona(rol)
+    # En el orden de ZONAS, tanto si la columna llega categórica (pandas) como de texto (motor SQL)
+    orden = pd.Index(list(ZONAS[rol]), name=col)
+    res = cubo.enrollar(agg, col).astype({col: object}).set_index(col).reindex(orden, fill_value=0).reset_index()
+    res = res[res['abp'] > 0].copy()
+    res['xG/ABP'] = res['xg_suma'] / res['abp']
+    res['% tiro'] = res['tiros'] / res['abp'] * 100
+    res['xG/tiro'] = res['xg_suma'] / res['xg_n'].where(res['xg_n'] > 0)
+    res = res.rename(columns={col: 'Zona', 'abp': 'ABP', 'tiros': 'Tiros', 'goles': 'Goles', 'xg_suma': 'xG'})
+    return res[['Zona', 'ABP', 'Tiros', 'Goles', 'xG', 'xG/ABP', '% tiro', 'xG/tiro']].reset_index(drop=True)
+
+
+def mapa_celdas(agg, rol, medida='abp', rejilla=REJILLA):
+    # Matriz (ny, nx) de la medida por celda; con medida 'xg_abp' se divide el xG entre las ABP de la celda
+    nx, ny = rejilla
+    t = cubo.enrollar(agg, columna_celda(rol))
+    # Celdas fuera de la rejilla actual (almacén etiquetado con otra rejilla) se ignoran
+    t = t[t[columna_celda(rol)] < nx * ny]
+    ids = t[columna_celda(rol)].to_numpy(dtype=int)
+    valores = np.zeros(nx * ny)
+    if medida == 'xg_abp':
+        abp = np.zeros(nx * ny)
+        abp[ids] = t['abp'].to_numpy(dtype=float)
+        valores[ids] = t['xg_suma'].to_numpy(dtype=float)
+        valores = np.where(abp > 0, valores / np.where(abp > 0, abp, 1), np.nan)
+    else:
+        valores[ids] = t[medida].to_numpy(dtype=float)
+    return valores.reshape(ny, nx)
@@ -0,0 +1,237 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from abp import almacen, analitica, campo, consultas, esquema, exportar, ingesta, red, zonas  # noqa: E402
+
+# ---- BANCO DE PRUEBAS POR ETAPAS ----
+# Uso: python benchmarks/bench.py benchmarks/datos/abp_100k.parquet [--memoria] [--salida benchmarks/resultados]
+#      python benchmarks/bench.py --comparar antes.json despues.json
+
+
+class Medidor:
+    def __init__(self, memoria=False):
+        self.memoria = memoria
+        self.etapas = {}
+
+    def medir(self, nombre, funcion, *args, **kwargs):
+        if self.memoria:
+            tracemalloc.start()
+        inicio = time.perf_counter()
+        resultado = funcion(*args, **kwargs)
+        segundos = time.perf_counter() - inicio
+        etapa = {"segundos": round(segundos, 6)}
+        if self.memoria:
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            etapa["pico_mb"] = round(pico / 2**20, 3)
+        if hasattr(resultado, "__len__"):
+            etapa["filas"] = len(resultado)
+        self.etapas[nombre] = etapa
+        print(f"{nombre:<40} {segundos * 1000:>10.1f} ms" + (f" {etapa['pico_mb']:>9.1f} MB" if self.memoria else ""),
+              file=sys.stderr)
+        return resultado
+
+
+def _selecciones(df):
+    # Filtros con selectividad decreciente sobre equipos atacantes
+    equipos = sorted(df['equipo_atacante'].dropna().unique())
+    return {
+        "100%": {},
+        "50%": {'equipo_atacante': equipos[: max(1, len(equipos) // 2)]},
+        "10%": {'equipo_atacante': equipos[: max(1, len(equipos) // 10)]},
+        "1%": {'equipo_atacante': equipos[:1], 'abp_tipo': ['Penalti', 'Falta frontal']},
+        "jugador (sin cubo)": {'jugador_ejecutor': sorted(df['jugador_ejecutor'].dropna().unique())[:50]},
+    }
+
+
+def _cargar_columnar(ruta):
+    df = ingesta.normalizar_columnas(pq.read_table(ruta, memory_map=True).to_pandas())
+    return zonas.asignar(esquema.aplicar_esquema(df, copiar=False))
+
+
+def _importar_en_frio():
+    # Intérprete nuevo importando lo mismo que streamlit_app.py antes de dibujar; devuelve los módulos pesados cargados
+    codigo = (
+        "import sys, pandas, plotly.express\n"
+        "from abp import almacen, analitica, campo, consultas, esquema, exportar, filtros, ingesta, red, registro, "
+        "tabla, trazas, zonas\n"
+        "print(','.join(m for m in ('networkx', 'xlsxwriter', 'duckdb') if m in sys.modules))"
+    )
+    raiz = Path(__file__).resolve().parent.parent
+    salida = subprocess.run([sys.executable, "-c", codigo], cwd=raiz, capture_output=True, text=True, check=True)
+    return [m for m in salida.stdout.strip().split(",") if m]
+
+
+def _etapas_sql(m, df, jornada_max):
+    # Motor DuckDB sobre un almacén temporal con los mismos datos (mismos filtros que el motor pandas)
+    with tempfile.TemporaryDirectory() as tmp:
+        alm = almacen.AlmacenABP(tmp)
+        m.medir("sql/almacen", alm.anadir, df)
+        analisis = m.medir("sql/analisis", consultas.AnalisisSQL, alm)
+        for nombre, sel in _selecciones(df).items():
+            estado = analisis.estado(sel, (1, jornada_max))
+            m.medir(f"sql/facetas/{nombre}", analisis.facetas, estado)
+            m.medir(f"sql/facetas_cache/{nombre}", analisis.facetas, estado)
+            m.medir(f"sql/agregados/{nombre}", analisis.agregados, estado)
+            m.medir(f"sql/agregados_zonas/{nombre}", analisis.agregados_zonas, estado)
+            # Lo que piden las páginas en lugar de las filas filtradas
+            m.medir(f"sql/top_ejecutores/{nombre}", analisis.top_ejecutores, estado)
+            m.medir(f"sql/aristas/{nombre}", analisis.aristas, estado)
+            m.medir(f"sql/campo_puntos/{nombre}", analisis.puntos, estado, 'x_ejecucion', 'y_ejecucion', ['abp_tipo'],
+                    maximo=campo.MAX_PUNTOS)
+            m.medir(f"sql/campo_densidad/{nombre}", analisis.densidad, estado, 'x_ejecucion', 'y_ejecucion')
+        tabla = consultas.VistaTablaSQL(analisis)
+        filas = tabla.filas_ordenadas(estado, analisis.filas(estado), orden='xg_tiro', ascendente=False)
+        m.medir("sql/tabla_pagina", tabla.pagina, filas, ['jugador_ejecutor', 'xg_tiro'], 10, 50)
+
+
+def ejecutar(ruta, memoria=False, exportaciones=True, sql=False):
+    ruta = Path(ruta)
+    m = Medidor(memoria)
+
+    cargados = []
+    m.medir("arranque/imports", lambda: cargados.extend(_importar_en_frio()))
+    m.etapas["arranque/imports"]["modulos_pesados"] = cargados
+
+    excel = ruta.with_suffix(".xlsx")
+    if excel.exists():
+        # La caché de la ingesta va a un directorio temporal solo durante la medida
+        dir_cache = ingesta.DIR_CACHE
+        with tempfile.TemporaryDirectory() as tmp:
+            ingesta.DIR_CACHE = Path(tmp)
+            try:
+                datos = excel.read_bytes()
+                m.medir("ingesta/excel_a_parquet", ingesta.excel_a_parquet, datos, "bench")
+            finally:
+                ingesta.DIR_CACHE = dir_cache
+    df = m.medir("ingesta/columnar", _cargar_columnar, ruta)
+
+    analisis = m.medir("indices/analisis", analitica.Analisis, df)
+    m.etapas["indices/analisis"]["grupos_cubo"] = len(analisis.cubo.tabla)
+    m.etapas["indices/analisis"]["grupos_cubo_zonas"] = len(analisis.cubo_zonas.tabla)
+    jornada_max = int(df['jornada'].max())
+    for nombre, sel in _selecciones(df).items():
+        estado = analisis.estado(sel, (1, jornada_max))
+        m.medir(f"filtro/{nombre}", analisis.indice.filtrar, estado.como_dict(), estado.jornada)
+        m.medir(f"agregados/{nombre}", analisis.agregados, estado)
+
+    estado = analisis.estado({}, (1, jornada_max))
+    agg = analisis.agregados(estado)
+    jornadas = sorted(df['jornada'].dropna().unique())
+    m.medir("paginas/kpis", analitica.kpis, agg)
+    m.medir("paginas/abp_por_tipo", analitica.abp_por_tipo, agg)
+    m.medir("paginas/abp_por_jornada", analitica.abp_por_jornada, agg)
+    m.medir("paginas/xg_por_jornada", analitica.xg_por_jornada, agg, sorted(df['equipo_atacante'].dropna().unique()), jornadas)
+    m.medir("paginas/ranking_defensivo", analitica.ranking_defensivo, agg)
+    motor = m.medir("ranking/prefijos", analitica.RankingDefensivo, agg)
+    m.medir("ranking/ventana", motor.tabla, ventana=5, criterio='xG/ABP', semivida=3)
+    m.medir("ranking/evolucion", motor.evolucion, ventana=5)
+    agg_zonas = analisis.agregados_zonas(estado)
+    m.medir("zonas/estadisticas", zonas.estadisticas, agg_zonas, 'tiro')
+    m.medir("zonas/rejilla", zonas.mapa_celdas, agg_zonas, 'tiro', 'xg_abp')
+    serie = m.medir("series/matriz", analitica.SeriesEquipos, agg)
+    m.medir("series/acumulado", serie.vista, 'xg_suma', 'acumulado')
+    m.medir("series/media_movil", serie.vista, 'xg_suma', 'media_movil', 5)
+    comp = m.medir("paginas/comparativa_equipos", analitica.comparativa_equipos, agg, agg, sorted(df['equipo_atacante'].dropna().unique()))
+    m.medir("paginas/resumen_equipos", analitica.resumen_equipos, comp, 'por_partido')
+    m.medir("paginas/comparativa_temporadas", analitica.comparativa_temporadas, agg)
+    m.medir("paginas/top_ejecutores", analisis.top_ejecutores, estado)
+
+    puntos = m.medir("campo/puntos", analisis.puntos, estado, 'x_ejecucion', 'y_ejecucion', ['abp_tipo'],
+                     maximo=campo.MAX_PUNTOS)
+    if puntos is None:
+        densidad = m.medir("campo/densidad", analisis.densidad, estado, 'x_ejecucion', 'y_ejecucion')
+        fig = m.medir("campo/figura", campo.figura_densidad, *densidad)
+    else:
+        fig = m.medir("campo/figura", campo.figura_campo, puntos, 'x_ejecucion', 'y_ejecucion', 'abp_tipo')
+    m.medir("campo/serializar", fig.to_json)
+
+    aristas = m.medir("red/aristas", analisis.aristas, estado)
+    layouts = red.CacheLayouts()
+    m.medir("red/layout", layouts.posiciones, aristas)
+    m.medir("red/layout_cache", layouts.posiciones, aristas)
+
+    if exportaciones:
+        filas = analisis.filas(analisis.estado(_selecciones(df)["10%"], (1, jornada_max)))
+        with tempfile.TemporaryDirectory() as tmp:
+            for formato, escritor in exportar.ESCRITORES.items():
+                if formato == "Excel" and len(filas) > exportar.MAX_FILAS_EXCEL:
+                    continue
+                destino = Path(tmp) / f"export.{exportar.FORMATOS[formato][0]}"
+                m.medir(f"exportar/{formato}", escritor, df, filas, destino, lambda n: None)
+
+    if sql:
+        _etapas_sql(m, df, jornada_max)
+
+    return {
+        "dataset": str(ruta),
+        "filas": len(df),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "memoria": memoria,
+        "etapas": m.etapas,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(base, nuevo):
+    a = json.loads(Path(base).read_text(encoding="utf-8"))
+    b = json.loads(Path(nuevo).read_text(encoding="utf-8"))
+    print(f"{'etapa':<40} {'antes ms':>10} {'después ms':>11} {'ratio':>7}")
+    for nombre in sorted(set(a["etapas"]) | set(b["etapas"])):
+        ta = a["etapas"].get(nombre, {}).get("segundos")
+        tb = b["etapas"].get(nombre, {}).get("segundos")
+        ratio = f"{tb / ta:>7.2f}" if ta and tb else "      —"
+        fa = f"{ta * 1000:>10.1f}" if ta is not None else f"{'—':>10}"
+        fb = f"{tb * 1000:>11.1f}" if tb is not None else f"{'—':>11}"
+        print(f"{nombre:<40} {fa} {fb} {ratio}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide cada etapa de la app ABP sobre un dataset Parquet.")
+    parser.add_argument("datasets", nargs="*", help="Ficheros .parquet generados con generar_datos.py")
+    parser.add_argument("--memoria", action="store_true", help="Mide también el pico de memoria (más lento)")
+    parser.add_argument("--sin-exportar", action="store_true", help="Omite las etapas de exportación")
+    parser.add_argument("--sql", action="store_true", help="Mide también el motor SQL (requiere duckdb)")
+    parser.add_argument("--salida", default="benchmarks/resultados")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DESPUES"), help="Compara dos resultados JSON")
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+    salida = Path(args.salida)
+    salida.mkdir(parents=True, exist_ok=True)
+    for dataset in args.datasets:
+        resultado = ejecutar(dataset, args.memoria, not args.sin_exportar, args.sql)
+        destino = salida / f"{Path(dataset).stem}_{datetime.now():%Y%m%d-%H%M%S}.json"
+        destino.write_text(json.dumps(resultado, indent=1), encoding="utf-8")
+        print(destino)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ---- GENERADOR DE DATOS ABP SINTÉTICOS ----
+# Mismo esquema que "Prova ABP.xlsx" (cabeceras incluidas) con distribuciones verosímiles.
+# Uso: python benchmarks/generar_datos.py --filas 10000 100000 1000000 --salida benchmarks/datos [--excel]
+
+TAMANOS = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+BLOQUE = 500_000
+MAX_FILAS_EXCEL = 1_048_575
+
+EQUIPOS = [
+    "CD Castellon", "R. Zaragoza", "Granada", "Eldense", "Racing", "Levante", "Elche", "Almeria",
+    "Burgos", "Sporting", "Oviedo", "Mirandes", "Huesca", "Cadiz", "Malaga", "Cordoba",
+    "Albacete", "Deportivo", "Tenerife", "Eibar",
+]
+TIPOS_ABP = ["Corner", "Falta lateral", "Falta frontal", "Saque de banda", "Penalti"]
+PROB_TIPOS = [0.45, 0.2, 0.12, 0.2, 0.03]
+RANGOS = ["0-15", "16-30", "31-45", "EXTRA 1", "45-60", "61-75", "76-90", "EXTRA 2"]
+RESULTADOS = ["Ganando", "Empatando", "Perdiendo"]
+OPUESTO = {"Ganando": "Perdiendo", "Empatando": "Empatando", "Perdiendo": "Ganando"}
+EJECUCIONES = ["Cerrada", "Plana", "Abierta", "Corta"]
+ABP_RESULTADOS = ["Saque puerta", "Contragolpe", "Nueva posesion", "Tiro segunda jugada", "Tiro",
+                  "Atrapa portero", "Saque banda", "Corner"]
+ZONAS_CONTACTO = ["AP_1", "AP_2", "AP_3", "PEN_1", "PEN_2", "LON_1", "LON_5", "TOB_5"]
+ZONAS_TIRO = ["SH_4", "SH_6", "PEN_1", "PEN_2", "TOB_4", "LON_5"]
+RESULTADOS_TIRO = ["Bloqueado", "Fuera", "Parada", "Palo", "Gol"]
+ZONAS_RESULTADO_TIRO = ["O4", "O6", "B", "P", "5", "6"]
+
+
+def _plantillas(rng):
+    jugadores = {e: [f"{chr(65 + i % 26)}. {e.split()[-1][:4]}{i:02d}" for i in range(25)] for e in EQUIPOS}
+    porteros = {e: f"P. {e.split()[-1][:4]}" for e in EQUIPOS}
+    return jugadores, porteros
+
+
+def _calendario(rng, temporadas, jornadas):
+    # Liga a doble vuelta por el método del círculo: en cada jornada cada equipo juega un solo partido.
+    # Devuelve (temporada, jornada, partido, [local, visitante]) con índices de EQUIPOS.
+    n_eq = len(EQUIPOS)
+    calendario = []
+    for _ in temporadas:
+        orden = rng.permutation(n_eq)
+        ida = []
+        for r in range(n_eq - 1):
+            giro = np.concatenate([orden[:1], np.roll(orden[1:], r)])
+            ida.append(np.stack([giro[: n_eq // 2], giro[::-1][: n_eq // 2]], axis=1))
+        vueltas = ida + [p[:, ::-1] for p in ida]
+        calendario.append([vueltas[j % len(vueltas)] for j in range(jornadas)])
+    return np.array(calendario)
+
+
+def generar_bloque(n, rng, jugadores, porteros, temporadas, calendario, inicio_id):
+    # Cada evento cae en un partido real del calendario; el atacante es el local o el visitante
+    n_temp, n_jor, n_par, _ = calendario.shape
+    temp = rng.integers(0, n_temp, n)
+    jor = rng.integers(0, n_jor, n)
+    partido = calendario[temp, jor, rng.integers(0, n_par, n)]
+    local = rng.random(n) < 0.5
+    atac = np.where(local, partido[:, 0], partido[:, 1])
+    defe = np.where(local, partido[:, 1], partido[:, 0])
+    equipos = np.array(EQUIPOS, dtype=object)
+    tipo = rng.choice(len(TIPOS_ABP), n, p=PROB_TIPOS)
+    minuto = rng.integers(0, 96, n)
+    mitad = np.where(minuto < 46, "Primera", "Segunda")
+    rango_idx = np.select(
+        [minuto <= 15, minuto <= 30, minuto <= 45, minuto <= 47, minuto <= 60, minuto <= 75, minuto <= 90],
+        [0, 1, 2, 3, 4, 5, 6], 7,
+    )
+    res_atac = rng.choice(RESULTADOS, n)
+    tiro = rng.random(n) < 0.16
+    gol = tiro & (rng.random(n) < 0.12)
+    xg = np.where(tiro, np.round(rng.beta(1.2, 9, n), 3), np.nan)
+
+    # Coordenadas de ejecución según el tipo de ABP (campo de 120 x 80)
+    x_ej = np.select([tipo == 0, tipo == 4, tipo == 3], [120.0, 108.0, rng.uniform(20, 115, n)],
+                     rng.uniform(70, 105, n))
+    y_ej = np.select([tipo == 0, tipo == 4, tipo == 3], [rng.choice([0.0, 80.0], n), 40.0, rng.choice([0.0, 80.0], n)],
+                     rng.uniform(5, 75, n))
+    x_tiro = np.where(tiro, np.round(rng.normal(108, 5, n).clip(85, 120)), np.nan)
+    y_tiro = np.where(tiro, np.round(rng.normal(40, 9, n).clip(15, 65)), np.nan)
+
+    nombres_atac = equipos[atac]
+    jug_idx = rng.integers(0, 25, n)
+    obj_idx = rng.integers(0, 25, n)
+    ejecutor = np.array([jugadores[e][j] for e, j in zip(nombres_atac, jug_idx)], dtype=object)
+    objetivo = np.array([jugadores[e][j] for e, j in zip(nombres_atac, obj_idx)], dtype=object)
+    objetivo[rng.random(n) < 0.1] = None
+
+    def enteros(lo, hi):
+        return rng.integers(lo, hi, n)
+
+    datos = {
+        "Temporada": np.array(temporadas, dtype=object)[temp],
+        "Jornada": jor + 1,
+        "LV_Atacante": np.where(local, "Local", "Visitante"),
+        "Equipo_Atacante": nombres_atac,
+        "LV_Defensor": np.where(local, "Visitante", "Local"),
+        "Equipo_Defensor": equipos[defe],
+        "ABP_Tipo": np.array(TIPOS_ABP, dtype=object)[tipo],
+        "Zona_Ejecucion": enteros(1, 7),
+        "Jugador_Ejecutor": ejecutor,
+        "Portero_Defensor": np.array([porteros[e] for e in equipos[defe]], dtype=object),
+        "Momento_Resultado_Atacante": res_atac,
+        "Momento_Resultado_Defensor": np.vectorize(OPUESTO.get)(res_atac),
+        "Momento_Minuto": minuto,
+        "Momento_Rango": np.array(RANGOS, dtype=object)[rango_idx],
+        "Momento_Mitad": mitad,
+        "Situacion_Numerica_Atacante": rng.choice(["Igualdad", "Superioridad", "Inferioridad"], n, p=[0.9, 0.05, 0.05]),
+        "Situacion_Numerica_Defensor": rng.choice(["Igualdad", "Inferioridad", "Superioridad"], n, p=[0.9, 0.05, 0.05]),
+        "Portero_Ataca": np.where(rng.random(n) < 0.01, "SI", "NO"),
+        "Jugadores_Area_Atacante": enteros(3, 8),
+        "Jugadores_Corta_Atacante": enteros(0, 3),
+        "Jugadores_Frontal_Atacante": enteros(0, 6),
+        "Jugadores_Cerrando_Atacante": enteros(0, 3),
+        "Jugadores_Area_Defensor": enteros(6, 11),
+        "Jugadores_Corta_Defensor": enteros(0, 2),
+        "Jugadores_Frontal_Defensor": enteros(0, 3),
+        "Jugadores_Marca_Defensor": enteros(3, 7),
+        "Jugadores_Zona_Defensor": enteros(2, 5),
+        "Jugadores_Descolgados_Defensor": enteros(0, 3),
+        "Tipo_Defensa": rng.choice(["Mixta", "Individual", "Zonal"], n),
+        "Ejecucion_Tipo": rng.choice(EJECUCIONES, n),
+        "Jugador_Objetivo": objetivo,
+        "ABP_Resultado": np.where(tiro, "Tiro", rng.choice(ABP_RESULTADOS, n)),
+        "Gol": np.where(gol, "SI", "NO"),
+        "Jugador_Gol": np.full(n, np.nan),
+        "Primer_Contacto": rng.choice(["NO", "Defensor", "Atacante"], n),
+        "Zona_Primer_Contacto": rng.choice(ZONAS_CONTACTO, n),
+        "Tiro": np.where(tiro, "SI", "NO"),
+        "Zona_Tiro": np.where(tiro, rng.choice(ZONAS_TIRO, n), None),
+        "Zona_Resultado_Tiro": np.where(tiro, rng.choice(ZONAS_RESULTADO_TIRO, n), None),
+        "Resultado_Tiro": np.where(gol, "Gol", np.where(tiro, rng.choice(RESULTADOS_TIRO[:4], n), None)),
+        "xG_Tiro": xg,
+        "X_Tiro": x_tiro,
+        "Y_Tiro": y_tiro,
+        "X_Ejecucion": np.round(x_ej),
+        "Y_Ejecucion": np.round(y_ej),
+        "Descripción": rng.choice(["Ejecución cerrada al primer palo", "Ejecución abierta al segundo palo",
+                                   "Ejecución en corto", "Ejecución plana al punto de penalti"], n),
+        "Link": np.full(n, np.nan),
+        "ID_ABP": np.arange(inicio_id, inicio_id + n, dtype=float),
+    }
+    return pd.DataFrame(datos)
+
+
+def generar(filas, ruta, semilla=0, temporadas=None, jornadas=2 * (len(EQUIPOS) - 1), excel=False):
+    rng = np.random.default_rng(semilla)
+    jugadores, porteros = _plantillas(rng)
+    # Más temporadas cuanto mayor el dataset, para que los filtros de temporada tengan sentido
+    temporadas = temporadas or [f"{a}/{(a + 1) % 100:02d}" for a in range(2024 - max(1, min(10, filas // 200_000)) + 1, 2025)]
+    calendario = _calendario(rng, temporadas, jornadas)
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    writer = None
+    hechas = 0
+    bloques = []
+    while hechas < filas:
+        n = min(BLOQUE, filas - hechas)
+        bloque = generar_bloque(n, rng, jugadores, porteros, temporadas, calendario, hechas + 1)
+        tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(ruta, tabla.schema)
+        writer.write_table(tabla.cast(writer.schema))
+        if excel:
+            bloques.append(bloque)
+        hechas += n
+    writer.close()
+    if excel:
+        if filas > MAX_FILAS_EXCEL:
+            print(f"{filas:,} filas no caben en una hoja de Excel; se omite el .xlsx", file=sys.stderr)
+        else:
+            pd.concat(bloques, ignore_index=True).to_excel(ruta.with_suffix(".xlsx"), index=False, engine="xlsxwriter")
+    return ruta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera datasets ABP sintéticos con el esquema de la app.")
+    parser.add_argument("--filas", nargs="+", default=["10k", "100k"],
+                        help=f"Tamaños: número de filas o alias {list(TAMANOS)}")
+    parser.add_argument("--salida", default="benchmarks/datos")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--excel", action="store_true", help="Escribe también un .xlsx (para medir la ingesta Excel)")
+    args = parser.parse_args(argv)
+    for tam in args.filas:
+        filas = TAMANOS.get(tam) or int(tam)
+        ruta = generar(filas, Path(args.salida) / f"abp_{tam}.parquet", args.semilla, excel=args.excel)
+        print(ruta)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,208 @@
+import functools
+import sys
+import time
+
+# Desde aquí cuenta el tiempo hasta el primer render: en el primer rerun del proceso incluye los imports
+INICIO_SCRIPT = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
-from io import BytesIO
-import networkx as nx
-from PIL import Image
+
+# networkx (red), xlsxwriter (exportar a Excel) y duckdb (motor SQL) se importan al usarse.
+# La imagen del campo se abre con PIL solo al dibujar el primer mapa (y se reutiliza)
+from abp import almacen, analitica, campo, consultas, esquema, exportar, filtros, ingesta, red, registro, tabla, trazas, zonas
+
+FIN_IMPORTS = time.perf_counter()
 
 st.set_page_config(page_title="Análisis ABP Fútbol", layout="wide")
 
+# ---- INSTRUMENTACIÓN (MODO DEPURACIÓN) ----
+# Con el modo desactivado, traza.span() devuelve un contexto vacío y no mide nada
+traza = trazas.Traza(activa=st.session_state.get("debug_trazas", trazas.ACTIVA_POR_DEFECTO), inicio=INICIO_SCRIPT)
+
+def fragmento(funcion):
+    # Parte de la página que se re-ejecuta sola cuando cambia uno de sus widgets; lo que llega de arriba
+    # (datos, filtros, caches) es lo de la última ejecución completa. En una re-ejecución parcial la traza
+    # de esa ejecución ya está guardada, así que el fragmento mide y guarda la suya.
+    @st.fragment
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        global traza
+        if not traza.guardada:
+            return funcion(*args, **kwargs)
+        traza = trazas.Traza(activa=traza.activa, fragmento=funcion.__name__)
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            traza.guardar()
+    return envoltura
+
+def mostrar_figura(nombre, fig):
+    # La serialización de Plotly ocurre aquí, así que se mide por separado de la agregación
+    with traza.span(f"render/{nombre}"):
+        st.plotly_chart(fig, use_container_width=True)
+
 # ---- FUNCION PARA MULTISELECT CON "SELECCIONAR TODO" ----
-def multiselect_con_todo(label, opciones, key):
+def multiselect_con_todo(label, opciones, key, format_func=str):
+    # Solo se ofrecen los valores alcanzables con el resto de filtros, con su número de ABP
     check = st.sidebar.checkbox(f"Seleccionar todo {label.lower()}", value=True, key=f"{key}_todo")
-    if check:
-        return st.sidebar.multiselect(label, opciones, default=opciones, key=key)
+    conteos = facetas.get(FILTROS_FACETADOS.get(key))
+    if conteos is None:
+        visibles, etiqueta = opciones, format_func
     else:
-        return st.sidebar.multiselect(label, opciones, key=key)
+        actuales = [] if check else st.session_state.get(key, [])
+        visibles = [o for o in opciones if conteos.get(o, 0) > 0 or o in actuales]
+        etiqueta = lambda o: f"{format_func(o)} ({conteos.get(o, 0)})"
+    if check:
+        # "Todo" no restringe la columna: se listan los valores alcanzables y se filtra con todos
+        st.session_state[key] = visibles
+        st.sidebar.multiselect(label, visibles, key=key, format_func=etiqueta, disabled=True)
+        return opciones
+    return st.sidebar.multiselect(label, visibles, key=key, format_func=etiqueta)
 
 # ---- CARGA DE DATOS ----
 st.sidebar.header("Carga de datos")
-uploaded_file = st.sidebar.file_uploader("Sube tu archivo Excel ABP", type=["xlsx"])
+uploaded_files = st.sidebar.file_uploader(
+    "Sube tus archivos Excel ABP (se añaden al almacén)", type=["xlsx"], accept_multiple_files=True
+)
 
-if uploaded_file:
-    df = pd.read_excel(uploaded_file)
-else:
-    @st.cache_data
-    def cargar_datos():
-        archivo = "Prova ABP.xlsx"
-        try:
-            df = pd.read_excel(archivo)
-        except FileNotFoundError:
-            st.error(f"No se encuentra el archivo `{archivo}`. Sube un archivo usando el botón de arriba.")
-            st.stop()
-        return df
-    df = cargar_datos()
+@st.cache_resource
+def almacen_datos():
+    return almacen.AlmacenABP()
+
+@st.cache_resource
+def registro_datos():
+    # Una copia de cada versión del almacén para todo el proceso, con presupuesto de memoria (ABP_MEMORIA_MB)
+    return registro.RegistroDatos()
+
+def cargar_datos(clave):
+    return registro_datos().obtener(clave, almacen_activo.cargar)
+
+def analisis_datos(clave):
+    # Índice, caché de filas filtradas y cubo compartidos por todas las sesiones; viven y se desalojan con el dataset
+    return registro_datos().derivado(
+        clave, "analisis",
+        lambda df: analitica.Analisis(
+            df, tabla_cubo=almacen_activo.cargar_cubo(), tabla_zonas=almacen_activo.cargar_cubo_zonas()
+        ),
+        almacen_activo.cargar
+    )
 
-# ---- NORMALIZA NOMBRES DE COLUMNAS ----
-df.columns = [col.lower() for col in df.columns]
+@st.cache_resource(max_entries=2)
+def analisis_sql(clave):
+    # Almacén mayor que la memoria: las consultas van a DuckDB sobre los Parquet y no se carga el dataset
+    return consultas.AnalisisSQL(almacen_activo)
+
+def incorporar_fichero(datos, progreso=None):
+    # Cada fichero se convierte a Parquet una vez y se añade al almacén solo si no estaba ya
+    huella = ingesta.asegurar_parquet(datos, progreso=progreso)
+    alm = almacen_datos()
+    if not alm.contiene_fichero(huella):
+        return alm.anadir(ingesta.cargar_parquet(huella), huella_fichero=huella)
+    return []
+
+incorporados = st.session_state.setdefault("_ficheros_incorporados", set())
+for archivo in uploaded_files or []:
+    if archivo.file_id not in incorporados:
+        barra = st.sidebar.progress(0.0, text=f"Leyendo {archivo.name}...")
+
+        def avanzar(hechas, total, barra=barra, nombre=archivo.name):
+            # El total sale de la dimensión declarada de cada hoja; sin ella solo se muestran las filas leídas
+            fraccion = min(hechas / total, 1.0) if total else 0.0
+            barra.progress(fraccion, text=f"Leyendo {nombre}: {hechas:,} filas")
+
+        try:
+            with st.spinner(f"Añadiendo {archivo.name} al almacén..."):
+                afectadas = incorporar_fichero(archivo.getvalue(), progreso=avanzar)
+        except esquema.ErrorEsquema as e:
+            st.sidebar.error(f"{archivo.name}: {e}")
+            afectadas = []
+        finally:
+            barra.empty()
+        incorporados.add(archivo.file_id)
+        if afectadas:
+            st.sidebar.success(f"{archivo.name}: {len(afectadas)} jornada(s) actualizada(s)")
+
+# ---- DATOS DE EJEMPLO ----
+# Mientras el almacén compartido está vacío se muestran los datos de ejemplo desde un almacén aparte:
+# nunca se mezclan con los ficheros que suben los usuarios
+ARCHIVO_MUESTRA = "Prova ABP.xlsx"
+
+@st.cache_resource(show_spinner=False)
+def huella_muestra():
+    # Huella del archivo de ejemplo (ya convertido a Parquet), o None si no está; se lee una vez por proceso
+    try:
+        with open(ARCHIVO_MUESTRA, "rb") as f:
+            return ingesta.asegurar_parquet(f.read())
+    except FileNotFoundError:
+        return None
+
+@st.cache_resource
+def almacen_muestra(huella):
+    # Los datos de ejemplo no cambian: el manifiesto se lee una sola vez
+    alm = almacen.AlmacenABP(ingesta.DIR_CACHE / "muestra" / huella)
+    if alm.vacio():
+        alm.anadir(ingesta.cargar_parquet(huella), huella_fichero=huella)
+    return alm, alm.manifiesto()
+
+# El manifiesto se lee una vez por rerun y se pasa a lo que lo necesita (versión, motor)
+manifiesto = almacen_datos().manifiesto()
+if not almacen_datos().vacio(manifiesto):
+    almacen_activo = almacen_datos()
+elif huella_muestra() is not None:
+    almacen_activo, manifiesto = almacen_muestra(huella_muestra())
+    st.sidebar.info("Se muestran datos de ejemplo: sube tus archivos para analizar los tuyos.")
+else:
+    st.error(f"No se encuentra el archivo `{ARCHIVO_MUESTRA}`. Sube un archivo usando el botón de arriba.")
+    st.stop()
+
+with traza.span("carga") as span:
+    clave = almacen_activo.version(manifiesto)
+    motor = consultas.elegir_motor(almacen_activo, manifiesto=manifiesto)
+    if motor == "duckdb":
+        analisis = analisis_sql(clave)
+        # Sin filas: solo sus columnas y tipos, para las comprobaciones de las páginas y las exportaciones
+        df = analisis.esqueleto()
+    else:
+        df = cargar_datos(clave)
+        analisis = analisis_datos(clave)
+    span.anotar(filas=analisis.n, motor=motor)
 
 # ---- EXTRAE VALORES ÚNICOS ORDENADOS ----
-def col_ok(col, dft=None):
-    dft = dft if dft is not None else df
-    return sorted(dft[col].dropna().unique()) if col in dft.columns else []
-
-df['jornada'] = pd.to_numeric(df['jornada'], errors='coerce')
-temporadas = col_ok('temporada')
-tipos_abp = col_ok('abp_tipo')
-ejecucion_tipos = col_ok('ejecucion_tipo')
-jugadores = col_ok('jugador_ejecutor')
-jugadores_objetivo = col_ok('jugador_objetivo')
-porteros_defensores = col_ok('portero_defensor')
-equipos_atacantes = col_ok('equipo_atacante')
-equipos_defensores = col_ok('equipo_defensor')
-tipo_tiro = col_ok('tiro')
-tipo_gol = col_ok('gol')
-jornada_min = int(df['jornada'].min())
-jornada_max = int(df['jornada'].max())
-fases_atacante = col_ok('momento_resultado_atacante')
-fases_defensor = col_ok('momento_resultado_defensor')
-mitades_disponibles = col_ok('momento_mitad')
-situaciones_numericas_atac = col_ok('situacion_numerica_atacante')
-situaciones_numericas_def = col_ok('situacion_numerica_defensor')
-porteros_ataca = col_ok('portero_ataca')
+@st.cache_data(show_spinner=False, persist="disk")
+def metadatos(clave, _analisis):
+    # Valores de cada filtro y rango de jornadas: una pasada por versión del almacén, no una por rerun.
+    # En disco: tras un arranque en frío no se recalculan mientras no cambie el almacén
+    columnas = [
+        'temporada', 'abp_tipo', 'ejecucion_tipo', 'jugador_ejecutor', 'jugador_objetivo', 'portero_defensor',
+        'equipo_atacante', 'equipo_defensor', 'tiro', 'gol', 'momento_resultado_atacante',
+        'momento_resultado_defensor', 'momento_mitad', 'momento_rango', 'situacion_numerica_atacante',
+        'situacion_numerica_defensor', 'portero_ataca',
+    ]
+    meta = {col: _analisis.valores(col) for col in columnas}
+    meta['jornada'] = _analisis.rango_jornadas()
+    return meta
+
+with traza.span("normalizacion"):
+    meta = metadatos(clave, analisis)
+    temporadas = meta['temporada']
+    tipos_abp = meta['abp_tipo']
+    ejecucion_tipos = meta['ejecucion_tipo']
+    jugadores = meta['jugador_ejecutor']
+    jugadores_objetivo = meta['jugador_objetivo']
+    porteros_defensores = meta['portero_defensor']
+    equipos_atacantes = meta['equipo_atacante']
+    equipos_defensores = meta['equipo_defensor']
+    tipo_tiro = meta['tiro']
+    tipo_gol = meta['gol']
+    jornada_min, jornada_max = meta['jornada']
+    fases_atacante = meta['momento_resultado_atacante']
+    fases_defensor = meta['momento_resultado_defensor']
+    mitades_disponibles = meta['momento_mitad']
+    situaciones_numericas_atac = meta['situacion_numerica_atacante']
+    situaciones_numericas_def = meta['situacion_numerica_defensor']
+    porteros_ataca = meta['portero_ataca']
 
 # ---- SIDEBAR DE NAVEGACIÓN ----
 st.sidebar.title("Navegación")
@@ -95,6 +237,50 @@ jornada_sel = st.sidebar.slider(
     key="jornada_sel"
 )
 
+# ---- FILTROS EN CASCADA (FACETAS) ----
+# Clave del widget -> columna filtrada
+FILTROS_FACETADOS = {
+    "temporada_sel": 'temporada',
+    "tipo_abp_sel": 'abp_tipo',
+    "ejecucion_tipo_sel": 'ejecucion_tipo',
+    "mitad_sel": 'momento_mitad',
+    "equipo_atacante_sel": 'equipo_atacante',
+    "equipo_defensor_sel": 'equipo_defensor',
+    "jugador_sel": 'jugador_ejecutor',
+    "jugador_objetivo_sel": 'jugador_objetivo',
+    "portero_defensor_sel": 'portero_defensor',
+    "portero_ataca_sel": 'portero_ataca',
+    "tipo_tiro_sel": 'tiro',
+    "tipo_gol_sel": 'gol',
+    "fase_atacante_sel": 'momento_resultado_atacante',
+    "fase_defensor_sel": 'momento_resultado_defensor',
+    "situacion_numerica_atac_sel": 'situacion_numerica_atacante',
+    "situacion_numerica_def_sel": 'situacion_numerica_defensor',
+    "franja_sel": 'momento_rango',
+}
+# Con selección vacía estos dejan el resultado vacío; el resto se ignoran (ver estado_filtros_actual)
+FILTROS_SIEMPRE = {'temporada', 'abp_tipo', 'jugador_ejecutor', 'tiro', 'gol', 'equipo_atacante', 'equipo_defensor'}
+
+def selecciones_previas():
+    # Lo elegido en los multiselect (ya actualizado por Streamlit) antes de volver a dibujarlos
+    # "Todo" filtra con todos los valores, así que también excluye los nulos de la columna
+    selecciones = {}
+    for key, col in FILTROS_FACETADOS.items():
+        if col not in df.columns:
+            continue
+        if st.session_state.get(f"{key}_todo", True) or key not in st.session_state:
+            valores = meta[col]
+        else:
+            valores = st.session_state[key]
+        if valores or col in FILTROS_SIEMPRE:
+            selecciones[col] = valores
+    return selecciones
+
+with traza.span("facetas"):
+    facetas = analisis.facetas(
+        filtros.EstadoFiltros.desde(selecciones_previas(), jornada_sel), columnas=list(FILTROS_FACETADOS.values())
+    )
+
 temporada_sel = multiselect_con_todo("Temporada", temporadas, "temporada_sel")
 tipo_abp_sel = multiselect_con_todo("Tipo ABP", tipos_abp, "tipo_abp_sel")
 ejecucion_tipo_sel = multiselect_con_todo("Tipo de ejecución", ejecucion_tipos, "ejecucion_tipo_sel") if ejecucion_tipos else []
@@ -104,9 +290,9 @@ equipo_defensor_sel = multiselect_con_todo("Equipo Defensor", equipos_defensores
 jugador_sel = multiselect_con_todo("Jugador ejecutor", jugadores, "jugador_sel")
 jugador_objetivo_sel = multiselect_con_todo("Jugador objetivo", jugadores_objetivo, "jugador_objetivo_sel") if jugadores_objetivo else []
 portero_defensor_sel = multiselect_con_todo("Portero defensor", porteros_defensores, "portero_defensor_sel") if porteros_defensores else []
-portero_ataca_sel = multiselect_con_todo("Portero ataca", porteros_ataca, "portero_ataca_sel") if porteros_ataca else []
-tipo_tiro_sel = multiselect_con_todo("¿Acaba en tiro?", tipo_tiro, "tipo_tiro_sel")
-tipo_gol_sel = multiselect_con_todo("¿Acaba en gol?", tipo_gol, "tipo_gol_sel")
+portero_ataca_sel = multiselect_con_todo("Portero ataca", porteros_ataca, "portero_ataca_sel", format_func=esquema.etiqueta_si_no) if porteros_ataca else []
+tipo_tiro_sel = multiselect_con_todo("¿Acaba en tiro?", tipo_tiro, "tipo_tiro_sel", format_func=esquema.etiqueta_si_no)
+tipo_gol_sel = multiselect_con_todo("¿Acaba en gol?", tipo_gol, "tipo_gol_sel", format_func=esquema.etiqueta_si_no)
 fase_atacante_sel = multiselect_con_todo("Resultado atacante", fases_atacante, "fase_atacante_sel") if fases_atacante else []
 fase_defensor_sel = multiselect_con_todo("Resultado defensor", fases_defensor, "fase_defensor_sel") if fases_defensor else []
 situacion_numerica_atac_sel = multiselect_con_todo("Situación numérica atacante", situaciones_numericas_atac, "situacion_numerica_atac_sel") if situaciones_numericas_atac else []
@@ -118,7 +304,7 @@ franjas_segunda = ["45-60", "61-75", "76-90", "EXTRA 2"]
 opciones_timeline = franjas_primera + franjas_segunda
 
 if 'momento_rango' in df.columns:
-    franjas_data = list(df['momento_rango'].dropna().unique())
+    franjas_data = meta['momento_rango']
     if mitad_sel == ["Primera"]:
         franjas_disponibles = [o for o in franjas_primera if o in franjas_data]
     elif mitad_sel == ["Segunda"]:
@@ -132,459 +318,554 @@ else:
 
 franja_sel = multiselect_con_todo("Franja(s) de tiempo", franjas_disponibles, "franja_sel") if franjas_disponibles else []
 
+# ---- OPCIONES DE VISUALIZACIÓN ----
+max_puntos_campo = st.sidebar.number_input(
+    "Máx. puntos en el mapa del campo (por encima, mapa de densidad)",
+    min_value=100,
+    value=campo.MAX_PUNTOS,
+    step=500,
+    key="max_puntos_campo"
+)
+
 # ---- FUNCION DE FILTRADO ----
-def aplicar_filtros(df):
-    condiciones = (
-        df['temporada'].isin(temporada_sel) &
-        df['abp_tipo'].isin(tipo_abp_sel) &
-        df['jornada'].between(jornada_sel[0], jornada_sel[1]) &
-        df['jugador_ejecutor'].isin(jugador_sel) &
-        df['tiro'].isin(tipo_tiro_sel) &
-        df['gol'].isin(tipo_gol_sel) &
-        df['equipo_atacante'].isin(equipo_atacante_sel) &
-        df['equipo_defensor'].isin(equipo_defensor_sel)
+def estado_filtros_actual():
+    # Filtros que se aplican siempre (una selección vacía deja el resultado vacío)
+    selecciones = {
+        'temporada': temporada_sel,
+        'abp_tipo': tipo_abp_sel,
+        'jugador_ejecutor': jugador_sel,
+        'tiro': tipo_tiro_sel,
+        'gol': tipo_gol_sel,
+        'equipo_atacante': equipo_atacante_sel,
+        'equipo_defensor': equipo_defensor_sel,
+    }
+    # Filtros opcionales: solo si hay selección y la columna existe
+    opcionales = {
+        'momento_resultado_atacante': fase_atacante_sel,
+        'momento_mitad': mitad_sel,
+        'momento_rango': franja_sel,
+        'portero_defensor': portero_defensor_sel,
+        'situacion_numerica_atacante': situacion_numerica_atac_sel,
+        'situacion_numerica_defensor': situacion_numerica_def_sel,
+        'portero_ataca': portero_ataca_sel,
+        'jugador_objetivo': jugador_objetivo_sel,
+        'ejecucion_tipo': ejecucion_tipo_sel,
+        'momento_resultado_defensor': fase_defensor_sel,
+    }
+    selecciones.update({col: sel for col, sel in opcionales.items() if sel and col in df.columns})
+    return filtros.EstadoFiltros.desde(selecciones, jornada_sel)
+
+estado_filtros = estado_filtros_actual()
+
+# ---- MAPA DEL CAMPO Y TOP EJECUTORES ----
+def mostrar_campo():
+    # Puntos si las ejecuciones filtradas caben en max_puntos_campo; si no, solo viaja la densidad por celda
+    st.subheader("Mapa de zonas de ejecución sobre el campo")
+    if 'x_ejecucion' not in df.columns or 'y_ejecucion' not in df.columns:
+        st.info("No hay columnas de ejecuciones para el campo.")
+        return
+    titulo = "Zonas de ejecución sobre campo de fútbol"
+    with traza.span("filtro/campo") as span:
+        puntos = analisis.puntos(estado_filtros, 'x_ejecucion', 'y_ejecucion', ['abp_tipo'], maximo=max_puntos_campo)
+        densidad = analisis.densidad(estado_filtros, 'x_ejecucion', 'y_ejecucion') if puntos is None else None
+        span.anotar(puntos=None if puntos is None else len(puntos))
+    if puntos is not None and puntos.empty:
+        st.info("No hay datos de ejecuciones para mostrar en el campo.")
+        return
+    with traza.span("figura/campo"):
+        if puntos is None:
+            fig_campo = campo.figura_densidad(*densidad, title=titulo)
+        else:
+            fig_campo = campo.figura_campo(puntos, 'x_ejecucion', 'y_ejecucion', color_col='abp_tipo', title=titulo,
+                                           max_puntos=max_puntos_campo)
+    mostrar_figura("Mapa de zonas de ejecución sobre el campo", fig_campo)
+
+def mostrar_top_ejecutores(titulo):
+    st.subheader(titulo)
+    with traza.span("agregacion/top_ejecutores"):
+        top_ejecutores = analisis.top_ejecutores(estado_filtros)
+    fig_ej = px.bar(top_ejecutores, x='jugador_ejecutor', y='count')
+    mostrar_figura(titulo, fig_ej)
+
+# ---- ESTADÍSTICAS POR ZONA DEL CAMPO ----
+# Medida -> columna de zonas.estadisticas (también sirve de etiqueta)
+ETIQUETAS_ZONAS = {'abp': "ABP", 'tiros': "Tiros", 'goles': "Goles", 'xg_suma': "xG", 'xg_abp': "xG/ABP"}
+
+def mostrar_zonas(key):
+    # Todo sale del cubo de zonas filtrado: las zonas y celdas se asignaron al cargar los datos
+    st.subheader("Estadísticas por zona del campo")
+    with traza.span("agregados/zonas") as span:
+        agg = analisis.agregados_zonas(estado_filtros)
+        span.anotar(grupos=len(agg))
+    if zonas.columna_zona('ejecucion') not in agg.columns:
+        st.info("Los datos no tienen zonas del campo asignadas.")
+        return
+    c1, c2, c3 = st.columns(3)
+    rol = c1.radio("Punto", list(zonas.ZONAS), horizontal=True, key=f"{key}_rol",
+                   format_func={'ejecucion': "Ejecución", 'tiro': "Tiro"}.get)
+    medida = c2.selectbox("Medida", list(ETIQUETAS_ZONAS), format_func=ETIQUETAS_ZONAS.get, key=f"{key}_medida")
+    vista = c3.radio("Vista", ["Zonas", "Rejilla"], horizontal=True, key=f"{key}_vista")
+    with traza.span("agregacion/zonas"):
+        tabla_zonas = zonas.estadisticas(agg, rol)
+    if tabla_zonas.empty:
+        st.info("No hay datos con coordenadas para estas zonas.")
+        return
+    titulo = "Zonas de ejecución" if rol == 'ejecucion' else "Zonas de tiro"
+    with traza.span("figura/zonas"):
+        if vista == "Zonas":
+            valores = dict(zip(tabla_zonas['Zona'], tabla_zonas[ETIQUETAS_ZONAS[medida]]))
+            fig = campo.figura_zonas(zonas.ZONAS[rol], valores, titulo, etiqueta=ETIQUETAS_ZONAS[medida])
+        else:
+            fig = campo.figura_rejilla(zonas.mapa_celdas(agg, rol, medida), titulo, etiqueta=ETIQUETAS_ZONAS[medida])
+    mostrar_figura("Zonas del campo", fig)
+    st.dataframe(tabla_zonas, hide_index=True, use_container_width=True)
+
+# ---- LAYOUTS DE LA RED ----
+@st.cache_resource
+def cache_layouts():
+    return red.CacheLayouts()
+
+# ---- RANKING DEFENSIVO POR VENTANAS ----
+@st.cache_resource(show_spinner=False, max_entries=32)
+def ranking_defensivo(clave, estado, _analisis):
+    # Sumas prefijo por equipo y jornada del estado de filtros: cambiar ventana, criterio o jornada no re-agrega
+    return analitica.RankingDefensivo(_analisis.agregados(estado))
+
+# ---- SERIES TEMPORALES POR EQUIPO ----
+@st.cache_resource(show_spinner=False, max_entries=32)
+def series_equipos(clave, estado, por_temporada, _analisis):
+    # Matriz equipo x jornada del estado de filtros: cambiar de vista o de medida no re-agrega
+    return analitica.SeriesEquipos(_analisis.agregados(estado), por_temporada=por_temporada)
+
+ETIQUETAS_MEDIDAS = {'xg_suma': "xG", 'tiros': "Tiros", 'goles': "Goles", 'abp': "ABP"}
+ETIQUETAS_MODOS = {'acumulado': "Acumulado", 'por_jornada': "Por jornada", 'media_movil': "Media móvil", 'por_abp': "Por ABP (acumulado)"}
+
+def mostrar_series_equipos(key):
+    st.subheader("Evolución por jornada (equipos atacantes seleccionados)")
+    if 'xg_tiro' not in df.columns:
+        st.info("No hay columna 'xg_tiro' en los datos.")
+        return
+    c1, c2, c3, c4 = st.columns(4)
+    medida = c1.selectbox("Medida", list(ETIQUETAS_MEDIDAS), format_func=ETIQUETAS_MEDIDAS.get, key=f"{key}_medida")
+    modo = c2.selectbox("Vista", analitica.MODOS_SERIES, format_func=ETIQUETAS_MODOS.get, key=f"{key}_modo")
+    ventana = c3.number_input("Ventana (jornadas)", min_value=1, value=3, key=f"{key}_ventana", disabled=modo != 'media_movil')
+    por_temporada = c4.toggle("Separar temporadas", value=False, key=f"{key}_temporadas")
+    with traza.span("agregacion/series_equipos"):
+        motor = series_equipos(clave, estado_filtros, por_temporada, analisis)
+        datos = motor.vista(medida, modo, ventana, equipos=equipo_atacante_sel)
+    if datos.empty:
+        st.info("No hay datos para mostrar la evolución por jornada.")
+        return
+    titulo = f"{ETIQUETAS_MEDIDAS[medida]} {ETIQUETAS_MODOS[modo].lower()} por jornada"
+    fig = px.line(
+        datos, x='jornada', y=medida, color='equipo_atacante',
+        line_dash='temporada' if por_temporada else None,
+        labels={medida: ETIQUETAS_MEDIDAS[medida]}, title=titulo
     )
-    if fase_atacante_sel and 'momento_resultado_atacante' in df.columns:
-        condiciones = condiciones & df['momento_resultado_atacante'].isin(fase_atacante_sel)
-    if mitad_sel and 'momento_mitad' in df.columns:
-        condiciones = condiciones & df['momento_mitad'].isin(mitad_sel)
-    if franja_sel and 'momento_rango' in df.columns:
-        condiciones = condiciones & df['momento_rango'].isin(franja_sel)
-    if portero_defensor_sel and 'portero_defensor' in df.columns:
-        condiciones = condiciones & df['portero_defensor'].isin(portero_defensor_sel)
-    if situacion_numerica_atac_sel and 'situacion_numerica_atacante' in df.columns:
-        condiciones = condiciones & df['situacion_numerica_atacante'].isin(situacion_numerica_atac_sel)
-    if situacion_numerica_def_sel and 'situacion_numerica_defensor' in df.columns:
-        condiciones = condiciones & df['situacion_numerica_defensor'].isin(situacion_numerica_def_sel)
-    if portero_ataca_sel and 'portero_ataca' in df.columns:
-        condiciones = condiciones & df['portero_ataca'].isin(portero_ataca_sel)
-    if jugador_objetivo_sel and 'jugador_objetivo' in df.columns:
-        condiciones = condiciones & df['jugador_objetivo'].isin(jugador_objetivo_sel)
-    if ejecucion_tipo_sel and 'ejecucion_tipo' in df.columns:
-        condiciones = condiciones & df['ejecucion_tipo'].isin(ejecucion_tipo_sel)
-    if fase_defensor_sel and 'momento_resultado_defensor' in df.columns:
-        condiciones = condiciones & df['momento_resultado_defensor'].isin(fase_defensor_sel)
-    return df[condiciones]
-
-# ---- FUNCION CAMPO CON FONDO ----
-def plot_campo_con_fondo(df, x_col, y_col, color_col=None, title="Zonas de ejecución sobre campo", campo_img_path="Campo xG.png"):
-    img = Image.open(campo_img_path)
-    fig = go.Figure()
-    fig.add_layout_image(
-        dict(
-            source=img,
-            xref="x",
-            yref="y",
-            x=0,
-            y=80,
-            sizex=120,
-            sizey=80,
-            sizing="stretch",
-            layer="below"
-        )
+    mostrar_figura("Evolución por jornada", fig)
+
+# ---- TABLA PAGINADA EN EL SERVIDOR ----
+def vista_tabla(clave, analisis):
+    if motor == "duckdb":
+        return consultas.VistaTablaSQL(analisis)
+    return registro_datos().derivado(
+        clave, "vista_tabla", lambda df: tabla.VistaTabla(df, analisis.indice), almacen_activo.cargar
     )
-    if color_col and color_col in df.columns:
-        for tipo in df[color_col].dropna().unique():
-            dft = df[df[color_col] == tipo]
-            fig.add_trace(go.Scatter(
-                x=dft[x_col], y=dft[y_col],
-                mode="markers",
-                name=str(tipo),
-                marker=dict(size=10),
-                hoverinfo="text",
-                text=dft[color_col]
-            ))
+
+@fragmento
+def mostrar_tabla(key):
+    # Solo viaja al navegador la página actual con las columnas elegidas; paginar no re-ejecuta la página
+    vista = vista_tabla(clave, analisis)
+    por_defecto = [c for c in tabla.COLUMNAS_POR_DEFECTO if c in df.columns]
+    c1, c2, c3 = st.columns([3, 2, 1])
+    columnas = c1.multiselect("Columnas", list(df.columns), default=por_defecto, key=f"{key}_columnas") or por_defecto
+    busqueda = c2.text_input("Buscar", key=f"{key}_buscar").strip()
+    tamano = c3.selectbox("Filas por página", [25, 50, 100, 250], index=1, key=f"{key}_tamano")
+    c4, c5, c6 = st.columns([3, 1, 2])
+    orden = c4.selectbox("Ordenar por", ["(sin ordenar)"] + columnas, key=f"{key}_orden")
+    ascendente = c5.toggle("Ascendente", value=True, key=f"{key}_asc")
+    with traza.span("tabla") as span:
+        filas = vista.filas_ordenadas(
+            estado_filtros, analisis.filas(estado_filtros),
+            orden=None if orden == "(sin ordenar)" else orden,
+            ascendente=ascendente, busqueda=busqueda, columnas_busqueda=columnas
+        )
+        paginas = max(1, -(-len(filas) // tamano))
+        if st.session_state.get(f"{key}_pagina", 1) > paginas:
+            st.session_state[f"{key}_pagina"] = 1
+        numero = c6.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, key=f"{key}_pagina")
+        pagina_df = vista.pagina(filas, columnas, numero - 1, tamano)
+        span.anotar(filas=len(filas))
+    st.caption(f"{len(filas):,} filas · mostrando {len(pagina_df)}")
+    st.dataframe(pagina_df, use_container_width=True, hide_index=True)
+
+# ---- CUBO AGREGADO Y KPIs ----
+def agregados_filtrados():
+    with traza.span("agregados") as span:
+        agg = analisis.agregados(estado_filtros)
+        span.anotar(grupos=len(agg))
+    return agg
+
+def mostrar_kpis(titulo, agg):
+    st.subheader(titulo)
+    with traza.span("agregacion/kpis"):
+        kpis = analitica.kpis(agg)
+    k1, k2, k3, k4, k5, k6 = st.columns(6)
+    k1.metric("Total ABP (todas las acciones)", analisis.n)
+    k2.metric("Total ABP (según filtros)", kpis['abp'])
+    k3.metric("Equipos atacantes", kpis['equipos_atacantes'])
+    k4.metric("Equipos defensores", kpis['equipos_defensores'])
+    k5.metric("Tiros", kpis['tiros'])
+    if 'gol' in df.columns:
+        k6.metric("Goles", kpis['goles'])
     else:
-        fig.add_trace(go.Scatter(
-            x=df[x_col], y=df[y_col],
-            mode="markers",
-            marker=dict(size=10, color='red'),
-            name="Ejecuciones"
-        ))
-    fig.update_xaxes(range=[-5, 125], constrain="domain", showgrid=False, showticklabels=False, visible=False)
-    fig.update_yaxes(range=[-5, 85], scaleanchor="x", scaleratio=1, constrain="domain", showgrid=False, showticklabels=False, visible=False)    
-    fig.update_layout(
-        title=title,
-        width=900,
-        height=int(900 / 2.25),
-        showlegend=True,
-        plot_bgcolor="white",
-        margin=dict(l=10, r=10, t=40, b=10)
-    )
-    return fig
+        k6.metric("Goles", "—")
+    st.markdown("---")
 
 # ========== PÁGINAS PRINCIPALES ==========
 
-if pagina == "Dashboard general":
+@fragmento
+def pagina_dashboard():
     st.title("Dashboard resumen ABP")
-    df_pag = aplicar_filtros(df)
-    st.dataframe(df_pag, use_container_width=True)
+    agg = agregados_filtrados()
+    mostrar_tabla("tabla_dashboard")
 
-    # KPIs
-    st.subheader("KPIs generales")
-    k1, k2, k3, k4, k5, k6 = st.columns(6)
-    k1.metric("Total ABP (todas las acciones)", len(df))
-    k2.metric("Total ABP (según filtros)", len(df_pag))
-    k3.metric("Equipos atacantes", df_pag['equipo_atacante'].nunique())
-    k4.metric("Equipos defensores", df_pag['equipo_defensor'].nunique())
-    k5.metric("Tiros", df_pag['tiro'].str.upper().eq("SI").sum())
-    if 'gol' in df_pag.columns:
-        k6.metric("Goles", df_pag['gol'].str.upper().eq("SI").sum())
-    else:
-        k6.metric("Goles", "—")
-    st.markdown("---")
+    mostrar_kpis("KPIs generales", agg)
     
     # Gráficos principales
     st.subheader("Distribución de tipos de ABP")
-    abp_tipo_count = df_pag['abp_tipo'].value_counts().reset_index()
-    abp_tipo_count.columns = ['abp_tipo', 'count']
+    with traza.span("agregacion/abp_por_tipo"):
+        abp_tipo_count = analitica.abp_por_tipo(agg)
     fig1 = px.bar(abp_tipo_count, x='abp_tipo', y='count', title="ABP por tipo")
-    st.plotly_chart(fig1, use_container_width=True)
+    mostrar_figura("Distribución de tipos de ABP", fig1)
     
     st.subheader("Evolución de ABP por jornada")
-    abp_jornada = df_pag.groupby('jornada').size().reset_index(name='Cantidad')
+    with traza.span("agregacion/abp_por_jornada"):
+        abp_jornada = analitica.abp_por_jornada(agg)
     fig2 = px.line(abp_jornada, x='jornada', y='Cantidad', markers=True)
-    st.plotly_chart(fig2, use_container_width=True)
+    mostrar_figura("Evolución de ABP por jornada", fig2)
     
     # --- CAMPO DE FÚTBOL CON PUNTOS ---
-    st.subheader("Mapa de zonas de ejecución sobre el campo")
-    if 'x_ejecucion' in df_pag.columns and 'y_ejecucion' in df_pag.columns:
-        ejecs = df_pag.dropna(subset=['x_ejecucion', 'y_ejecucion'])
-        if not ejecs.empty:
-            fig_campo = plot_campo_con_fondo(
-                ejecs, x_col='x_ejecucion', y_col='y_ejecucion',
-                color_col='abp_tipo',
-                title="Zonas de ejecución sobre campo de fútbol",
-                campo_img_path="Campo xG.png"
-            )
-            st.plotly_chart(fig_campo, use_container_width=True)
-        else:
-            st.info("No hay datos de ejecuciones para mostrar en el campo.")
-    else:
-        st.info("No hay columnas de ejecuciones para el campo.")
+    mostrar_campo()
 
-    st.subheader("Top ejecutores (nº ABP)")
-    top_ejecutores = df_pag['jugador_ejecutor'].value_counts().reset_index().head(10)
-    top_ejecutores.columns = ['jugador_ejecutor', 'count']
-    fig_ej = px.bar(top_ejecutores, x='jugador_ejecutor', y='count')
-    st.plotly_chart(fig_ej, use_container_width=True)
-
-    st.subheader("xG acumulado por jornada (equipos atacantes seleccionados)")
-    if 'xg_tiro' in df_pag.columns and not df_pag.empty:
-        equipos_disponibles = equipo_atacante_sel
-        jornadas_disponibles = sorted(df['jornada'].dropna().unique())
-        xg_ac = (
-            df_pag.groupby(['equipo_atacante', 'jornada'])['xg_tiro']
-            .sum().reset_index()
-            .set_index(['equipo_atacante', 'jornada'])
-            .unstack(fill_value=0)
-            .stack().reset_index()
-        )
-        full_idx = pd.MultiIndex.from_product([equipos_disponibles, jornadas_disponibles], names=['equipo_atacante', 'jornada'])
-        xg_ac = xg_ac.set_index(['equipo_atacante', 'jornada']).reindex(full_idx, fill_value=0).reset_index()
-        fig_xg = px.line(
-            xg_ac, x='jornada', y='xg_tiro', color='equipo_atacante',
-            title="xG acumulado por jornada (equipos atacantes seleccionados)"
-        )
-        st.plotly_chart(fig_xg, use_container_width=True)
-    else:
-        st.info("No hay columna 'xg_tiro' en los datos.")
+    mostrar_top_ejecutores("Top ejecutores (nº ABP)")
 
-elif pagina == "Análisis equipos atacantes":
+    mostrar_series_equipos("series_general")
+
+@fragmento
+def pagina_atacantes():
     st.title("Análisis de equipos atacantes (ABP)")
-    df_pag = aplicar_filtros(df)
+    agg = agregados_filtrados()
 
-    st.dataframe(df_pag, use_container_width=True)
+    mostrar_tabla("tabla_atacantes")
 
-    st.subheader("KPIs equipos atacantes")
-    k1, k2, k3, k4, k5, k6 = st.columns(6)
-    k1.metric("Total ABP (todas las acciones)", len(df))
-    k2.metric("Total ABP (según filtros)", len(df_pag))
-    k3.metric("Equipos atacantes", df_pag['equipo_atacante'].nunique())
-    k4.metric("Equipos defensores", df_pag['equipo_defensor'].nunique())
-    k5.metric("Tiros", df_pag['tiro'].str.upper().eq("SI").sum())
-    if 'gol' in df_pag.columns:
-        k6.metric("Goles", df_pag['gol'].str.upper().eq("SI").sum())
-    else:
-        k6.metric("Goles", "—")
-    st.markdown("---")
+    mostrar_kpis("KPIs equipos atacantes", agg)
 
     st.subheader("Distribución de tipos de ABP")
-    abp_tipo_count = df_pag['abp_tipo'].value_counts().reset_index()
-    abp_tipo_count.columns = ['abp_tipo', 'count']
+    with traza.span("agregacion/abp_por_tipo"):
+        abp_tipo_count = analitica.abp_por_tipo(agg)
     fig1 = px.bar(abp_tipo_count, x='abp_tipo', y='count', title="ABP por tipo")
-    st.plotly_chart(fig1, use_container_width=True)
+    mostrar_figura("Distribución de tipos de ABP", fig1)
 
     st.subheader("ABP por equipo atacante")
-    ataque_count = df_pag['equipo_atacante'].value_counts().reset_index()
-    ataque_count.columns = ['equipo_atacante', 'count']
+    with traza.span("agregacion/abp_por_equipo"):
+        ataque_count = analitica.abp_por_equipo(agg, 'equipo_atacante')
     fig2 = px.bar(ataque_count, x='equipo_atacante', y='count', title="ABP por equipo atacante")
-    st.plotly_chart(fig2, use_container_width=True)
+    mostrar_figura("ABP por equipo atacante", fig2)
 
     st.subheader("Evolución de ABP por jornada")
-    abp_jornada = df_pag.groupby('jornada').size().reset_index(name='Cantidad')
+    with traza.span("agregacion/abp_por_jornada"):
+        abp_jornada = analitica.abp_por_jornada(agg)
     fig3 = px.line(abp_jornada, x='jornada', y='Cantidad', markers=True)
-    st.plotly_chart(fig3, use_container_width=True)
+    mostrar_figura("Evolución de ABP por jornada", fig3)
 
-    st.subheader("Mapa de zonas de ejecución sobre el campo")
-    if 'x_ejecucion' in df_pag.columns and 'y_ejecucion' in df_pag.columns:
-        ejecs = df_pag.dropna(subset=['x_ejecucion', 'y_ejecucion'])
-        if not ejecs.empty:
-            fig_campo = plot_campo_con_fondo(
-                ejecs, x_col='x_ejecucion', y_col='y_ejecucion',
-                color_col='abp_tipo',
-                title="Zonas de ejecución sobre campo de fútbol",
-                campo_img_path="Campo xG.png"
-            )
-            st.plotly_chart(fig_campo, use_container_width=True)
-        else:
-            st.info("No hay datos de ejecuciones para mostrar en el campo.")
-    else:
-        st.info("No hay columnas de ejecuciones para el campo.")
+    mostrar_campo()
 
-    st.subheader("Top ejecutores")
-    top_ejecutores = df_pag['jugador_ejecutor'].value_counts().reset_index().head(10)
-    top_ejecutores.columns = ['jugador_ejecutor', 'count']
-    fig_ej = px.bar(top_ejecutores, x='jugador_ejecutor', y='count')
-    st.plotly_chart(fig_ej, use_container_width=True)
-
-    st.subheader("xG acumulado por jornada (equipos atacantes seleccionados)")
-    if 'xg_tiro' in df_pag.columns and not df_pag.empty:
-        equipos_disponibles = equipo_atacante_sel
-        jornadas_disponibles = sorted(df['jornada'].dropna().unique())
-        xg_ac = (
-            df_pag.groupby(['equipo_atacante', 'jornada'])['xg_tiro']
-            .sum().reset_index()
-            .set_index(['equipo_atacante', 'jornada'])
-            .unstack(fill_value=0)
-            .stack().reset_index()
-        )
-        full_idx = pd.MultiIndex.from_product([equipos_disponibles, jornadas_disponibles], names=['equipo_atacante', 'jornada'])
-        xg_ac = xg_ac.set_index(['equipo_atacante', 'jornada']).reindex(full_idx, fill_value=0).reset_index()
-        fig_xg = px.line(
-            xg_ac, x='jornada', y='xg_tiro', color='equipo_atacante',
-            title="xG acumulado por jornada (equipos atacantes seleccionados)"
-        )
-        st.plotly_chart(fig_xg, use_container_width=True)
-    else:
-        st.info("No hay columna 'xg_tiro' en los datos.")
+    mostrar_zonas("zonas_atacantes")
+
+    mostrar_top_ejecutores("Top ejecutores")
+
+    mostrar_series_equipos("series_atacantes")
 
     st.subheader("Efectividad: % de ABP que terminan en tiro")
-    total_abp = len(df_pag)
-    tiros = df_pag['tiro'].str.upper().eq("SI").sum()
-    porcentaje_tiro = (tiros / total_abp * 100) if total_abp > 0 else 0
+    with traza.span("agregacion/porcentaje_tiro"):
+        porcentaje_tiro = analitica.porcentaje_tiro(agg)
     st.write(f"**{porcentaje_tiro:.1f}%** de las ABP terminan en tiro.")
 
     st.subheader("xG medio por tipo de ABP")
-    if 'xg_tiro' in df_pag.columns:
-        xg_media = df_pag.groupby('abp_tipo')['xg_tiro'].mean().reset_index()
+    if 'xg_tiro' in df.columns:
+        with traza.span("agregacion/xg_medio_por_tipo"):
+            xg_media = analitica.xg_medio_por_tipo(agg)
         fig4 = px.bar(
             xg_media, x='abp_tipo', y='xg_tiro',
             labels={'abp_tipo': 'Tipo ABP', 'xg_tiro': 'xG medio'},
             title="xG medio por tipo de ABP"
         )
-        st.plotly_chart(fig4, use_container_width=True)
+        mostrar_figura("xG medio por tipo de ABP", fig4)
     else:
         st.info("No hay columna 'xg_tiro' en los datos.")
 
-elif pagina == "Análisis equipos defensores":
+@fragmento
+def pagina_defensores():
     st.title("Análisis de equipos defensores (ABP)")
-    df_pag = aplicar_filtros(df)
+    agg = agregados_filtrados()
 
-    st.dataframe(df_pag, use_container_width=True)
+    mostrar_tabla("tabla_defensores")
 
-    st.subheader("KPIs equipos defensores")
-    k1, k2, k3, k4, k5, k6 = st.columns(6)
-    k1.metric("Total ABP (todas las acciones)", len(df))
-    k2.metric("Total ABP (según filtros)", len(df_pag))
-    k3.metric("Equipos atacantes", df_pag['equipo_atacante'].nunique())
-    k4.metric("Equipos defensores", df_pag['equipo_defensor'].nunique())
-    k5.metric("Tiros", df_pag['tiro'].str.upper().eq("SI").sum())
-    if 'gol' in df_pag.columns:
-        k6.metric("Goles", df_pag['gol'].str.upper().eq("SI").sum())
-    else:
-        k6.metric("Goles", "—")
-    st.markdown("---")
+    mostrar_kpis("KPIs equipos defensores", agg)
 
     st.subheader("Distribución de tipos de ABP")
-    abp_tipo_count = df_pag['abp_tipo'].value_counts().reset_index()
-    abp_tipo_count.columns = ['abp_tipo', 'count']
+    with traza.span("agregacion/abp_por_tipo"):
+        abp_tipo_count = analitica.abp_por_tipo(agg)
     fig1 = px.bar(abp_tipo_count, x='abp_tipo', y='count', title="ABP por tipo")
-    st.plotly_chart(fig1, use_container_width=True)
+    mostrar_figura("Distribución de tipos de ABP", fig1)
 
     st.subheader("ABP por equipo defensor")
-    defensa_count = df_pag['equipo_defensor'].value_counts().reset_index()
-    defensa_count.columns = ['equipo_defensor', 'count']
+    with traza.span("agregacion/abp_por_equipo"):
+        defensa_count = analitica.abp_por_equipo(agg, 'equipo_defensor')
     fig2 = px.bar(defensa_count, x='equipo_defensor', y='count', title="ABP por equipo defensor")
-    st.plotly_chart(fig2, use_container_width=True)
+    mostrar_figura("ABP por equipo defensor", fig2)
 
     st.subheader("Evolución de ABP por jornada")
-    abp_jornada = df_pag.groupby('jornada').size().reset_index(name='Cantidad')
+    with traza.span("agregacion/abp_por_jornada"):
+        abp_jornada = analitica.abp_por_jornada(agg)
     fig3 = px.line(abp_jornada, x='jornada', y='Cantidad', markers=True)
-    st.plotly_chart(fig3, use_container_width=True)
+    mostrar_figura("Evolución de ABP por jornada", fig3)
 
-    st.subheader("Mapa de zonas de ejecución sobre el campo")
-    if 'x_ejecucion' in df_pag.columns and 'y_ejecucion' in df_pag.columns:
-        ejecs = df_pag.dropna(subset=['x_ejecucion', 'y_ejecucion'])
-        if not ejecs.empty:
-            fig_campo = plot_campo_con_fondo(
-                ejecs, x_col='x_ejecucion', y_col='y_ejecucion',
-                color_col='abp_tipo',
-                title="Zonas de ejecución sobre campo de fútbol",
-                campo_img_path="Campo xG.png"
-            )
-            st.plotly_chart(fig_campo, use_container_width=True)
-        else:
-            st.info("No hay datos de ejecuciones para mostrar en el campo.")
-    else:
-        st.info("No hay columnas de ejecuciones para el campo.")
+    mostrar_campo()
 
-    st.subheader("Top ejecutores")
-    top_ejecutores = df_pag['jugador_ejecutor'].value_counts().reset_index().head(10)
-    top_ejecutores.columns = ['jugador_ejecutor', 'count']
-    fig_ej = px.bar(top_ejecutores, x='jugador_ejecutor', y='count')
-    st.plotly_chart(fig_ej, use_container_width=True)
+    mostrar_zonas("zonas_defensores")
+
+    mostrar_top_ejecutores("Top ejecutores")
 
     st.info("El xG acumulado siempre es por equipo atacante. Para comparar xG, usa el análisis atacante.")
 
     st.subheader("Efectividad defensiva: % de ABP que reciben tiro")
-    total_abp = len(df_pag)
-    tiros = df_pag['tiro'].str.upper().eq("SI").sum()
-    porcentaje_tiro = (tiros / total_abp * 100) if total_abp > 0 else 0
+    with traza.span("agregacion/porcentaje_tiro"):
+        porcentaje_tiro = analitica.porcentaje_tiro(agg)
     st.write(f"**{porcentaje_tiro:.1f}%** de las ABP reciben tiro.")
 
     st.subheader("xG medio por tipo de ABP")
-    if 'xg_tiro' in df_pag.columns:
-        xg_media = df_pag.groupby('abp_tipo')['xg_tiro'].mean().reset_index()
+    if 'xg_tiro' in df.columns:
+        with traza.span("agregacion/xg_medio_por_tipo"):
+            xg_media = analitica.xg_medio_por_tipo(agg)
         fig4 = px.bar(
             xg_media, x='abp_tipo', y='xg_tiro',
             labels={'abp_tipo': 'Tipo ABP', 'xg_tiro': 'xG medio'},
             title="xG medio por tipo de ABP"
         )
-        st.plotly_chart(fig4, use_container_width=True)
+        mostrar_figura("xG medio por tipo de ABP", fig4)
     else:
         st.info("No hay columna 'xg_tiro' en los datos.")
 
-elif pagina == "Comparativa entre equipos":
-    st.title("Comparativa entre dos equipos")
-    equipo1 = st.selectbox("Selecciona equipo 1", equipos_atacantes)
-    equipo2 = st.selectbox("Selecciona equipo 2", equipos_atacantes, index=1 if len(equipos_atacantes) > 1 else 0)
-    df1 = aplicar_filtros(df[df['equipo_atacante'] == equipo1])
-    df2 = aplicar_filtros(df[df['equipo_atacante'] == equipo2])
-    col1, col2 = st.columns(2)
-    with col1:
-        st.metric(f"ABP {equipo1}", len(df1))
-        st.metric(f"Tiros {equipo1}", df1['tiro'].str.upper().eq("SI").sum())
-        if 'gol' in df1.columns:
-            st.metric(f"Goles {equipo1}", df1['gol'].str.upper().eq("SI").sum())
-    with col2:
-        st.metric(f"ABP {equipo2}", len(df2))
-        st.metric(f"Tiros {equipo2}", df2['tiro'].str.upper().eq("SI").sum())
-        if 'gol' in df2.columns:
-            st.metric(f"Goles {equipo2}", df2['gol'].str.upper().eq("SI").sum())
-    st.subheader("Comparativa por jornada (línea)")
-    if not df1.empty and not df2.empty:
-        abp1 = df1.groupby('jornada').size().reset_index(name=equipo1)
-        abp2 = df2.groupby('jornada').size().reset_index(name=equipo2)
-        df_comp = pd.merge(abp1, abp2, on='jornada', how='outer').fillna(0)
-        fig_comp = go.Figure()
-        fig_comp.add_trace(go.Scatter(x=df_comp['jornada'], y=df_comp[equipo1], name=equipo1))
-        fig_comp.add_trace(go.Scatter(x=df_comp['jornada'], y=df_comp[equipo2], name=equipo2))
-        fig_comp.update_layout(title="ABP por jornada")
-        st.plotly_chart(fig_comp, use_container_width=True)
+@fragmento
+def pagina_comparativa_equipos():
+    st.title("Comparativa entre equipos")
+    c1, c2 = st.columns(2)
+    perspectiva = c1.radio(
+        "Perspectiva", ["ataque", "defensa"], horizontal=True, key="comp_perspectiva",
+        format_func={"ataque": "Ataque (ABP a favor)", "defensa": "Defensa (ABP en contra)"}.get
+    )
+    normalizacion = c2.radio(
+        "Normalización", list(analitica.NORMALIZACIONES), horizontal=True, key="comp_normalizacion",
+        format_func={"total": "Totales", "por_partido": "Por partido (90')", "por_abp": "Por ABP"}.get
+    )
+    equipos_perspectiva = equipos_atacantes if perspectiva == "ataque" else equipos_defensores
+    equipos_comp = st.multiselect(
+        "Equipos a comparar", equipos_perspectiva, default=equipos_perspectiva[:2], key=f"comp_equipos_{perspectiva}"
+    )
+    agg = agregados_filtrados()
+    if equipos_comp and not agg.empty:
+        with traza.span("agregacion/comparativa_equipos"):
+            # Partidos jugados: solo con los filtros de temporada y jornada, no con los de ABP
+            calendario = analisis.agregados(analisis.estado({'temporada': temporada_sel}, jornada_sel))
+            comp = analitica.comparativa_equipos(agg, calendario, equipos_comp, perspectiva)
+            resumen = analitica.resumen_equipos(comp, normalizacion)
+        etiquetas = {'abp': "ABP", 'tiros': "Tiros", 'goles': "Goles", 'xg': "xG", 'partidos': "Partidos"}
+        if len(equipos_comp) <= 4:
+            for col, fila in zip(st.columns(len(equipos_comp)), resumen.itertuples(index=False)):
+                with col:
+                    st.metric(f"ABP {fila.equipo}", round(fila.abp, 2))
+                    st.metric(f"Tiros {fila.equipo}", round(fila.tiros, 2))
+                    if 'gol' in df.columns:
+                        st.metric(f"Goles {fila.equipo}", round(fila.goles, 2))
+                    st.metric(f"xG {fila.equipo}", round(fila.xg, 2))
+        st.dataframe(resumen.rename(columns=etiquetas), hide_index=True, use_container_width=True)
+        metrica = st.selectbox(
+            "Métrica", analitica.METRICAS_EQUIPO, format_func=etiquetas.get, key="comp_metrica"
+        )
+        fig_barras = px.bar(resumen, x='equipo', y=metrica, title=f"{etiquetas[metrica]} por equipo",
+                            labels={metrica: etiquetas[metrica]})
+        mostrar_figura("Comparativa por equipo (barras)", fig_barras)
+        st.subheader("Comparativa por jornada (línea)")
+        serie = analitica.normalizar(comp, 'por_abp' if normalizacion == 'por_abp' else 'total')
+        fig_comp = px.line(serie, x='jornada', y=metrica, color='equipo', markers=True,
+                           title=f"{etiquetas[metrica]} por jornada", labels={metrica: etiquetas[metrica]})
+        mostrar_figura("Comparativa por jornada (línea)", fig_comp)
     else:
         st.info("No hay suficientes datos para la comparativa.")
 
-elif pagina == "Ranking defensivo":
+@fragmento
+def pagina_ranking_defensivo():
     st.title("Ranking defensivo (menos tiros/goles recibidos por ABP)")
-    df_def = aplicar_filtros(df)
-    aggs = {
-        'ABP': ('equipo_defensor', 'size'),
-        'Tiros_Recibidos': ('tiro', lambda x: (x.str.upper() == "SI").sum())
-    }
-    if 'gol' in df_def.columns:
-        aggs['Goles_Recibidos'] = ('gol', lambda x: (x.str.upper() == "SI").sum())
-
-    ranking = df_def.groupby('equipo_defensor').agg(**aggs).reset_index()
-    ranking['Tiros/ABP'] = ranking['Tiros_Recibidos'] / ranking['ABP']
-    if 'Goles_Recibidos' in ranking.columns:
-        ranking['Goles/ABP'] = ranking['Goles_Recibidos'] / ranking['ABP']
-
-    st.dataframe(ranking.sort_values('Tiros/ABP'), use_container_width=True)
-    fig_rank = px.bar(
-        ranking.sort_values('Tiros/ABP').head(10), 
-        x='Tiros/ABP', y='equipo_defensor', orientation='h', 
-        title="Top defensas (menos tiros por ABP)"
-    )
-    st.plotly_chart(fig_rank, use_container_width=True)
+    with traza.span("agregacion/ranking_defensivo"):
+        motor = ranking_defensivo(clave, estado_filtros, analisis)
+    if len(motor.periodos) == 0:
+        st.info("No hay datos para el ranking defensivo.")
+    else:
+        criterios = [c for c in analitica.CRITERIOS_RANKING if c != 'Goles/ABP' or 'gol' in df.columns]
+        etiquetas = motor.etiquetas()
+        c1, c2, c3, c4 = st.columns(4)
+        criterio = c1.selectbox("Ordenar por", criterios, key="ranking_criterio")
+        ventana = c2.number_input("Últimas N jornadas (0 = todas)", min_value=0, max_value=len(etiquetas), value=0, key="ranking_ventana") or None
+        semivida = c3.number_input("Forma: semivida en jornadas (0 = sin forma)", min_value=0, value=3, key="ranking_semivida") or None
+        hasta = c4.select_slider("Hasta", etiquetas, value=etiquetas[-1], key="ranking_hasta") if len(etiquetas) > 1 else etiquetas[0]
+        with traza.span("agregacion/ranking_ventana"):
+            ranking = motor.tabla(
+                fin=etiquetas.index(hasta), ventana=ventana, criterio=criterio,
+                semivida=semivida, con_goles='gol' in df.columns
+            )
 
-elif pagina == "Comparativa entre temporadas":
+        st.dataframe(ranking, use_container_width=True)
+        fig_rank = px.bar(
+            ranking.head(10),
+            x=criterio, y='equipo_defensor', orientation='h',
+            title=f"Top defensas (menos {criterio.split('/')[0].lower()} por ABP)"
+        )
+        mostrar_figura("Ranking defensivo (menos tiros/goles recibidos por ABP)", fig_rank)
+
+        st.subheader("Evolución de la posición")
+        with traza.span("agregacion/ranking_evolucion"):
+            evolucion = motor.evolucion(ventana=ventana, criterio=criterio)
+        top = ranking['equipo_defensor'].head(5).tolist()
+        fig_evol = px.line(
+            evolucion[evolucion['equipo_defensor'].isin(top)], x='periodo', y='Posición', color='equipo_defensor',
+            title="Posición al cierre de cada jornada (top 5 actual)"
+        )
+        fig_evol.update_yaxes(autorange="reversed")
+        mostrar_figura("Evolución de la posición", fig_evol)
+
+@fragmento
+def pagina_comparativa_temporadas():
     st.title("Comparativa entre temporadas")
-    df_temp = aplicar_filtros(df)
-    if not df_temp.empty:
-        abp_temp = df_temp.groupby(['temporada', 'jornada']).size().reset_index(name='Cantidad')
+    agg = agregados_filtrados()
+    if not agg.empty:
+        with traza.span("agregacion/comparativa_temporadas"):
+            abp_temp = analitica.comparativa_temporadas(agg)
         fig_temp = px.line(abp_temp, x='jornada', y='Cantidad', color='temporada', markers=True, title="ABP por jornada y temporada")
-        st.plotly_chart(fig_temp, use_container_width=True)
+        mostrar_figura("Comparativa entre temporadas", fig_temp)
     else:
         st.info("No hay datos para mostrar comparativa entre temporadas.")
 
-elif pagina == "Mapa de conexiones (red ABP)":
+@fragmento
+def pagina_red():
     st.title("Red de conexiones en ABP")
     if 'jugador_objetivo' in df.columns:
-        G = nx.DiGraph()
-        for _, row in aplicar_filtros(df).dropna(subset=['jugador_ejecutor', 'jugador_objetivo']).iterrows():
-            G.add_edge(row['jugador_ejecutor'], row['jugador_objetivo'])
-        pos = nx.spring_layout(G, k=0.5)
-        edge_x = []
-        edge_y = []
-        for edge in G.edges():
-            x0, y0 = pos[edge[0]]
-            x1, y1 = pos[edge[1]]
-            edge_x += [x0, x1, None]
-            edge_y += [y0, y1, None]
-        edge_trace = go.Scatter(
-            x=edge_x, y=edge_y,
-            line=dict(width=0.5, color='#888'),
-            hoverinfo='none',
-            mode='lines')
-        node_x = []
-        node_y = []
-        for node in G.nodes():
-            x, y = pos[node]
-            node_x.append(x)
-            node_y.append(y)
-        node_trace = go.Scatter(
-            x=node_x, y=node_y,
-            mode='markers+text',
-            text=[str(n) for n in G.nodes()],
-            textposition="bottom center",
-            marker=dict(size=12, color='skyblue'),
-            hoverinfo='text')
-        fig_net = go.Figure(data=[edge_trace, node_trace])
-        fig_net.update_layout(showlegend=False, title='Red de ejecutores y objetivos en ABP')
-        st.plotly_chart(fig_net, use_container_width=True)
+        with traza.span("agregacion/red_conexiones"):
+            tabla_aristas = analisis.aristas(estado_filtros)
+        with traza.span("red/layout", aristas=len(tabla_aristas)):
+            pos = cache_layouts().posiciones(tabla_aristas)
+        with traza.span("figura/red"):
+            fig_net = red.figura_red(tabla_aristas, pos)
+        fig_net.update_layout(title='Red de ejecutores y objetivos en ABP')
+        mostrar_figura("Red de conexiones en ABP", fig_net)
+        with st.expander("Conexiones (ABP, tiros y goles por pareja)"):
+            st.dataframe(tabla_aristas.sort_values('peso', ascending=False), use_container_width=True)
     else:
         st.info("No hay columna 'jugador_objetivo' para crear la red de conexiones.")
 
+# Cada página es un fragmento: sus propios widgets solo re-ejecutan su cuerpo
+PAGINAS = {
+    "Dashboard general": pagina_dashboard,
+    "Análisis equipos atacantes": pagina_atacantes,
+    "Análisis equipos defensores": pagina_defensores,
+    "Comparativa entre equipos": pagina_comparativa_equipos,
+    "Ranking defensivo": pagina_ranking_defensivo,
+    "Comparativa entre temporadas": pagina_comparativa_temporadas,
+    "Mapa de conexiones (red ABP)": pagina_red,
+}
+with traza.span("pagina"):
+    PAGINAS[pagina]()
+
 # ---- EXPORTAR DATOS ----
 st.sidebar.markdown("---")
-csv = aplicar_filtros(df).to_csv(index=False).encode('utf-8')
-def to_excel(df_filtrado):
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df_filtrado.to_excel(writer, index=False, sheet_name='ABP_filtrado')
-    return output.getvalue()
-excel_bytes = to_excel(aplicar_filtros(df))
-
-st.sidebar.download_button(
-    label="Descargar datos filtrados (CSV)",
-    data=csv,
-    file_name="abp_filtrado.csv",
-    mime='text/csv'
-)
-st.sidebar.download_button(
-    label="Descargar datos filtrados (Excel)",
-    data=excel_bytes,
-    file_name="abp_filtrado.xlsx",
-    mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-)
+if analisis.cache is not None:
+    with st.sidebar.expander("Caché de filtros"):
+        stats = analisis.cache.estadisticas()
+        st.write(f"Aciertos: {stats['aciertos']} · Fallos: {stats['fallos']} ({stats['ratio_aciertos']:.0%})")
+        st.write(f"Entradas: {stats['entradas']}/{stats['capacidad']}")
+with st.sidebar.expander("Memoria compartida"):
+    stats = registro_datos().estadisticas()
+    st.write(f"Datasets en memoria: {stats['datasets']} · {stats['mb']:.1f} / {stats['presupuesto_mb']:.0f} MB")
+    st.write(f"Aciertos: {stats['aciertos']} · Fallos: {stats['fallos']} ({stats['ratio_aciertos']:.0%})")
+    st.write(f"Desalojados: {stats['desalojos']} · Recargados desde disco: {stats['recargas']}")
+
+@st.cache_resource
+def gestor_exportaciones():
+    return exportar.GestorExportaciones()
+
+def panel_exportacion(formato, en_curso):
+    # Las exportaciones solo se generan bajo demanda, en un hilo, y quedan en disco por filtros
+    gestor = gestor_exportaciones()
+    trabajo = gestor.trabajo(clave, estado_filtros, formato)
+    if trabajo is None or trabajo.error:
+        if trabajo is not None:
+            st.error(f"No se pudo generar la exportación: {trabajo.error}")
+        if st.button(f"Preparar descarga ({formato})"):
+            filas = analisis.filas(estado_filtros)
+            gestor.lanzar(clave, estado_filtros, formato, df, filas)
+            st.rerun()
+    elif not trabajo.terminado:
+        st.progress(trabajo.progreso, text=f"Generando {formato}... {trabajo.progreso:.0%}")
+    elif en_curso:
+        # Termina el sondeo del fragmento con una ejecución completa
+        st.rerun()
+    else:
+        extension, mime = exportar.FORMATOS[formato]
+        # Con un callable el fichero solo se lee al pulsar el botón, no en cada rerun que dibuja el panel
+        st.download_button(
+            label=f"Descargar datos filtrados ({formato})",
+            data=trabajo.leer,
+            file_name=f"abp_filtrado.{extension}",
+            mime=mime
+        )
+
+@fragmento
+def seccion_exportacion():
+    # Cambiar de formato solo re-ejecuta esta sección; mientras se genera, solo sondea el panel interior
+    formato_export = st.selectbox("Formato de exportación", list(exportar.FORMATOS), key="formato_export")
+    trabajo_actual = gestor_exportaciones().trabajo(clave, estado_filtros, formato_export)
+    en_curso = trabajo_actual is not None and not trabajo_actual.terminado and trabajo_actual.error is None
+    st.fragment(panel_exportacion, run_every=1 if en_curso else None)(formato_export, en_curso)
+
+with st.sidebar:
+    with traza.span("exportar"):
+        seccion_exportacion()
+
+# ---- ARRANQUE EN FRÍO ----
+@st.cache_resource
+def arranque():
+    # Se rellena en la primera ejecución completa del proceso (la que paga imports, carga de datos e índices)
+    return {}
+
+primer_render = arranque()
+if not primer_render:
+    primer_render.update(
+        primer_render_ms=round((time.perf_counter() - INICIO_SCRIPT) * 1000, 1),
+        imports_ms=round((FIN_IMPORTS - INICIO_SCRIPT) * 1000, 1), pagina=pagina, motor=motor,
+        filas_dataset=analisis.n, modulos=[m for m in ('networkx', 'xlsxwriter', 'duckdb') if m in sys.modules],
+    )
+    trazas.registrar_arranque(primer_render)
+
+# ---- PANEL DE RENDIMIENTO ----
+st.sidebar.markdown("---")
+st.sidebar.checkbox("Modo depuración (trazas de rendimiento)", value=trazas.ACTIVA_POR_DEFECTO, key="debug_trazas")
+if traza.activa:
+    traza.contexto.update(pagina=pagina, filas_dataset=analisis.n, motor=motor)
+    resumen = traza.guardar()
+    with st.sidebar.expander("Rendimiento del rerun", expanded=True):
+        st.write(f"Total: **{resumen['total_ms']:.0f} ms** · traza en `{trazas.RUTA_TRAZAS}`")
+        st.write(f"Primer render del proceso: **{primer_render['primer_render_ms']:.0f} ms** ({primer_render['pagina']})")
+        spans = pd.DataFrame(resumen['spans'])
+        spans['nombre'] = ["· " * n + nombre for n, nombre in zip(spans['nivel'], spans['nombre'])]
+        st.dataframe(spans.drop(columns=['nivel']), hide_index=True, use_container_width=True)
@@ -0,0 +1,40 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+RAIZ = Path(__file__).resolve().parent.parent
+MUESTRA = RAIZ / "Prova ABP.xlsx"
+
+
+@pytest.fixture(scope="session")
+def excel_muestra():
+    # El Excel de ejemplo tal como lo lee pandas, con las columnas originales
+    return pd.read_excel(MUESTRA)
+
+
+@pytest.fixture(scope="session")
+def eventos_liga():
+    # ABP sintéticas de dos temporadas con casos límite: "Bravo" recibe exactamente las mismas ABP que "Alfa"
+    # (empates en todo) y "Eco" solo juega la primera temporada (ventanas sin ABP al final)
+    import numpy as np
+
+    rng = np.random.default_rng(7)
+    filas = []
+    for temporada in ("2023/24", "2024/25"):
+        for jornada in range(1, 7):
+            for equipo in ("Alfa", "Charlie", "Delta", "Eco", "Foxtrot"):
+                if equipo == "Eco" and temporada == "2024/25":
+                    continue
+                for _ in range(rng.integers(0, 5)):
+                    tiro = bool(rng.random() < 0.4)
+                    filas.append({
+                        'temporada': temporada, 'jornada': jornada,
+                        'equipo_defensor': equipo, 'equipo_atacante': rng.choice(["Golf", "Hotel", "India"]),
+                        'tiro': tiro, 'gol': tiro and bool(rng.random() < 0.3),
+                        'xg_tiro': float(rng.uniform(0.01, 0.6)) if tiro else np.nan,
+                    })
+    df = pd.DataFrame(filas)
+    bravo = df[df['equipo_defensor'] == "Alfa"].assign(equipo_defensor="Bravo")
+    df = pd.concat([df, bravo], ignore_index=True)
+    return df.astype({'tiro': 'boolean', 'gol': 'boolean', 'jornada': 'int8'})
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from abp import almacen
+
+
+def test_reenvio_con_minuto_vacio_no_duplica(tmp_path, excel_muestra):
+    # Un evento nuevo sin minuto vuelve float la columna: los 33 reenviados deben conservar su id
+    alm = almacen.AlmacenABP(tmp_path)
+    alm.anadir(excel_muestra)
+    nuevo = excel_muestra.iloc[[0]].copy()
+    nuevo['Jugador_Ejecutor'] = "Jugador nuevo"
+    nuevo['Momento_Minuto'] = np.nan
+    alm.anadir(pd.concat([excel_muestra, nuevo], ignore_index=True))
+    assert len(alm.cargar()) == len(excel_muestra) + 1
+
+
+def test_ids_no_dependen_del_dtype():
+    enteros = pd.DataFrame({'jornada': [1, 2], 'momento_minuto': [23, 5], 'jugador_objetivo': ["A", None]})
+    flotantes = pd.DataFrame({
+        'jornada': np.array([1, 2], dtype='float32'),
+        'momento_minuto': [23.0, 5.0],
+        'jugador_objetivo': pd.Series(["A", np.nan]).astype('category'),
+    })
+    assert (almacen.ids_evento(enteros) == almacen.ids_evento(flotantes)).all()
@@ -0,0 +1,27 @@
+import pandas as pd
+
+from abp import analitica
+
+
+def _eventos():
+    # Dos jornadas de A contra B; solo hubo penalti en la primera
+    return pd.DataFrame({
+        'temporada': ["2024/25"] * 4,
+        'jornada': [1, 1, 2, 2],
+        'equipo_atacante': ["A", "B", "A", "B"],
+        'equipo_defensor': ["B", "A", "B", "A"],
+        'abp_tipo': ["Penalti", "Corner", "Corner", "Corner"],
+        'jugador_ejecutor': ["a1", "b1", "a2", "b2"],
+        'tiro': [True, False, False, True],
+        'gol': [True, False, False, False],
+    })
+
+
+def test_partidos_no_dependen_de_los_filtros_de_abp():
+    an = analitica.Analisis(_eventos())
+    penaltis = an.agregados(an.estado({'abp_tipo': ["Penalti"]}))
+    calendario = an.agregados(an.estado({'temporada': ["2024/25"]}))
+    comp = analitica.comparativa_equipos(penaltis, calendario, ["A"])
+    resumen = analitica.resumen_equipos(comp, 'por_partido')
+    assert comp['partidos'].sum() == 2
+    assert resumen.loc[0, 'abp'] == 0.5
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from abp import campo
+
+
+def test_figura_campo_fuera_del_repositorio(tmp_path, monkeypatch):
+    # El bench y los informes pueden lanzarse desde cualquier directorio
+    monkeypatch.chdir(tmp_path)
+    campo.imagen_campo.cache_clear()
+    df = pd.DataFrame({"x": [10.0, 60.0], "y": [5.0, 40.0], "tipo": ["Corner", "Penalti"]})
+    fig = campo.figura_campo(df, "x", "y", "tipo")
+    assert fig.layout.images[0].source.startswith("data:image/png;base64,")
+
+
+def test_binning_lleva_los_puntos_de_fuera_a_la_celda_del_borde():
+    # Rejilla de 24x16 sobre 120x80: celdas de 5x5
+    x = np.array([0.0, 119.99, 120.0, 130.0, -3.0, 5.0])
+    y = np.array([0.0, 80.0, 79.9, -1.0, 40.0, 5.0])
+    xg = np.array([0.1, np.nan, 0.3, 0.0, 0.0, 0.5])
+    _, _, conteos, suma_xg = campo.binning(x, y, xg, rejilla=(24, 16))
+    assert conteos.shape == (16, 24)
+    esperado = np.zeros((16, 24))
+    for iy, ix in [(0, 0), (15, 23), (15, 23), (0, 23), (8, 0), (1, 1)]:
+        esperado[iy, ix] += 1
+    assert np.array_equal(conteos, esperado)
+    assert suma_xg[15, 23] == 0.3 and suma_xg[1, 1] == 0.5 and np.isclose(suma_xg.sum(), 0.9)
+
+
+def test_figura_densidad_desde_una_rejilla():
+    conteos = np.zeros((16, 24))
+    conteos[3, 4] = 7000
+    fig = campo.figura_densidad(conteos, None, title="Mapa")
+    assert fig.layout.title.text == "Mapa (densidad, 7,000 ABP)"
+    assert np.nansum(np.array(fig.data[0].z, dtype=float)) == 7000
@@ -0,0 +1,152 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from abp import almacen, analitica, consultas, cubo, red, zonas
+from abp.indices import COLUMNAS_FILTRO
+
+pytest.importorskip("duckdb")
+
+
+@pytest.fixture(scope="module")
+def motores(tmp_path_factory, excel_muestra):
+    # La muestra y una copia en otra temporada con otros ejecutores, para tener más valores que filtrar
+    otra = excel_muestra.copy()
+    otra['Temporada'] = "2025/26"
+    otra['Jugador_Ejecutor'] = otra['Jugador_Ejecutor'].iloc[::-1].to_numpy()
+    alm = almacen.AlmacenABP(tmp_path_factory.mktemp("almacen"))
+    alm.anadir(pd.concat([excel_muestra, otra], ignore_index=True))
+    pandas_ = analitica.Analisis(alm.cargar(), tabla_cubo=alm.cargar_cubo(), tabla_zonas=alm.cargar_cubo_zonas())
+    return pandas_, consultas.AnalisisSQL(alm)
+
+
+def _columna(serie):
+    # Mismos valores sin importar el dtype de cada motor (categórico frente a texto, Int16 frente a float...).
+    # Una columna sin valores llega categórica de pandas y numérica de DuckDB
+    if serie.isna().all() or not pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_bool_dtype(serie):
+        return serie.astype(object).where(serie.notna(), None)
+    return serie.astype(float)
+
+
+def _normalizar(tabla):
+    tabla = tabla.reset_index(drop=True)
+    return pd.DataFrame({c: _columna(tabla[c]) for c in tabla.columns})
+
+
+def _ordenar(agg):
+    dims = [c for c in agg.columns if c not in cubo.MEDIDAS]
+    tabla = _normalizar(agg)
+    return tabla.sort_values(dims, key=lambda s: s.astype(str)).reset_index(drop=True)
+
+
+def _estados(analisis, n=25, semilla=0):
+    rng = random.Random(semilla)
+    desde, hasta = analisis.rango_jornadas()
+    for _ in range(n):
+        selecciones = {}
+        for col in rng.sample(COLUMNAS_FILTRO, rng.randint(0, 4)):
+            valores = analisis.valores(col)
+            if not valores:
+                continue
+            r = rng.random()
+            if r < 0.3:
+                selecciones[col] = valores
+            elif r < 0.4:
+                selecciones[col] = []
+            else:
+                selecciones[col] = rng.sample(valores, rng.randint(1, len(valores)))
+        jornada = (rng.randint(desde, hasta), hasta) if rng.random() < 0.5 else (desde, hasta)
+        yield selecciones, jornada
+
+
+def test_mismos_metadatos(motores):
+    pandas_, sql = motores
+    assert pandas_.n == sql.n
+    assert pandas_.columnas == sql.columnas
+    assert pandas_.rango_jornadas() == sql.rango_jornadas()
+    for col in COLUMNAS_FILTRO:
+        assert [str(v) for v in pandas_.valores(col)] == [str(v) for v in sql.valores(col)], col
+
+
+def test_mismos_resultados(motores):
+    pandas_, sql = motores
+    for selecciones, jornada in _estados(pandas_):
+        estado = pandas_.estado(selecciones, jornada)
+        assert estado == sql.estado(selecciones, jornada)
+        assert len(pandas_.filas(estado)) == len(sql.filas(estado))
+        pd.testing.assert_frame_equal(
+            _normalizar(pandas_.filtrar(estado)), _normalizar(sql.filtrar(estado)), check_dtype=False, obj="filtrar"
+        )
+        pd.testing.assert_frame_equal(
+            _ordenar(pandas_.agregados(estado)), _ordenar(sql.agregados(estado)), check_dtype=False, obj="agregados"
+        )
+        pd.testing.assert_frame_equal(
+            _ordenar(pandas_.agregados_zonas(estado)), _ordenar(sql.agregados_zonas(estado)), check_dtype=False,
+            obj="agregados_zonas",
+        )
+        facetas_pandas, facetas_sql = pandas_.facetas(estado), sql.facetas(estado)
+        assert facetas_pandas.keys() == facetas_sql.keys()
+        for col, conteos in facetas_pandas.items():
+            conteos = conteos[conteos > 0]
+            assert [str(v) for v in conteos.index] == [str(v) for v in facetas_sql[col].index], col
+            assert np.array_equal(conteos.to_numpy(), facetas_sql[col].to_numpy()), col
+        for rol in zonas.ZONAS:
+            pd.testing.assert_frame_equal(
+                _normalizar(zonas.estadisticas(pandas_.agregados_zonas(estado), rol)),
+                _normalizar(zonas.estadisticas(sql.agregados_zonas(estado), rol)),
+                check_dtype=False, obj="zonas",
+            )
+
+
+def _por_valores(tabla, columnas):
+    tabla = _normalizar(tabla)
+    return tabla.sort_values(columnas, key=lambda s: s.astype(str)).reset_index(drop=True)
+
+
+def test_mismos_resumenes_de_filas(motores):
+    # Lo que las páginas piden en lugar de las filas filtradas: top, aristas, puntos y densidad del campo
+    pandas_, sql = motores
+    for selecciones, jornada in _estados(pandas_, semilla=1):
+        estado = pandas_.estado(selecciones, jornada)
+        pd.testing.assert_frame_equal(
+            _normalizar(pandas_.top_ejecutores(estado)), _normalizar(sql.top_ejecutores(estado)), check_dtype=False,
+            obj="top_ejecutores",
+        )
+        pd.testing.assert_frame_equal(
+            _por_valores(pandas_.aristas(estado), [red.ORIGEN, red.DESTINO]),
+            _por_valores(sql.aristas(estado), [red.ORIGEN, red.DESTINO]), check_dtype=False, obj="aristas",
+        )
+        # Sin ORDER BY las filas siguen llegando en el orden del almacén (preserve_insertion_order)
+        puntos = pandas_.puntos(estado, 'x_ejecucion', 'y_ejecucion', ['abp_tipo'])
+        pd.testing.assert_frame_equal(
+            _normalizar(puntos), _normalizar(sql.puntos(estado, 'x_ejecucion', 'y_ejecucion', ['abp_tipo'])),
+            check_dtype=False, obj="puntos",
+        )
+        if len(puntos):
+            assert pandas_.puntos(estado, 'x_ejecucion', 'y_ejecucion', maximo=len(puntos) - 1) is None
+            assert sql.puntos(estado, 'x_ejecucion', 'y_ejecucion', maximo=len(puntos) - 1) is None
+        conteos, xg = pandas_.densidad(estado, 'x_ejecucion', 'y_ejecucion')
+        conteos_sql, xg_sql = sql.densidad(estado, 'x_ejecucion', 'y_ejecucion')
+        assert np.array_equal(conteos, conteos_sql)
+        assert conteos.sum() == len(puntos)
+        assert np.allclose(xg, xg_sql)
+
+
+def test_facetas_sin_filtros_y_en_cache(motores):
+    pandas_, sql = motores
+    todo = sql.estado({'temporada': sql.valores('temporada')}, sql.rango_jornadas())
+    antes = sql._resumenes.estadisticas()
+    facetas = sql.facetas(todo)
+    # Sin filtros que descarten filas salen de los perfiles de las columnas, sin pasar por la caché
+    assert sql._resumenes.estadisticas() == antes
+    for col, conteos in pandas_.facetas(pandas_.estado()).items():
+        assert [str(v) for v in conteos.index] == [str(v) for v in facetas[col].index], col
+        assert np.array_equal(conteos.to_numpy(), facetas[col].to_numpy()), col
+
+    corners = sql.estado({'abp_tipo': ["Corner"], 'temporada': ["2025/26"]}, sql.rango_jornadas())
+    antes = sql._resumenes.estadisticas()
+    assert sql.facetas(corners) is sql.facetas(corners)
+    despues = sql._resumenes.estadisticas()
+    assert (despues['fallos'] - antes['fallos'], despues['aciertos'] - antes['aciertos']) == (1, 1)
@@ -0,0 +1,132 @@
+import gc
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from abp import almacen, exportar
+from abp.esquema import SI_NO
+from abp.filtros import EstadoFiltros
+
+
+@pytest.fixture(scope="module")
+def muestra(excel_muestra):
+    return almacen.preparar(excel_muestra)
+
+
+def _esperar(trabajo, segundos=30):
+    limite = time.monotonic() + segundos
+    while not trabajo.terminado and trabajo.error is None:
+        assert time.monotonic() < limite, "la exportación no termina"
+        time.sleep(0.01)
+    assert trabajo.error is None
+    return trabajo
+
+
+def _filas(df):
+    # Un subconjunto desordenado: las exportaciones respetan el orden de las filas pedidas
+    return np.arange(len(df))[::-2].copy()
+
+
+def test_csv_y_excel_escriben_si_no_como_texto(tmp_path, muestra):
+    filas = _filas(muestra)
+    esperado = muestra.iloc[filas].reset_index(drop=True)
+    avance = []
+    exportar.escribir_csv(muestra, filas, tmp_path / "f.csv", avance.append)
+    exportar.escribir_excel(muestra, filas, tmp_path / "f.xlsx", avance.append)
+    assert sum(avance) == 2 * len(filas)
+
+    for leido in (pd.read_csv(tmp_path / "f.csv"), pd.read_excel(tmp_path / "f.xlsx")):
+        assert list(leido.columns) == list(muestra.columns)
+        assert len(leido) == len(filas)
+        for col in SI_NO:
+            texto = esperado[col].map({True: "SI", False: "NO"})
+            assert leido[col].where(leido[col].notna(), None).tolist() == texto.where(texto.notna(), None).tolist()
+        assert leido['jugador_ejecutor'].tolist() == esperado['jugador_ejecutor'].astype(object).tolist()
+
+
+def test_parquet_conserva_tipos(tmp_path, muestra):
+    filas = _filas(muestra)
+    exportar.escribir_parquet(muestra, filas, tmp_path / "f.parquet", lambda n: None)
+    leido = pd.read_parquet(tmp_path / "f.parquet")
+    esperado = muestra.iloc[filas].reset_index(drop=True)
+    # Las categorías vacías no sobreviven a pandas -> Arrow -> pandas; el resto vuelve tal cual (SI/NO como booleanos)
+    vacias = [col for col in muestra.columns if muestra[col].isna().all()]
+    pd.testing.assert_frame_equal(leido.drop(columns=vacias), esperado.drop(columns=vacias))
+    assert leido[vacias].isna().all().all()
+    assert all(leido[col].dtype == "boolean" for col in SI_NO)
+
+
+def test_sin_filas_escribe_solo_la_cabecera(tmp_path, muestra):
+    exportar.escribir_csv(muestra, np.array([], dtype=np.int64), tmp_path / "f.csv", lambda n: None)
+    assert pd.read_csv(tmp_path / "f.csv").columns.tolist() == list(muestra.columns)
+
+
+def test_una_exportacion_por_dataset_filtros_y_formato(tmp_path, muestra):
+    gestor = exportar.GestorExportaciones(directorio=tmp_path)
+    todos = EstadoFiltros.desde({}, (1, 38))
+    corners = EstadoFiltros.desde({'abp_tipo': ["Corner"]}, (1, 38))
+    assert gestor.trabajo("v1", todos, "CSV") is None
+
+    trabajo = _esperar(gestor.lanzar("v1", todos, "CSV", muestra, np.arange(len(muestra))))
+    assert gestor.trabajo("v1", todos, "CSV") is trabajo
+    assert gestor.lanzar("v1", todos, "CSV", muestra, np.arange(len(muestra))) is trabajo
+    assert gestor.trabajo("v1", EstadoFiltros.desde({}, (1, 38)), "CSV") is trabajo
+    # Cualquier otro filtro, formato o versión de los datos es otra exportación
+    assert gestor.trabajo("v1", corners, "CSV") is None
+    assert gestor.trabajo("v1", todos, "Parquet") is None
+    assert gestor.trabajo("v2", todos, "CSV") is None
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_no_poda_ficheros_que_una_sesion_puede_descargar(tmp_path, muestra):
+    gestor = exportar.GestorExportaciones(directorio=tmp_path, max_ficheros=1)
+    filas = np.arange(len(muestra))
+    estados = [EstadoFiltros.desde({}, (1, j)) for j in (36, 37, 38)]
+
+    a = _esperar(gestor.lanzar("v1", estados[0], "CSV", muestra, filas))
+    descargar_a = a.leer  # lo que guarda download_button en una sesión
+    b = _esperar(gestor.lanzar("v1", estados[1], "CSV", muestra, filas))
+    assert a.ruta.exists() and b.ruta.exists()
+    assert descargar_a() == a.ruta.read_bytes()
+
+    # Sin sesiones que los usen, la siguiente exportación deja solo max_ficheros
+    ruta_a, ruta_b = a.ruta, b.ruta
+    del a, b, descargar_a
+    gc.collect()
+    c = _esperar(gestor.lanzar("v1", estados[2], "CSV", muestra, filas))
+    assert list(tmp_path.iterdir()) == [c.ruta]
+    assert not ruta_a.exists() and not ruta_b.exists()
+    assert gestor.trabajo("v1", estados[0], "CSV") is None
+
+
+def test_si_falta_el_fichero_se_vuelve_a_generar(tmp_path, muestra):
+    gestor = exportar.GestorExportaciones(directorio=tmp_path)
+    estado = EstadoFiltros.desde({}, (1, 38))
+    filas = np.arange(len(muestra))
+    trabajo = _esperar(gestor.lanzar("v1", estado, "Parquet", muestra, filas))
+    trabajo.ruta.unlink()
+
+    assert gestor.trabajo("v1", estado, "Parquet") is None
+    nuevo = _esperar(gestor.lanzar("v1", estado, "Parquet", muestra, filas))
+    assert nuevo is not trabajo
+    assert len(pd.read_parquet(nuevo.ruta)) == len(muestra)
+
+
+def test_exportar_conserva_todas_las_columnas_del_excel(tmp_path, monkeypatch, excel_muestra):
+    from io import BytesIO
+
+    from abp import ingesta
+
+    monkeypatch.setattr(ingesta, "DIR_CACHE", tmp_path / "cache")
+    buf = BytesIO()
+    excel_muestra.to_excel(buf, index=False)
+    alm = almacen.AlmacenABP(tmp_path / "datos")
+    alm.anadir(ingesta.cargar_parquet(ingesta.asegurar_parquet(buf.getvalue())))
+    df = alm.cargar()
+
+    exportar.escribir_csv(df, np.arange(len(df)), tmp_path / "f.csv", lambda n: None)
+    leido = pd.read_csv(tmp_path / "f.csv")
+    assert set(ingesta.normalizar_columnas(excel_muestra.copy()).columns) <= set(leido.columns)
+    assert leido['descripción'].notna().sum() == excel_muestra['Descripción'].notna().sum()
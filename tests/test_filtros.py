@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from abp import almacen, analitica, registro
+from abp.filtros import CacheFiltros, EstadoFiltros
+from abp.indices import IndiceFiltros
+
+
+@pytest.fixture(scope="module")
+def muestra(excel_muestra):
+    return almacen.preparar(excel_muestra)
+
+
+def _mascara(df, estado):
+    condiciones = df['jornada'].between(*estado.jornada)
+    for col, valores in estado.selecciones:
+        condiciones &= df[col].isin(valores)
+    return np.flatnonzero(condiciones.to_numpy(dtype=bool))
+
+
+def _estados(df):
+    tipos = sorted(df['abp_tipo'].dropna().unique())
+    equipos = sorted(df['equipo_atacante'].dropna().unique())
+    desde, hasta = int(df['jornada'].min()), int(df['jornada'].max())
+    return (
+        EstadoFiltros.desde({'abp_tipo': tipos[:1]}, (desde, hasta)),
+        EstadoFiltros.desde({'equipo_atacante': equipos[:2], 'tiro': [True]}, (desde, hasta)),
+        EstadoFiltros.desde({}, (desde + 1, hasta)),
+    )
+
+
+def test_aciertos_fallos_y_desalojo(muestra):
+    cache = CacheFiltros(IndiceFiltros(muestra), capacidad=2)
+    a, b, c = _estados(muestra)
+
+    filas_a = cache.filas(a)
+    assert np.array_equal(filas_a, _mascara(muestra, a))
+    assert not filas_a.flags.writeable
+    # El mismo estado escrito en otro orden es la misma clave
+    otra_forma = EstadoFiltros.desde({'abp_tipo': list(dict(a.selecciones)['abp_tipo'])}, a.jornada)
+    assert cache.filas(otra_forma) is filas_a
+    assert np.array_equal(cache.filas(b), _mascara(muestra, b))
+    # a es el más reciente: al entrar c se desaloja b
+    assert cache.filas(a) is filas_a
+    assert np.array_equal(cache.filas(c), _mascara(muestra, c))
+    assert cache.estadisticas() == {
+        'aciertos': 2, 'fallos': 3, 'ratio_aciertos': 0.4, 'entradas': 2, 'capacidad': 2,
+    }
+
+    assert cache.filas(a) is filas_a
+    filas_b = cache.filas(b)
+    assert np.array_equal(filas_b, _mascara(muestra, b))
+    assert cache.estadisticas()['fallos'] == 4
+
+
+def test_un_dataset_nuevo_no_reutiliza_la_cache(tmp_path, excel_muestra, muestra):
+    # Cada versión del almacén tiene su Analisis (índice y caché) en el registro
+    reg = registro.RegistroDatos(directorio=tmp_path)
+    estado = _estados(muestra)[0]
+    v1 = reg.derivado("v1", "analisis", analitica.Analisis, lambda: muestra)
+    assert len(v1.filas(estado)) > 0
+
+    # Mismo estado de filtros, pero en los datos nuevos ya no hay ningún córner
+    nuevo = almacen.preparar(excel_muestra.assign(ABP_Tipo="Falta"))
+    v2 = reg.derivado("v2", "analisis", analitica.Analisis, lambda: nuevo)
+    assert v2 is not v1
+    assert v2.cache.estadisticas()['entradas'] == 0
+    assert len(v2.filas(estado)) == 0
+    assert np.array_equal(v2.filas(estado), _mascara(nuevo, estado))
+    assert v2.cache.estadisticas()['fallos'] == 1
@@ -0,0 +1,72 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from abp import almacen
+from abp.indices import COLUMNAS_FILTRO, IndiceFiltros
+
+
+@pytest.fixture(scope="module")
+def muestra(excel_muestra):
+    return almacen.preparar(excel_muestra)
+
+
+def _mascara(df, selecciones, jornada_rango):
+    # Filtro de máscaras booleanas que sustituyó el índice (isin por columna y between de jornada)
+    condiciones = df['jornada'].between(*jornada_rango)
+    for col, valores in selecciones.items():
+        condiciones &= df[col].isin(valores)
+    return np.flatnonzero(condiciones.to_numpy(dtype=bool))
+
+
+def _selecciones(df):
+    # Todos los valores, ninguno, uno solo (recorre listas de filas) y la mitad (tabla de códigos) por columna
+    for col in [c for c in COLUMNAS_FILTRO if c in df.columns]:
+        valores = sorted(df[col].dropna().unique())
+        yield {col: valores}
+        yield {col: []}
+        if valores:
+            yield {col: valores[:1]}
+            yield {col: valores[: max(1, len(valores) // 2)]}
+    valores = {c: sorted(df[c].dropna().unique()) for c in ['abp_tipo', 'equipo_atacante', 'jugador_ejecutor']}
+    yield {'abp_tipo': valores['abp_tipo'][:2], 'equipo_atacante': valores['equipo_atacante'][:1]}
+    yield {'abp_tipo': valores['abp_tipo'], 'jugador_ejecutor': valores['jugador_ejecutor'][1:4], 'tiro': [True]}
+    yield {'equipo_atacante': [], 'abp_tipo': valores['abp_tipo']}
+
+
+def test_filtrar_igual_que_mascaras(muestra):
+    indice = IndiceFiltros(muestra)
+    desde, hasta = int(muestra['jornada'].min()), int(muestra['jornada'].max())
+    rangos = [
+        (-np.inf, np.inf), (desde, hasta), (desde, desde), (hasta, hasta), (desde + 1, hasta), (hasta + 1, hasta + 5),
+    ]
+    for selecciones, rango in itertools.product(list(_selecciones(muestra)), rangos):
+        esperado = _mascara(muestra, selecciones, rango)
+        assert np.array_equal(indice.filtrar(selecciones, rango), esperado), (selecciones, rango)
+
+
+def test_columnas_con_nulos(muestra):
+    # Con todos los valores seleccionados, las filas con nulo quedan fuera como con isin
+    indice = IndiceFiltros(muestra)
+    col = next(
+        c for c in COLUMNAS_FILTRO if c in muestra.columns and muestra[c].isna().any() and muestra[c].notna().any()
+    )
+    valores = sorted(muestra[col].dropna().unique())
+    assert col in indice.columnas_restrictivas({col: valores})
+    esperado = _mascara(muestra, {col: valores}, (-np.inf, np.inf))
+    assert np.array_equal(indice.filtrar({col: valores}, (-np.inf, np.inf)), esperado)
+
+
+def test_facetas_igual_que_mascaras(muestra):
+    indice = IndiceFiltros(muestra)
+    rango = (int(muestra['jornada'].min()) + 1, int(muestra['jornada'].max()))
+    for selecciones in _selecciones(muestra):
+        facetas = indice.facetas(selecciones, rango)
+        for col, conteos in facetas.items():
+            resto = {c: v for c, v in selecciones.items() if c != col}
+            filas = muestra.iloc[_mascara(muestra, resto, rango)]
+            esperado = filas[col].value_counts()
+            obtenido = conteos[conteos > 0]
+            assert obtenido.to_dict() == esperado[esperado > 0].to_dict(), (col, selecciones)
@@ -0,0 +1,67 @@
+import re
+import zipfile
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from abp import esquema, ingesta
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingesta, "DIR_CACHE", tmp_path)
+
+
+def _con_dimension(datos, ref):
+    # Reescribe la etiqueta <dimension> de cada hoja, como hacen algunos programas que exportan a xlsx
+    entrada, salida = zipfile.ZipFile(BytesIO(datos)), BytesIO()
+    with zipfile.ZipFile(salida, "w", zipfile.ZIP_DEFLATED) as z:
+        for item in entrada.infolist():
+            contenido = entrada.read(item.filename)
+            if item.filename.startswith("xl/worksheets/sheet"):
+                contenido = re.sub(rb'<dimension ref="[^"]*"', f'<dimension ref="{ref}"'.encode(), contenido)
+            z.writestr(item, contenido)
+    return salida.getvalue()
+
+
+def _xlsx(df):
+    buf = BytesIO()
+    df.to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+def test_misma_lectura_que_read_excel(cache, excel_muestra):
+    df = ingesta.cargar_parquet(ingesta.asegurar_parquet(_xlsx(excel_muestra)))
+    esperado = ingesta.normalizar_columnas(excel_muestra.copy())
+    assert len(df) == len(esperado)
+    assert (df['origen'] == "Sheet1").all()
+    for col in ['temporada', 'jornada', 'momento_minuto', 'jugador_ejecutor', 'xg_tiro', 'id_abp']:
+        pd.testing.assert_series_equal(df[col], esperado[col], check_dtype=False)
+
+
+def test_dimension_erronea_no_pierde_filas(cache, excel_muestra):
+    datos = _con_dimension(_xlsx(excel_muestra), "A1:AV6")
+    progreso = []
+    df = ingesta.cargar_parquet(ingesta.asegurar_parquet(datos, progreso=lambda hechas, total: progreso.append(hechas)))
+    assert len(df) == len(excel_muestra)
+    pd.testing.assert_series_equal(df['id_abp'], excel_muestra['ID_ABP'], check_dtype=False, check_names=False)
+    assert progreso[-1] == len(excel_muestra)
+
+
+def test_sin_columnas_obligatorias(cache):
+    with pytest.raises(esquema.ErrorEsquema):
+        ingesta.asegurar_parquet(_xlsx(pd.DataFrame({'a': [1]})))
+
+
+def test_columnas_fuera_del_esquema_como_texto(cache, excel_muestra):
+    fuente = excel_muestra.assign(Codigo=[f"{i:03d}" if i % 3 else i for i in range(len(excel_muestra))])
+    df = ingesta.cargar_parquet(ingesta.asegurar_parquet(_xlsx(fuente)))
+    esperado = ingesta.normalizar_columnas(fuente.copy())
+    assert set(esperado.columns) <= set(df.columns)
+    # Descripción y link se guardan como texto, aunque todos sus valores parezcan números o estén vacíos
+    for col in ['descripción', 'link', 'codigo']:
+        assert df[col].dtype == object or pd.api.types.is_string_dtype(df[col]), col
+    assert df['descripción'].tolist() == esperado['descripción'].where(esperado['descripción'].notna(), None).tolist()
+    assert df['link'].isna().all()
+    assert df['codigo'].tolist()[:4] == ["0", "001", "002", "3"]
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from abp import cubo
+from abp.ranking import CRITERIOS, RankingDefensivo
+
+COL = 'equipo_defensor'
+
+
+@pytest.fixture(scope="module")
+def motor(eventos_liga):
+    return RankingDefensivo(cubo.agregar(eventos_liga))
+
+
+def _periodos(eventos):
+    return sorted(set(zip(eventos['temporada'], eventos['jornada'])))
+
+
+def _totales_a_mano(eventos, fin, ventana):
+    # Suma directa de las ABP de los últimos `ventana` periodos (temporada, jornada) hasta fin, equipo a equipo
+    periodos = _periodos(eventos)
+    elegidos = set(periodos[:fin + 1] if ventana is None else periodos[max(0, fin + 1 - ventana):fin + 1])
+    en_ventana = eventos[[p in elegidos for p in zip(eventos['temporada'], eventos['jornada'])]]
+    equipos = sorted(eventos[COL].unique())
+    return (
+        en_ventana.assign(abp=1, tiros=en_ventana['tiro'].astype(int), goles=en_ventana['gol'].astype(int),
+                          xg_suma=en_ventana['xg_tiro'].fillna(0.0))
+        .groupby(COL)[['abp', 'tiros', 'goles', 'xg_suma']].sum()
+        .reindex(equipos, fill_value=0)
+    )
+
+
+def _posiciones_a_mano(totales, criterio):
+    ratio = totales[CRITERIOS[criterio]] / totales['abp'].where(totales['abp'] > 0)
+    return ratio.rank(method='min', na_option='bottom').astype(int)
+
+
+def _forma_a_mano(eventos, fin, semivida, criterio):
+    periodos = _periodos(eventos)
+    peso = {p: 0.5 ** ((fin - i) / semivida) for i, p in enumerate(periodos[:fin + 1])}
+    w = pd.Series([peso.get(p, 0.0) for p in zip(eventos['temporada'], eventos['jornada'])], index=eventos.index)
+    medida = {'tiros': eventos['tiro'].astype(float), 'goles': eventos['gol'].astype(float),
+              'xg_suma': eventos['xg_tiro'].fillna(0.0)}[CRITERIOS[criterio]]
+    suma = (medida * w).groupby(eventos[COL]).sum()
+    abp = w.groupby(eventos[COL]).sum()
+    return suma / abp.where(abp > 0)
+
+
+def test_hay_empates_y_equipos_sin_abp(eventos_liga):
+    # Los casos límite están en los datos
+    final = _totales_a_mano(eventos_liga, len(_periodos(eventos_liga)) - 1, 3)
+    assert final.loc["Eco", 'abp'] == 0
+    assert final.loc["Alfa"].equals(final.loc["Bravo"])
+
+
+@pytest.mark.parametrize("criterio", list(CRITERIOS))
+@pytest.mark.parametrize("ventana", [None, 1, 3, 8])
+def test_tabla_por_ventana(motor, eventos_liga, criterio, ventana):
+    periodos = _periodos(eventos_liga)
+    assert [tuple(p) for p in motor.periodos] == periodos
+    for fin in (0, 5, 6, len(periodos) - 1):
+        tabla = motor.tabla(fin=fin, ventana=ventana, criterio=criterio, semivida=2).set_index(COL)
+        totales = _totales_a_mano(eventos_liga, fin, ventana)
+        posiciones = _posiciones_a_mano(totales, criterio)
+        # Solo los equipos con ABP en la ventana, por posición y, en empate, por nombre
+        con_abp = totales[totales['abp'] > 0]
+        esperado = sorted(con_abp.index, key=lambda e: (posiciones[e], e))
+        assert list(tabla.index) == esperado
+        assert np.array_equal(tabla['ABP'], con_abp.loc[esperado, 'abp'])
+        assert np.array_equal(tabla['Tiros_Recibidos'], con_abp.loc[esperado, 'tiros'])
+        assert np.array_equal(tabla['Goles_Recibidos'], con_abp.loc[esperado, 'goles'])
+        assert np.allclose(tabla['xG_Recibido'], con_abp.loc[esperado, 'xg_suma'])
+        assert np.allclose(tabla[criterio], con_abp.loc[esperado, CRITERIOS[criterio]] / con_abp.loc[esperado, 'abp'])
+        assert np.array_equal(tabla['Posición'], posiciones[esperado])
+        if "Alfa" in tabla.index:
+            assert tabla.loc["Alfa", 'Posición'] == tabla.loc["Bravo", 'Posición']
+        assert np.allclose(tabla[f'Forma {criterio}'], _forma_a_mano(eventos_liga, fin, 2, criterio)[esperado],
+                           equal_nan=True)
+        if fin == 0:
+            assert 'Δ' not in tabla.columns
+        else:
+            anteriores = _posiciones_a_mano(_totales_a_mano(eventos_liga, fin - 1, ventana), criterio)
+            assert np.array_equal(tabla['Δ'], anteriores[esperado] - posiciones[esperado])
+
+
+def test_eco_sale_de_la_tabla_sin_abp_en_la_ventana(motor):
+    assert "Eco" in set(motor.tabla(ventana=None)[COL])
+    assert "Eco" not in set(motor.tabla(ventana=3)[COL])
+
+
+@pytest.mark.parametrize("ventana", [None, 2])
+def test_evolucion(motor, eventos_liga, ventana):
+    evolucion = motor.evolucion(ventana=ventana, criterio='xG/ABP')
+    periodos = _periodos(eventos_liga)
+    assert len(evolucion) == len(periodos) * eventos_liga[COL].nunique()
+    for fin, (temporada, jornada) in enumerate(periodos):
+        en_periodo = evolucion[evolucion['periodo'] == f"{temporada} · J{jornada}"].set_index(COL)['Posición']
+        esperado = _posiciones_a_mano(_totales_a_mano(eventos_liga, fin, ventana), 'xG/ABP')
+        pd.testing.assert_series_equal(en_periodo.sort_index(), esperado, check_names=False, check_index_type=False)
+        # Sin ABP en la ventana: último puesto (compartido si hay más equipos sin ABP)
+        if ventana and temporada == "2024/25" and jornada > ventana:
+            assert en_periodo["Eco"] == en_periodo.max()
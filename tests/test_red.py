@@ -0,0 +1,70 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from abp import almacen, red
+
+
+@pytest.fixture(scope="module")
+def muestra(excel_muestra):
+    return almacen.preparar(excel_muestra)
+
+
+def _si(valor):
+    return not pd.isna(valor) and bool(valor)
+
+
+def _aristas_a_mano(df):
+    # Recorre fila a fila: cuenta ABP, tiros y goles por pareja con ejecutor y objetivo conocidos
+    peso, tiros, goles = Counter(), Counter(), Counter()
+    for ejecutor, objetivo, tiro, gol in zip(df[red.ORIGEN], df[red.DESTINO], df['tiro'], df['gol']):
+        if pd.isna(ejecutor) or pd.isna(objetivo):
+            continue
+        peso[ejecutor, objetivo] += 1
+        tiros[ejecutor, objetivo] += _si(tiro)
+        goles[ejecutor, objetivo] += _si(gol)
+    return {pareja: (peso[pareja], tiros[pareja], goles[pareja]) for pareja in peso}
+
+
+def _como_dict(tabla):
+    return {(a, b): (p, t, g) for a, b, p, t, g in tabla[[red.ORIGEN, red.DESTINO, 'peso', 'tiros', 'goles']].itertuples(index=False)}
+
+
+def test_aristas_cuentan_abp_tiros_y_goles(muestra):
+    tabla = red.aristas(muestra)
+    assert _como_dict(tabla) == _aristas_a_mano(muestra)
+    assert tabla['peso'].sum() == muestra[[red.ORIGEN, red.DESTINO]].notna().all(axis=1).sum()
+
+
+def test_aristas_con_parejas_repetidas_y_sin_objetivo():
+    df = pd.DataFrame({
+        red.ORIGEN: ["A", "A", "B", "A", None, "C"],
+        red.DESTINO: ["B", "B", "A", "C", "B", None],
+        'tiro': pd.array([True, False, True, None, True, True], dtype="boolean"),
+        'gol': pd.array([True, False, False, False, True, False], dtype="boolean"),
+    })
+    assert _como_dict(red.aristas(df)) == {("A", "B"): (2, 1, 1), ("A", "C"): (1, 0, 0), ("B", "A"): (1, 1, 0)}
+    assert red.aristas(df.iloc[4:]).empty
+
+
+def test_mismo_conjunto_de_aristas_reutiliza_el_layout(muestra):
+    cache = red.CacheLayouts()
+    tabla = red.aristas(muestra)
+    pos = cache.posiciones(tabla)
+    assert set(pos) == set(tabla[red.ORIGEN]) | set(tabla[red.DESTINO])
+
+    # El orden de las filas y los pesos no cambian el conjunto: mismo objeto, mismas posiciones
+    desordenada = tabla.sample(frac=1, random_state=0).assign(peso=1)
+    assert cache.posiciones(desordenada) is pos
+    assert cache._layouts.estadisticas()['aciertos'] == 1
+    assert len(cache._layouts) == 1
+
+    # Un conjunto distinto es otra entrada; el original sigue guardado
+    otra = cache.posiciones(tabla.iloc[1:])
+    assert otra is not pos
+    assert len(cache._layouts) == 2
+    guardadas = cache.posiciones(tabla)
+    assert guardadas is pos
+    assert all(np.array_equal(guardadas[n], pos[n]) for n in pos)
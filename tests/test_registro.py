@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from abp import almacen, registro
+
+
+@pytest.fixture(scope="module")
+def datasets(excel_muestra):
+    # Dos versiones distintas del almacén, con el esquema ya aplicado
+    otra = excel_muestra.copy()
+    otra['Temporada'] = "2025/26"
+    return {"a": almacen.preparar(excel_muestra), "b": almacen.preparar(otra)}
+
+
+def _presupuesto_mb(veces, datasets):
+    return veces * registro._Entrada(datasets["a"]).bytes() / 2**20
+
+
+class Derivado:
+    # Objeto construido sobre un dataset que declara su memoria
+    def __init__(self, bytes_):
+        self.bytes_ = bytes_
+
+    def memoria(self):
+        return self.bytes_
+
+
+def test_desaloja_el_menos_usado_y_lo_recarga_de_disco(tmp_path, datasets):
+    reg = registro.RegistroDatos(presupuesto_mb=_presupuesto_mb(1.5, datasets), directorio=tmp_path)
+    cargas = []
+
+    def cargar(clave):
+        return lambda: cargas.append(clave) or datasets[clave]
+
+    reg.obtener("a", cargar("a"))
+    reg.obtener("a", cargar("a"))
+    reg.obtener("b", cargar("b"))
+    stats = reg.estadisticas()
+    assert (stats['datasets'], stats['aciertos'], stats['fallos'], stats['desalojos']) == (1, 1, 2, 1)
+    assert (tmp_path / "a.parquet").exists()
+
+    # Vuelve desde el volcado, no desde el almacén, con los mismos tipos
+    df = reg.obtener("a", cargar("a"))
+    assert cargas == ["a", "b"]
+    assert reg.estadisticas()['recargas'] == 1
+    pd.testing.assert_frame_equal(df, datasets["a"])
+
+
+def test_nunca_desaloja_el_ultimo(tmp_path, datasets):
+    reg = registro.RegistroDatos(presupuesto_mb=0, directorio=tmp_path)
+    reg.obtener("a", lambda: datasets["a"])
+    reg.obtener("b", lambda: datasets["b"])
+    assert reg.estadisticas()['datasets'] == 1
+    assert len(reg.obtener("b", lambda: None)) == len(datasets["b"])
+
+
+def test_los_derivados_cuentan_en_el_presupuesto(tmp_path, datasets):
+    reg = registro.RegistroDatos(presupuesto_mb=_presupuesto_mb(3, datasets), directorio=tmp_path)
+    reg.obtener("a", lambda: datasets["a"])
+    reg.obtener("b", lambda: datasets["b"])
+    assert reg.estadisticas()['datasets'] == 2
+    base = reg.bytes()
+
+    # Construir un derivado grande de b obliga a desalojar a
+    construidos = []
+    derivado = reg.derivado("b", "indice", lambda df: construidos.append(df) or Derivado(2 * base), lambda: None)
+    assert reg.estadisticas()['datasets'] == 1
+    assert reg.estadisticas()['desalojos'] == 1
+    assert reg.bytes() == registro._Entrada(datasets["b"]).bytes() + 2 * base
+
+    # Se construye una vez por dataset residente; el mismo objeto mientras sigue en memoria
+    assert reg.derivado("b", "indice", lambda df: Derivado(0), lambda: None) is derivado
+    assert len(construidos) == 1
+
+    # Su memoria se mide en cada comprobación: si crece, también cuenta
+    derivado.bytes_ = 0
+    assert reg.bytes() == registro._Entrada(datasets["b"]).bytes()
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from abp import cubo
+from abp.series import SeriesEquipos
+
+COL = 'equipo_defensor'
+
+
+@pytest.fixture(scope="module")
+def agg(eventos_liga):
+    return cubo.agregar(eventos_liga)
+
+
+def _por_jornada_a_mano(eventos, por_temporada):
+    # Rejilla completa equipo x periodo con las sumas de cada jornada (0 donde el equipo no tiene ABP)
+    periodo = ['temporada', 'jornada'] if por_temporada else ['jornada']
+    medidas = eventos.assign(abp=1, tiros=eventos['tiro'].astype(int), goles=eventos['gol'].astype(int),
+                             xg_suma=eventos['xg_tiro'].fillna(0.0))
+    sumas = medidas.groupby([COL, *periodo])[['abp', 'tiros', 'goles', 'xg_suma']].sum()
+    rejilla = pd.MultiIndex.from_tuples(
+        [(e, *p) for e in sorted(eventos[COL].unique()) for p in sorted(set(map(tuple, eventos[periodo].to_numpy())))],
+        names=[COL, *periodo],
+    )
+    return sumas.reindex(rejilla, fill_value=0)
+
+
+def _esperado(eventos, medida, modo, ventana, por_temporada):
+    # Cada equipo (y temporada, si se separan) es una serie independiente: cumsum/rolling de pandas por grupo
+    tabla = _por_jornada_a_mano(eventos, por_temporada)
+    grupos = [COL, 'temporada'] if por_temporada else [COL]
+    if modo == 'por_jornada':
+        valores = tabla[medida].astype(float)
+    elif modo == 'acumulado':
+        valores = tabla.groupby(level=grupos)[medida].cumsum().astype(float)
+    elif modo == 'media_movil':
+        valores = tabla.groupby(level=grupos)[medida].transform(lambda s: s.rolling(ventana, min_periods=1).mean())
+    else:
+        acumulado = tabla.groupby(level=grupos).cumsum()
+        valores = acumulado[medida] / acumulado['abp'].where(acumulado['abp'] > 0)
+    return valores.rename(medida).reset_index()
+
+
+@pytest.mark.parametrize("por_temporada", [True, False])
+@pytest.mark.parametrize("modo,ventana", [('acumulado', 3), ('por_jornada', 3), ('media_movil', 1), ('media_movil', 3),
+                                          ('media_movil', 10), ('por_abp', 3)])
+@pytest.mark.parametrize("medida", ['abp', 'tiros', 'xg_suma'])
+def test_vistas_contra_pandas(agg, eventos_liga, por_temporada, modo, ventana, medida):
+    series = SeriesEquipos(agg, col=COL, por_temporada=por_temporada)
+    obtenido = series.vista(medida, modo, ventana)
+    esperado = _esperado(eventos_liga, medida, modo, ventana, por_temporada)
+    claves = [COL, 'temporada', 'jornada'] if por_temporada else [COL, 'jornada']
+    obtenido = obtenido.astype({c: object for c in claves}).sort_values(claves).reset_index(drop=True)
+    esperado = esperado.astype({c: object for c in claves}).sort_values(claves).reset_index(drop=True)
+    pd.testing.assert_frame_equal(obtenido[claves], esperado[claves], check_dtype=False)
+    assert np.allclose(obtenido[medida], esperado[medida], equal_nan=True)
+
+
+def test_acumulado_vuelve_a_cero_en_cada_temporada(agg):
+    series = SeriesEquipos(agg, col=COL, por_temporada=True)
+    vista = series.vista('abp', 'acumulado').set_index([COL, 'temporada', 'jornada'])['abp'].sort_index()
+    por_jornada = series.vista('abp', 'por_jornada').set_index([COL, 'temporada', 'jornada'])['abp'].sort_index()
+    primeras = vista.xs(1, level='jornada')
+    assert primeras.equals(por_jornada.xs(1, level='jornada'))
+    # Eco no juega la segunda temporada: su acumulado allí es 0, no lo que sumó en la primera
+    assert vista.loc[("Eco", "2024/25")].eq(0).all()
+    assert vista.loc[("Eco", "2023/24")].iloc[-1] > 0
+    # Sin ABP acumuladas el cociente no existe
+    por_abp = series.vista('tiros', 'por_abp').set_index([COL, 'temporada'])['tiros'].sort_index()
+    assert por_abp.loc[("Eco", "2024/25")].isna().all()
+
+
+def test_sin_separar_suma_las_jornadas_de_todas_las_temporadas(agg, eventos_liga):
+    series = SeriesEquipos(agg, col=COL, por_temporada=False)
+    assert list(series.periodos) == sorted(eventos_liga['jornada'].unique())
+    total = series.vista('abp', 'acumulado').groupby(COL)['abp'].last()
+    assert total.to_dict() == eventos_liga[COL].value_counts().to_dict()
+
+
+def test_vista_de_algunos_equipos(agg):
+    series = SeriesEquipos(agg, col=COL, por_temporada=True)
+    vista = series.vista('goles', 'acumulado', equipos=["Delta", "Alfa", "No existe"])
+    assert set(vista[COL]) == {"Alfa", "Delta"}
+    with pytest.raises(ValueError):
+        series.valores('goles', 'otro')
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from abp import almacen, analitica, tabla
+from abp.filtros import EstadoFiltros
+from abp.indices import IndiceFiltros
+
+
+@pytest.fixture(scope="module")
+def muestra(excel_muestra):
+    return almacen.preparar(excel_muestra)
+
+
+@pytest.fixture
+def vista(muestra):
+    return tabla.VistaTabla(muestra, IndiceFiltros(muestra))
+
+
+TODO = EstadoFiltros.desde({}, (1, 50))
+
+
+def _todas(df):
+    return np.arange(len(df))
+
+
+def _buscar_a_mano(vista, df, filas, texto, columnas):
+    # Fila a fila: alguna columna de texto contiene el texto, sin distinguir mayúsculas
+    textos = [c for c in columnas if vista.es_texto(c)]
+    return np.array([
+        i for i in filas
+        if any(pd.notna(df[c].iloc[i]) and texto.lower() in str(df[c].iloc[i]).lower() for c in textos)
+    ], dtype=filas.dtype)
+
+
+def _ordenar_a_mano(df, filas, col, ascendente):
+    # Orden estable; los vacíos al final en los dos sentidos
+    valores = df[col].astype(object).to_numpy()
+    llenas = [i for i in filas if pd.notna(valores[i])]
+    vacias = [i for i in filas if pd.isna(valores[i])]
+    return np.array(sorted(llenas, key=lambda i: valores[i], reverse=not ascendente) + vacias, dtype=filas.dtype)
+
+
+def test_paginas_con_las_columnas_elegidas(vista, muestra):
+    filas = vista.filas_ordenadas(TODO, _todas(muestra))
+    columnas = ['jugador_ejecutor', 'jornada', 'tiro']
+    paginas = [vista.pagina(filas, columnas, n, 10) for n in range(4)]
+    assert [len(p) for p in paginas] == [10, 10, 10, len(muestra) - 30]
+    assert all(list(p.columns) == columnas for p in paginas)
+    pd.testing.assert_frame_equal(pd.concat(paginas), muestra[columnas])
+    assert vista.pagina(filas, columnas, 4, 10).empty
+
+
+def test_busqueda_en_columnas_de_texto(vista, muestra):
+    filas = _todas(muestra)[::2]
+    columnas = ['equipo_atacante', 'jugador_ejecutor', 'jornada', 'descripción']
+    jugador = str(muestra['jugador_ejecutor'].iloc[0])
+    for texto in (jugador.upper(), jugador[-4:].lower(), "4", "no existe"):
+        encontradas = vista.filas_ordenadas(TODO, filas, busqueda=texto, columnas_busqueda=columnas)
+        assert np.array_equal(encontradas, _buscar_a_mano(vista, muestra, filas, texto, columnas)), texto
+    # La jornada es numérica: no se busca en ella
+    assert not vista.es_texto('jornada')
+    assert len(vista.filas_ordenadas(TODO, filas, busqueda="4", columnas_busqueda=['jornada'])) == 0
+    assert len(vista.filas_ordenadas(TODO, filas, busqueda=jugador.upper(), columnas_busqueda=columnas)) > 0
+
+
+@pytest.mark.parametrize("col", ['jugador_ejecutor', 'jornada', 'xg_tiro', 'tiro'])
+@pytest.mark.parametrize("ascendente", [True, False])
+def test_orden_estable_con_vacios_al_final(vista, muestra, col, ascendente):
+    filas = _todas(muestra)[::-1].copy()
+    ordenadas = vista.filas_ordenadas(TODO, filas, orden=col, ascendente=ascendente)
+    assert np.array_equal(ordenadas, _ordenar_a_mano(muestra, filas, col, ascendente))
+
+
+def test_busqueda_y_orden_se_guardan_por_estado(vista, muestra):
+    filas = _todas(muestra)
+    primera = vista.filas_ordenadas(TODO, filas, orden='jornada', busqueda="a", columnas_busqueda=['jugador_ejecutor'])
+    assert vista.filas_ordenadas(TODO, filas, orden='jornada', busqueda="a", columnas_busqueda=['jugador_ejecutor']) is primera
+    assert vista.filas_ordenadas(TODO, filas, orden='jornada', ascendente=False, busqueda="a",
+                                 columnas_busqueda=['jugador_ejecutor']) is not primera
+    assert vista.memoria() > 0
+
+
+def test_misma_tabla_con_duckdb(tmp_path, excel_muestra):
+    pytest.importorskip("duckdb")
+    from abp import consultas
+
+    alm = almacen.AlmacenABP(tmp_path)
+    alm.anadir(excel_muestra)
+    pandas_ = analitica.Analisis(alm.cargar())
+    sql = consultas.AnalisisSQL(alm)
+    vista_pandas = tabla.VistaTabla(pandas_.df, pandas_.indice)
+    vista_sql = consultas.VistaTablaSQL(sql)
+    estado = pandas_.estado({'tiro': [True]}, pandas_.rango_jornadas())
+    columnas = ['jornada', 'jugador_ejecutor', 'xg_tiro', 'gol']
+
+    for orden, ascendente, busqueda in [(None, True, ""), ('xg_tiro', False, ""), ('jugador_ejecutor', True, "a")]:
+        filas_pandas = vista_pandas.filas_ordenadas(estado, pandas_.filas(estado), orden, ascendente, busqueda, columnas)
+        filas_sql = vista_sql.filas_ordenadas(estado, sql.filas(estado), orden, ascendente, busqueda, columnas)
+        assert len(filas_pandas) == len(filas_sql)
+        for numero in range(2):
+            esperado = vista_pandas.pagina(filas_pandas, columnas, numero, 5).reset_index(drop=True)
+            obtenido = vista_sql.pagina(filas_sql, columnas, numero, 5)
+            assert esperado.astype(object).where(esperado.notna(), None).values.tolist() == \
+                obtenido.astype(object).where(obtenido.notna(), None).values.tolist(), (orden, numero)
@@ -0,0 +1,59 @@
+import json
+
+from abp import trazas
+
+
+def _lineas(ruta):
+    return [json.loads(linea) for linea in ruta.read_text(encoding="utf-8").splitlines()] if ruta.exists() else []
+
+
+def test_spans_anidados_con_su_nivel():
+    traza = trazas.Traza(activa=True, pagina="Dashboard general")
+    with traza.span("pagina"):
+        with traza.span("filtros", filas=10) as span:
+            span.anotar(aciertos=1)
+        with traza.span("figura"):
+            with traza.span("render"):
+                pass
+    with traza.span("exportar"):
+        pass
+
+    resumen = traza.resumen()
+    assert resumen["pagina"] == "Dashboard general"
+    spans = resumen["spans"]
+    # En orden de inicio, no de cierre
+    assert [(s["nombre"], s["nivel"]) for s in spans] == [
+        ("pagina", 0), ("filtros", 1), ("figura", 1), ("render", 2), ("exportar", 0),
+    ]
+    assert (spans[1]["filas"], spans[1]["aciertos"]) == (10, 1)
+    por_nombre = {s["nombre"]: s["ms"] for s in spans}
+    assert por_nombre["pagina"] >= por_nombre["figura"] >= por_nombre["render"] >= 0
+    assert resumen["total_ms"] >= por_nombre["pagina"]
+
+
+def test_una_linea_por_ejecucion(tmp_path, monkeypatch):
+    ruta = tmp_path / "trazas.jsonl"
+    monkeypatch.setattr(trazas, "RUTA_TRAZAS", ruta)
+    traza = trazas.Traza(activa=True)
+    with traza.span("pagina"):
+        pass
+
+    primero = traza.guardar()
+    assert traza.guardada
+    # Guardar otra vez (p. ej. desde un fragmento) no duplica la línea
+    assert traza.guardar() is primero
+    assert _lineas(ruta) == [json.loads(json.dumps(primero))]
+
+    otra = trazas.Traza(activa=True, fragmento="mostrar_tabla")
+    otra.guardar()
+    assert [linea.get("fragmento") for linea in _lineas(ruta)] == [None, "mostrar_tabla"]
+
+
+def test_desactivada_no_mide_ni_escribe(tmp_path):
+    ruta = tmp_path / "trazas.jsonl"
+    traza = trazas.Traza(activa=False)
+    with traza.span("pagina") as span:
+        span.anotar(filas=1)
+    assert traza.spans == []
+    assert traza.guardar(ruta) is None
+    assert not ruta.exists()